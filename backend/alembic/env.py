@@ -20,7 +20,11 @@ from models import (  # noqa: F401, E402
     Warehouse,
     Employee,
     FaceEncoding,
+    FaceGalleryChange,
     AccessLog,
+    EmployeePresence,
+    EmployeeDailyStats,
+    RollupDay,
     UserLoginLog,
     PasswordHistory,
     RefreshToken,
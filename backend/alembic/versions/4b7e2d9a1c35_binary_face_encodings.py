@@ -0,0 +1,104 @@
+"""binary face encodings
+
+Revision ID: 4b7e2d9a1c35
+Revises: c2f1d33ab1df
+Create Date: 2026-10-17 09:12:41.204518
+
+Converts face_encodings.encoding from 128 comma-separated "%.8f" strings
+(encoding_version "1.0") to raw little-endian float32 bytes (512 bytes per
+vector, encoding_version "2.0").
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.sql import table, column
+
+
+# revision identifiers, used by Alembic.
+revision: str = "4b7e2d9a1c35"
+down_revision: Union[str, Sequence[str], None] = "c2f1d33ab1df"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 1000
+ENCODING_DTYPE = np.dtype("<f4")
+
+
+def _convert_rows(source: str, target: str, convert, version: str) -> None:
+    """Copy source -> target column in primary key batches, converting each value"""
+    connection = op.get_bind()
+    encodings = table(
+        "face_encodings",
+        column("id", sa.Integer),
+        column(source),
+        column(target),
+        column("encoding_version", sa.String),
+    )
+
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(encodings.c.id, encodings.c[source])
+            .where(encodings.c.id > last_id)
+            .order_by(encodings.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+
+        connection.execute(
+            encodings.update()
+            .where(encodings.c.id == sa.bindparam("row_id"))
+            .values({target: sa.bindparam("value"), "encoding_version": version}),
+            [{"row_id": row_id, "value": convert(value)} for row_id, value in rows],
+        )
+        last_id = rows[-1][0]
+
+
+def _text_to_bytes(value) -> bytes:
+    if isinstance(value, (bytes, bytearray)):
+        value = value.decode("ascii")
+    return np.array(
+        [float(x) for x in value.split(",")], dtype=ENCODING_DTYPE
+    ).tobytes()
+
+
+def _bytes_to_text(value) -> str:
+    return ",".join(f"{v:.8f}" for v in np.frombuffer(value, dtype=ENCODING_DTYPE))
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table("face_encodings") as batch_op:
+        batch_op.add_column(sa.Column("encoding_bin", sa.LargeBinary(), nullable=True))
+
+    _convert_rows("encoding", "encoding_bin", _text_to_bytes, "2.0")
+
+    with op.batch_alter_table("face_encodings") as batch_op:
+        batch_op.drop_column("encoding")
+        batch_op.alter_column(
+            "encoding_bin",
+            new_column_name="encoding",
+            existing_type=sa.LargeBinary(),
+            nullable=False,
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("face_encodings") as batch_op:
+        batch_op.add_column(sa.Column("encoding_text", sa.Text(), nullable=True))
+
+    _convert_rows("encoding", "encoding_text", _bytes_to_text, "1.0")
+
+    with op.batch_alter_table("face_encodings") as batch_op:
+        batch_op.drop_column("encoding")
+        batch_op.alter_column(
+            "encoding_text",
+            new_column_name="encoding",
+            existing_type=sa.Text(),
+            nullable=False,
+        )
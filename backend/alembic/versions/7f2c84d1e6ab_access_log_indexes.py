@@ -0,0 +1,40 @@
+"""access log indexes
+
+Revision ID: 7f2c84d1e6ab
+Revises: e51a7c3b9f20
+Create Date: 2026-10-17 16:20:12.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7f2c84d1e6ab'
+down_revision: Union[str, Sequence[str], None] = 'e51a7c3b9f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_access_logs_employee_id_timestamp', 'access_logs', ['employee_id', 'timestamp'], unique=False)
+    op.create_index('ix_access_logs_timestamp', 'access_logs', ['timestamp'], unique=False)
+    op.create_index('ix_user_login_logs_user_id_timestamp', 'user_login_logs', ['user_id', 'timestamp'], unique=False)
+    op.create_index('ix_user_login_logs_timestamp', 'user_login_logs', ['timestamp'], unique=False)
+    op.create_index('ix_employees_warehouse_id_is_active', 'employees', ['warehouse_id', 'is_active'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # En MySQL las FKs necesitan un índice propio antes de quitar los compuestos
+    op.create_index('ix_access_logs_employee_id', 'access_logs', ['employee_id'], unique=False)
+    op.create_index('ix_user_login_logs_user_id', 'user_login_logs', ['user_id'], unique=False)
+    op.create_index('ix_employees_warehouse_id', 'employees', ['warehouse_id'], unique=False)
+    op.drop_index('ix_employees_warehouse_id_is_active', table_name='employees')
+    op.drop_index('ix_user_login_logs_timestamp', table_name='user_login_logs')
+    op.drop_index('ix_user_login_logs_user_id_timestamp', table_name='user_login_logs')
+    op.drop_index('ix_access_logs_timestamp', table_name='access_logs')
+    op.drop_index('ix_access_logs_employee_id_timestamp', table_name='access_logs')
@@ -0,0 +1,54 @@
+"""daily rollups
+
+Revision ID: b83e0f5d2c47
+Revises: 7f2c84d1e6ab
+Create Date: 2026-10-17 18:05:37.519204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b83e0f5d2c47'
+down_revision: Union[str, Sequence[str], None] = '7f2c84d1e6ab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('employee_daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('warehouse_id', sa.Integer(), nullable=True),
+    sa.Column('check_ins', sa.Integer(), nullable=False),
+    sa.Column('check_outs', sa.Integer(), nullable=False),
+    sa.Column('events', sa.Integer(), nullable=False),
+    sa.Column('first_in', sa.DateTime(), nullable=True),
+    sa.Column('last_out', sa.DateTime(), nullable=True),
+    sa.Column('last_event', sa.String(length=50), nullable=True),
+    sa.Column('last_event_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['warehouse_id'], ['warehouses.id'], ),
+    sa.PrimaryKeyConstraint('day', 'employee_id')
+    )
+    op.create_index('ix_employee_daily_stats_employee_id_day', 'employee_daily_stats', ['employee_id', 'day'], unique=False)
+    op.create_index('ix_employee_daily_stats_warehouse_id_day', 'employee_daily_stats', ['warehouse_id', 'day'], unique=False)
+    op.create_table('rollup_days',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('rolled_at', sa.DateTime(), nullable=False),
+    sa.Column('last_access_log_id', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('day')
+    )
+    # Los días históricos se generan con: python -m services.rollup_service --rebuild
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('rollup_days')
+    op.drop_index('ix_employee_daily_stats_warehouse_id_day', table_name='employee_daily_stats')
+    op.drop_index('ix_employee_daily_stats_employee_id_day', table_name='employee_daily_stats')
+    op.drop_table('employee_daily_stats')
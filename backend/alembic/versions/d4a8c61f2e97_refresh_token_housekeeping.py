@@ -0,0 +1,33 @@
+"""refresh token housekeeping
+
+Revision ID: d4a8c61f2e97
+Revises: b83e0f5d2c47
+Create Date: 2026-10-18 10:42:37.215480
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4a8c61f2e97'
+down_revision: Union[str, Sequence[str], None] = 'b83e0f5d2c47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('refresh_tokens', sa.Column('last_used', sa.DateTime(), nullable=True))
+    op.create_index('ix_refresh_tokens_user_id_is_revoked_expires_at', 'refresh_tokens', ['user_id', 'is_revoked', 'expires_at'], unique=False)
+    op.drop_index('ix_refresh_tokens_user_id', table_name='refresh_tokens')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # En MySQL las FKs necesitan un índice propio antes de quitar los compuestos
+    op.create_index('ix_refresh_tokens_user_id', 'refresh_tokens', ['user_id'], unique=False)
+    op.drop_index('ix_refresh_tokens_user_id_is_revoked_expires_at', table_name='refresh_tokens')
+    op.drop_column('refresh_tokens', 'last_used')
@@ -0,0 +1,55 @@
+"""employee presence
+
+Revision ID: e51a7c3b9f20
+Revises: 9d3f61c0a8e2
+Create Date: 2026-10-17 15:02:41.227315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e51a7c3b9f20'
+down_revision: Union[str, Sequence[str], None] = '9d3f61c0a8e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('employee_presence',
+    sa.Column('employee_id', sa.Integer(), nullable=False),
+    sa.Column('last_event', sa.String(length=50), nullable=False),
+    sa.Column('last_event_at', sa.DateTime(), nullable=False),
+    sa.Column('last_access_log_id', sa.Integer(), nullable=False),
+    sa.Column('warehouse_id', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['employee_id'], ['employees.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['warehouse_id'], ['warehouses.id'], ),
+    sa.PrimaryKeyConstraint('employee_id')
+    )
+
+    # Estado inicial: el último access_log de cada empleado
+    op.execute(
+        """
+        INSERT INTO employee_presence
+            (employee_id, last_event, last_event_at, last_access_log_id, warehouse_id, updated_at)
+        SELECT a.employee_id, a.event_type, a.timestamp, a.id, e.warehouse_id, a.timestamp
+        FROM access_logs a
+        JOIN employees e ON e.id = a.employee_id
+        WHERE a.id = (
+            SELECT a2.id FROM access_logs a2
+            WHERE a2.employee_id = a.employee_id
+            ORDER BY a2.timestamp DESC, a2.id DESC
+            LIMIT 1
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('employee_presence')
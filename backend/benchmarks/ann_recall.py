@@ -0,0 +1,94 @@
+"""
+Recall y latencia del índice IVF contra la búsqueda exacta (fuerza bruta)
+
+Genera una galería sintética con estructura similar a la de face_recognition
+(distancia entre personas ~0.9, entre fotos de la misma persona ~0.35) y mide,
+para varios valores de nprobe, el recall@1 por empleado y la latencia media.
+
+Uso (desde backend/):
+    python -m benchmarks.ann_recall --employees 20000 --per-employee 8
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from services.face_gallery import WarehouseGallery
+from services.face_index import IVFIndex
+
+DIM = 128
+INTER_PERSON_DISTANCE = 0.9
+INTRA_PERSON_DISTANCE = 0.35
+
+
+def synthetic_gallery(employees: int, per_employee: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    center_std = INTER_PERSON_DISTANCE / np.sqrt(2 * DIM)
+    noise_std = INTRA_PERSON_DISTANCE / np.sqrt(2 * DIM)
+    centers = rng.normal(0, center_std, size=(employees, DIM)).astype(np.float32)
+    employee_ids = np.repeat(np.arange(employees, dtype=np.int64), per_employee)
+    vectors = centers[employee_ids] + rng.normal(
+        0, noise_std, size=(len(employee_ids), DIM)
+    ).astype(np.float32)
+    return centers, employee_ids, vectors
+
+
+def synthetic_probes(centers: np.ndarray, count: int, seed: int = 1):
+    rng = np.random.default_rng(seed)
+    noise_std = INTRA_PERSON_DISTANCE / np.sqrt(2 * DIM)
+    truth = rng.integers(0, len(centers), size=count)
+    probes = centers[truth] + rng.normal(0, noise_std, size=(count, DIM)).astype(
+        np.float32
+    )
+    return truth, probes
+
+
+def timed(search, probes):
+    results = []
+    start = time.perf_counter()
+    for probe in probes:
+        results.append(search(probe))
+    elapsed = time.perf_counter() - start
+    return results, elapsed / len(probes) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--employees", type=int, default=20000)
+    parser.add_argument("--per-employee", type=int, default=8)
+    parser.add_argument("--probes", type=int, default=500)
+    parser.add_argument("--nlist", type=int, default=0)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    centers, employee_ids, vectors = synthetic_gallery(args.employees, args.per_employee)
+    _, probes = synthetic_probes(centers, args.probes)
+    print(f"Gallery: {len(vectors)} encodings, {args.employees} employees")
+
+    exact = WarehouseGallery(capacity=len(vectors))
+    exact.append(employee_ids, vectors)
+    exact_results, exact_ms = timed(exact.nearest, probes)
+    print(f"{'mode':<14}{'recall@1':>10}{'ms/query':>12}{'speedup':>10}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_ms:>12.3f}{1.0:>10.1f}")
+
+    start = time.perf_counter()
+    index = IVFIndex(nlist=args.nlist)
+    index.build(employee_ids, vectors)
+    build_s = time.perf_counter() - start
+
+    for nprobe in args.nprobe:
+        index.nprobe = nprobe
+        results, ivf_ms = timed(index.search, probes)
+        recall = np.mean(
+            [got[0] == want[0] for got, want in zip(results, exact_results)]
+        )
+        print(
+            f"{'ivf/' + str(nprobe):<14}{recall:>10.3f}{ivf_ms:>12.3f}"
+            f"{exact_ms / ivf_ms:>10.1f}"
+        )
+    print(f"IVF build: {build_s:.2f}s, nlist={len(index._centroids)}")
+
+
+if __name__ == "__main__":
+    main()
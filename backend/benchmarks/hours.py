@@ -0,0 +1,76 @@
+"""
+Benchmark del cálculo de horas trabajadas (services.hours_service)
+
+Genera un mes de marcas in/out sintéticas (con turnos nocturnos y marcas
+faltantes) para N empleados y mide el emparejamiento y los totales por día y
+por semana sobre los arreglos, sin base de datos.
+
+Uso (desde backend/):
+    python -m benchmarks.hours --employees 1000 5000 --days 31
+"""
+
+import argparse
+import datetime
+import time
+from typing import Dict
+
+import numpy as np
+
+from services.hours_service import summarize, utc_offsets
+
+START = datetime.date(2026, 3, 1)
+
+
+def synthetic_punches(employees: int, days: int, seed: int = 0):
+    """
+    Arreglos ordenados (empleado, is_in, timestamp, offset) con un turno
+    diario por empleado; ~2% de las marcas de salida se omiten
+    """
+    rng = np.random.default_rng(seed)
+    origin = int(datetime.datetime.combine(START, datetime.time()).timestamp())
+    employee_ids = np.repeat(np.arange(1, employees + 1), days)
+    day_starts = origin + np.tile(np.arange(days), employees) * 86400
+    # Turnos de 8-10 h que empiezan entre 06:00 y 23:00 (algunos cruzan la medianoche)
+    ins = day_starts + rng.integers(6 * 3600, 23 * 3600, employee_ids.size)
+    outs = ins + rng.integers(8 * 3600, 10 * 3600, employee_ids.size)
+    keep_out = rng.random(employee_ids.size) > 0.02
+
+    employee_ids = np.concatenate([employee_ids, employee_ids[keep_out]])
+    timestamps = np.concatenate([ins, outs[keep_out]])
+    is_in = np.concatenate([np.ones(ins.size, bool), np.zeros(int(keep_out.sum()), bool)])
+    order = np.lexsort((timestamps, employee_ids))
+    employee_ids, is_in, timestamps = employee_ids[order], is_in[order], timestamps[order]
+    zones = ["America/New_York", "Europe/Madrid", "UTC"]
+    offsets = utc_offsets(timestamps, employee_ids % len(zones), zones)
+    return employee_ids, is_in, timestamps, offsets
+
+
+def bench_hours(employees: int, days: int) -> Dict[str, float]:
+    employee_ids, is_in, timestamps, offsets = synthetic_punches(employees, days)
+    last_day = START + datetime.timedelta(days=days - 1)
+    results = {"events": float(len(timestamps))}
+    for period in ("day", "week"):
+        start = time.perf_counter()
+        rows = summarize(employee_ids, is_in, timestamps, offsets, START, last_day, period=period)
+        results[f"{period}_ms"] = (time.perf_counter() - start) * 1000
+        results[f"{period}_rows"] = float(len(rows))
+    start = time.perf_counter()
+    utc_offsets(timestamps, employee_ids % 3, ["America/New_York", "Europe/Madrid", "UTC"])
+    results["offsets_ms"] = (time.perf_counter() - start) * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--employees", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--days", type=int, default=31)
+    args = parser.parse_args()
+
+    print(f"{'employees':>10}{'events':>10}{'offsets ms':>12}{'day ms':>10}{'week ms':>10}")
+    for employees in args.employees:
+        r = bench_hours(employees, args.days)
+        print(f"{employees:>10}{int(r['events']):>10}{r['offsets_ms']:>12.1f}{r['day_ms']:>10.1f}{r['week_ms']:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Benchmark de verificación de JWT (utils.jwt_handler)
+
+Mide encode y decode de cada backend disponible (python-jose, PyJWT,
+stdlib) y el camino de decode_token con la cache de tokens verificados.
+
+Uso (desde backend/):
+    python -m benchmarks.jwt_decode --iterations 20000
+"""
+
+import argparse
+import time
+from datetime import datetime, timedelta
+from typing import Dict
+
+from utils import jwt_handler
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def available_backends() -> Dict[str, object]:
+    backends = {}
+    for name, backend_class in jwt_handler.BACKENDS.items():
+        try:
+            backends[name] = backend_class()
+        except ImportError:
+            continue
+    return backends
+
+
+def bench_jwt(iterations: int) -> Dict[str, Dict[str, float]]:
+    claims = {"sub": "kiosk", "user_id": 1, "exp": datetime.utcnow() + timedelta(hours=1)}
+    results = {}
+    for name, backend in available_backends().items():
+        token = backend.encode(claims)
+        results[name] = {
+            "encode_us": _per_call_us(lambda: backend.encode(claims), iterations),
+            "decode_us": _per_call_us(lambda: backend.decode(token), iterations),
+        }
+
+    token = jwt_handler.backend.encode(claims)
+    cache = jwt_handler.DecodedTokenCache()
+    previous_cache, jwt_handler.token_cache = jwt_handler.token_cache, cache
+    try:
+        jwt_handler.decode_token(token)
+        results["cached"] = {"decode_us": _per_call_us(lambda: jwt_handler.decode_token(token), iterations)}
+    finally:
+        jwt_handler.token_cache = previous_cache
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'backend':>10}{'encode us':>12}{'decode us':>12}")
+    for name, r in bench_jwt(args.iterations).items():
+        encode = f"{r['encode_us']:>12.1f}" if "encode_us" in r else f"{'-':>12}"
+        print(f"{name:>10}{encode}{r['decode_us']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
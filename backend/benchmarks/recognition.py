@@ -0,0 +1,242 @@
+"""
+Benchmark de reconocimiento sobre galerías sintéticas en SQLite
+
+Para cada tamaño de galería (número total de encodings) crea una base SQLite
+con empleados y encodings sintéticos y mide:
+
+- la carga de la galería en memoria (FaceGallery.load)
+- la latencia y el throughput de cada matcher:
+    legacy  bucle original de check_in_out (ORM + distancia por fila en Python)
+    exact   FaceGallery.match (fuerza bruta vectorizada)
+    batch   FaceGallery.match_many con lotes de --batch probes
+    ivf     FaceGallery.match con el índice aproximado
+- el costo de serialize_encoding / deserialize_encoding (binario y texto 1.0)
+
+No necesita MySQL. Los resultados se pueden guardar con --json para comparar
+versiones.
+
+Uso (desde backend/):
+    python -m benchmarks.recognition --sizes 1000 10000 100000 --per-employee 4
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import create_engine, insert, select
+from sqlalchemy.orm import Session, selectinload, sessionmaker
+
+from benchmarks.ann_recall import synthetic_gallery, synthetic_probes
+from database import Base
+from models import Company, Employee, FaceEncoding, Warehouse
+from services import face_index
+from services.face_gallery import FaceGallery
+from services.face_recognition_service import (
+    deserialize_encoding,
+    deserialize_encodings,
+    deserialize_legacy_encoding,
+    serialize_encoding,
+    serialize_legacy_encoding,
+)
+
+MATCHERS = ("legacy", "exact", "batch", "ivf")
+_INSERT_CHUNK = 5000
+
+
+def create_gallery_db(path: str, encodings: int, per_employee: int, warehouses: int = 1):
+    """
+    Crea una base SQLite con `encodings` encodings sintéticos. Retorna
+    (sessionmaker, centros por empleado); el centro i es el del empleado con id i + 1.
+    """
+    employees = max(1, encodings // per_employee)
+    centers, employee_index, vectors = synthetic_gallery(employees, per_employee)
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, autoflush=False)
+    with factory() as db:
+        db.add(Company(id=1, name="Benchmark"))
+        for warehouse_id in range(1, warehouses + 1):
+            db.add(Warehouse(id=warehouse_id, company_id=1, name=f"W{warehouse_id}"))
+        db.execute(
+            insert(Employee),
+            [
+                {
+                    "id": i + 1,
+                    "warehouse_id": i % warehouses + 1,
+                    "first_name": "Employee",
+                    "last_name": str(i + 1),
+                    "is_active": True,
+                }
+                for i in range(employees)
+            ],
+        )
+        for start in range(0, len(vectors), _INSERT_CHUNK):
+            db.execute(
+                insert(FaceEncoding),
+                [
+                    {"employee_id": int(employee) + 1, "encoding": serialize_encoding(vector)}
+                    for employee, vector in zip(
+                        employee_index[start : start + _INSERT_CHUNK],
+                        vectors[start : start + _INSERT_CHUNK],
+                    )
+                ],
+            )
+        db.commit()
+    return factory, centers
+
+
+def legacy_match(db: Session, probe: np.ndarray):
+    """
+    Bucle original de check_in_out: carga empleados con sus encodings por ORM
+    y calcula la distancia de cada encoding por separado
+    """
+    employees = db.execute(
+        select(Employee).options(selectinload(Employee.encodings))
+    ).scalars().all()
+    best_id, best_dist = None, 1e9
+    for e in employees:
+        if not e.encodings:
+            continue
+        distances = [
+            np.linalg.norm(deserialize_encoding(enc.encoding) - probe)
+            for enc in e.encodings
+        ]
+        min_dist = min(distances)
+        if min_dist < best_dist:
+            best_id, best_dist = e.id, min_dist
+    return best_id, best_dist
+
+
+def _timed(fn, count: int) -> float:
+    start = time.perf_counter()
+    fn()
+    return (time.perf_counter() - start) * 1000 / count
+
+
+def bench_matchers(factory, centers, matchers, queries: int, legacy_queries: int,
+                   batch: int) -> Dict[str, Dict[str, float]]:
+    truth, probes = synthetic_probes(centers, queries)
+    truth = truth + 1  # ids de empleado en la base empiezan en 1
+    results: Dict[str, Dict[str, float]] = {}
+
+    with factory() as db:
+        gallery = FaceGallery()
+        start = time.perf_counter()
+        gallery.load(db)
+        results["load"] = {"ms": (time.perf_counter() - start) * 1000}
+
+        for matcher in matchers:
+            found: List[int] = []
+            if matcher == "legacy":
+                count = min(legacy_queries, queries)
+                ms = _timed(
+                    lambda: found.extend(legacy_match(db, p)[0] for p in probes[:count]),
+                    count,
+                )
+            elif matcher == "batch":
+                count = queries
+                ms = _timed(
+                    lambda: found.extend(
+                        m.employee_id
+                        for i in range(0, queries, batch)
+                        for m in gallery.match_many(db, probes[i : i + batch])
+                    ),
+                    count,
+                )
+            else:
+                count = queries
+                previous = face_index.FACE_MATCH_MODE, face_index.FACE_ANN_MIN_GALLERY
+                if matcher == "ivf":
+                    face_index.FACE_MATCH_MODE, face_index.FACE_ANN_MIN_GALLERY = "ivf", 0
+                    start = time.perf_counter()
+                    gallery._get_index()
+                    results["ivf_build"] = {"ms": (time.perf_counter() - start) * 1000}
+                try:
+                    ms = _timed(
+                        lambda: found.extend(gallery.match(db, p).employee_id for p in probes),
+                        count,
+                    )
+                finally:
+                    face_index.FACE_MATCH_MODE, face_index.FACE_ANN_MIN_GALLERY = previous
+            accuracy = float(np.mean(np.array(found) == truth[:count]))
+            results[matcher] = {"ms": ms, "qps": 1000 / ms, "accuracy": accuracy}
+    return results
+
+
+def bench_serialization(count: int = 10000) -> Dict[str, Dict[str, float]]:
+    vectors = np.random.default_rng(0).normal(0, 0.1, (count, 128)).astype(np.float32)
+    binary = [serialize_encoding(v) for v in vectors]
+    text = [serialize_legacy_encoding(v) for v in vectors]
+
+    def per_item_us(fn):
+        start = time.perf_counter()
+        fn()
+        return (time.perf_counter() - start) * 1e6 / count
+
+    return {
+        "serialize": {
+            "binary_us": per_item_us(lambda: [serialize_encoding(v) for v in vectors]),
+            "text_us": per_item_us(lambda: [serialize_legacy_encoding(v) for v in vectors]),
+        },
+        "deserialize": {
+            "binary_us": per_item_us(lambda: [deserialize_encoding(b) for b in binary]),
+            "text_us": per_item_us(lambda: [deserialize_legacy_encoding(t) for t in text]),
+            "binary_matrix_us": per_item_us(lambda: deserialize_encodings(binary)),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--per-employee", type=int, default=4)
+    parser.add_argument("--warehouses", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--legacy-queries", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=16)
+    parser.add_argument("--matchers", nargs="+", choices=MATCHERS, default=list(MATCHERS))
+    parser.add_argument("--json", help="Guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    report = {"serialization": bench_serialization(), "galleries": {}}
+    ser = report["serialization"]
+    print(
+        f"serialize   binary {ser['serialize']['binary_us']:.2f} us  "
+        f"text {ser['serialize']['text_us']:.2f} us"
+    )
+    print(
+        f"deserialize binary {ser['deserialize']['binary_us']:.2f} us  "
+        f"text {ser['deserialize']['text_us']:.2f} us  "
+        f"matrix {ser['deserialize']['binary_matrix_us']:.3f} us/row"
+    )
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            factory, centers = create_gallery_db(
+                os.path.join(tmp, "gallery.db"), size, args.per_employee, args.warehouses
+            )
+            results = bench_matchers(
+                factory, centers, args.matchers, args.queries, args.legacy_queries, args.batch
+            )
+            factory.kw["bind"].dispose()
+        report["galleries"][size] = results
+
+        print(f"\nGallery: {size} encodings, {args.per_employee} per employee "
+              f"(load {results['load']['ms']:.0f} ms)")
+        print(f"{'matcher':<10}{'ms/query':>12}{'queries/s':>12}{'accuracy':>10}")
+        for matcher in args.matchers:
+            row = results[matcher]
+            print(f"{matcher:<10}{row['ms']:>12.3f}{row['qps']:>12.1f}{row['accuracy']:>10.3f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
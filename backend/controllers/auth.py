@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr, validator
 from typing import Optional
+from starlette.concurrency import run_in_threadpool
 
 from services import auth_service
 from database import get_db
@@ -46,7 +47,7 @@ class LoginResponse(BaseModel):
 
 
 @router.post("/register", status_code=status.HTTP_201_CREATED)
-def register_user(
+async def register_user(
     user_data: UserRegisterRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -80,7 +81,7 @@ def register_user(
         )
 
     try:
-        result = auth_service.register_user(
+        result = await auth_service.register_user(
             db=db,
             username=user_data.username,
             email=user_data.email,
@@ -100,32 +101,33 @@ def register_user(
         )
 
 
+def _has_admin(db: Session) -> bool:
+    from services.user_service import get_users
+    from services.role_service import get_role_by_name
+
+    admin_role = get_role_by_name(db, "admin")
+    if not admin_role:
+        return False
+    existing_admins = get_users(db, skip=0, limit=1)
+    return any(user.role_id == admin_role.id for user in existing_admins)
+
+
 @router.post("/setup-admin", status_code=status.HTTP_201_CREATED)
-def setup_first_admin(user_data: UserRegisterRequest, db: Session = Depends(get_db)):
+async def setup_first_admin(user_data: UserRegisterRequest, db: Session = Depends(get_db)):
     """
     Special endpoint to create the first system administrator
     Only works if there are no admin users in the system
     """
-    from services.user_service import get_users
-    from services.role_service import get_role_by_name
-
     # Verify if at least one admin already exists
-    admin_role = get_role_by_name(db, "admin")
-    if admin_role:
-        existing_admins = get_users(db, skip=0, limit=1)
-        admin_users = [
-            user for user in existing_admins if user.role_id == admin_role.id
-        ]
-
-        if admin_users:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="System already has admin users. Use /auth/register with proper authentication.",
-            )
+    if await run_in_threadpool(_has_admin, db):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="System already has admin users. Use /auth/register with proper authentication.",
+        )
 
     try:
         # Forzar role admin y company 1 para el setup inicial
-        result = auth_service.register_user(
+        result = await auth_service.register_user(
             db=db,
             username=user_data.username,
             email=user_data.email,
@@ -149,12 +151,12 @@ def setup_first_admin(user_data: UserRegisterRequest, db: Session = Depends(get_
 
 
 @router.post("/login", response_model=LoginResponse)
-def login_for_access_token(login_data: LoginRequest, db: Session = Depends(get_db)):
+async def login_for_access_token(login_data: LoginRequest, db: Session = Depends(get_db)):
     """
     Authenticate user and get access token
     """
     try:
-        result = auth_service.login(
+        result = await auth_service.login(
             db=db,
             username_or_email=login_data.username_or_email,
             password=login_data.password,
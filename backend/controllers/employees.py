@@ -1,4 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import binascii
+import os
+
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as StarletteUploadFile
 from sqlalchemy.orm import Session
 from typing import List, Optional
 
@@ -8,48 +14,94 @@ from schemas import (
     RegisterFaceRes,
     CheckReq,
     CheckRes,
+    CheckBatchReq,
+    CheckBatchRes,
     Employee,
     EmployeeCreate,
     EmployeeUpdate,
 )
-from services.face_recognition_service import (
-    compute_encoding,
-    serialize_encoding,
-    deserialize_encoding,
-    decide_event,
-)
-from services import employee_service
-from models import Employee as EmployeeModel, FaceEncoding, AccessLog
+from services.face_recognition_service import serialize_encoding
+from services.face_gallery import face_gallery
+from services.face_pipeline import face_pipeline
+from services import employee_service, encoding_set_service, presence_service
+from models import Employee as EmployeeModel, FaceEncoding
 from dependencies import get_current_user
+from utils.metrics import span
+from utils.rate_limiter import check_face_budget
 from models import User
 import numpy as np
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
 
 router = APIRouter()
 
 TOLERANCE = 0.6
+# Tamaño máximo de una imagen subida como multipart o cuerpo binario
+FACE_MAX_UPLOAD_BYTES = int(os.getenv("FACE_MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+
+
+def _decode_base64_image(image_base64: str) -> bytes:
+    try:
+        with span("base64_decode"):
+            return base64.b64decode(image_base64)
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=422, detail="Invalid base64 image.")
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail="Image is too large.")
+
+
+async def _read_upload(image: UploadFile) -> bytes:
+    if image.size is not None and image.size > FACE_MAX_UPLOAD_BYTES:
+        raise _too_large()
+    data = await image.read()
+    if len(data) > FACE_MAX_UPLOAD_BYTES:
+        raise _too_large()
+    return data
+
+
+async def _read_image_body(request: Request) -> bytes:
+    """
+    Imagen de la petición: campo `image` de un multipart/form-data o el cuerpo
+    binario completo (image/jpeg, image/png), leído por chunks sin pasar por base64
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        image = form.get("image")
+        if not isinstance(image, StarletteUploadFile):
+            raise HTTPException(status_code=422, detail="Missing 'image' file field.")
+        return await _read_upload(image)
+    if not content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=415, detail="Send multipart/form-data or an image/* body."
+        )
 
-
-@router.post("/register_face", response_model=RegisterFaceRes)
-def register_face(
-    req: RegisterFaceReq,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    enc = compute_encoding(req.image_base64)
-    enc_s = serialize_encoding(enc)
-
+    buffer = bytearray()
+    async for chunk in request.stream():
+        buffer.extend(chunk)
+        if len(buffer) > FACE_MAX_UPLOAD_BYTES:
+            raise _too_large()
+    return bytes(buffer)
+
+
+def _register_employee_face(
+    db: Session,
+    warehouse_id: int,
+    first_name: str,
+    last_name: str,
+    email: Optional[str],
+    enc: np.ndarray,
+) -> dict:
     emp = EmployeeModel(
-        warehouse_id=req.warehouse_id,
-        first_name=req.first_name,
-        last_name=req.last_name,
-        email=req.email,
+        warehouse_id=warehouse_id,
+        first_name=first_name,
+        last_name=last_name,
+        email=email,
     )
     db.add(emp)
     db.flush()
 
-    new_encoding = FaceEncoding(employee_id=emp.id, encoding=enc_s)
+    new_encoding = FaceEncoding(employee_id=emp.id, encoding=serialize_encoding(enc))
     db.add(new_encoding)
 
     db.commit()
@@ -62,63 +114,220 @@ def register_face(
     }
 
 
-@router.post("/check_in_out", response_model=CheckRes)
-def check_in_out(
-    req: CheckReq,
+def _check_probe(db: Session, probe: np.ndarray, warehouse_id: Optional[int]) -> dict:
+    with span("gallery_refresh"):
+        face_gallery.refresh(db)
+    if face_gallery.size(warehouse_id) == 0:
+        raise HTTPException(status_code=400, detail="No hay empleados registrados.")
+
+    with span("gallery_match"):
+        match = face_gallery.match(db, probe, warehouse_id=warehouse_id)
+    if match is None or match.distance > TOLERANCE:
+        return {"recognized": False}
+
+    with span("encoding_update"):
+        encoding_set_service.add_probe(db, match.employee_id, probe)
+
+    with span("record_event"):
+        log = presence_service.record_event(
+            db, match.employee_id, warehouse_id=warehouse_id or match.warehouse_id
+        )
+    event, ts = log.event_type, log.timestamp
+    with span("db_commit"):
+        db.commit()
+
+    return {
+        "recognized": True,
+        "employee_id": match.employee_id,
+        "name": match.name,
+        "distance": match.distance,
+        "event": event,
+        "ts": ts.isoformat(),
+    }
+
+
+def _check_frames(
+    db: Session, frames: List[np.ndarray], warehouse_id: Optional[int]
+) -> dict:
+    positions = [
+        (frame, face) for frame, encs in enumerate(frames) for face in range(len(encs))
+    ]
+    if not positions:
+        raise HTTPException(status_code=422, detail="No face detected in the image.")
+    probes = np.concatenate(frames)
+
+    with span("gallery_refresh"):
+        face_gallery.refresh(db)
+    if face_gallery.size(warehouse_id) == 0:
+        raise HTTPException(status_code=400, detail="No hay empleados registrados.")
+
+    with span("gallery_match"):
+        matches = face_gallery.match_many(db, probes, warehouse_id=warehouse_id)
+
+    best_rows = {}
+    for row, match in enumerate(matches):
+        if match is None or match.distance > TOLERANCE:
+            continue
+        best = best_rows.get(match.employee_id)
+        if best is None or match.distance < matches[best].distance:
+            best_rows[match.employee_id] = row
+
+    events = {}
+    for employee_id in sorted(best_rows):
+        best = matches[best_rows[employee_id]]
+        with span("encoding_update"):
+            encoding_set_service.add_probe(db, employee_id, probes[best_rows[employee_id]])
+        with span("record_event"):
+            log = presence_service.record_event(
+                db, employee_id, warehouse_id=warehouse_id or best.warehouse_id
+            )
+        events[employee_id] = (log.event_type, log.timestamp)
+    with span("db_commit"):
+        db.commit()
+
+    results = []
+    for (frame, face), match in zip(positions, matches):
+        if match is None or match.distance > TOLERANCE:
+            results.append({"frame": frame, "face": face, "recognized": False})
+            continue
+        event, ts = events[match.employee_id]
+        results.append(
+            {
+                "frame": frame,
+                "face": face,
+                "recognized": True,
+                "employee_id": match.employee_id,
+                "name": match.name,
+                "distance": match.distance,
+                "event": event,
+                "ts": ts.isoformat(),
+            }
+        )
+    return {"results": results}
+
+
+# Los endpoints de reconocimiento son async: la etapa CPU (detección y
+# encoding) se espera en el pool de procesos y el trabajo con la base de
+# datos, que es síncrono, se ejecuta en el threadpool.
+
+
+@router.post("/register_face", response_model=RegisterFaceRes)
+async def register_face(
+    request: Request,
+    req: RegisterFaceReq,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    probe = np.array(compute_encoding(req.image_base64), dtype=np.float32)
+    await run_in_threadpool(check_face_budget, request, req.warehouse_id, user_id=current_user.id)
+    enc = await face_pipeline.encode_face(_decode_base64_image(req.image_base64))
+    return await run_in_threadpool(
+        _register_employee_face,
+        db,
+        req.warehouse_id,
+        req.first_name,
+        req.last_name,
+        req.email,
+        enc,
+    )
 
-    query = select(EmployeeModel).options(selectinload(EmployeeModel.encodings))
-    if req.warehouse_id:
-        query = query.filter(EmployeeModel.warehouse_id == req.warehouse_id)
 
-    employees = db.execute(query).scalars().all()
+def _register_fields(values) -> tuple:
+    """
+    (warehouse_id, first_name, last_name, email) desde los campos del
+    formulario o la query string
+    """
+    try:
+        return (
+            int(values["warehouse_id"]),
+            values["first_name"],
+            values["last_name"],
+            values.get("email"),
+        )
+    except (KeyError, ValueError):
+        raise HTTPException(
+            status_code=422,
+            detail="warehouse_id, first_name and last_name are required.",
+        )
 
-    if not employees:
-        raise HTTPException(status_code=400, detail="No hay empleados registrados.")
 
-    best_id, best_name, best_dist = None, None, 1e9
-    for e in employees:
-        if not e.encodings:
-            continue
+@router.post("/register_face/upload", response_model=RegisterFaceRes)
+async def register_face_upload(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Igual que /register_face con la imagen como multipart (`image` y los datos
+    del empleado como campos del formulario) o como cuerpo binario image/*
+    con warehouse_id, first_name, last_name y email en la query string
+    """
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        values = await request.form()
+    else:
+        values = request.query_params
+    warehouse_id, first_name, last_name, email = _register_fields(values)
+
+    await run_in_threadpool(check_face_budget, request, warehouse_id, user_id=current_user.id)
+    enc = await face_pipeline.encode_face(await _read_image_body(request))
+    return await run_in_threadpool(
+        _register_employee_face, db, warehouse_id, first_name, last_name, email, enc
+    )
 
-        distances = [
-            np.linalg.norm(deserialize_encoding(enc.encoding) - probe)
-            for enc in e.encodings
-        ]
-        min_dist = min(distances) if distances else 1e9
-
-        if min_dist < best_dist:
-            best_id, best_name, best_dist = (
-                e.id,
-                f"{e.first_name} {e.last_name}",
-                min_dist,
-            )
 
-    if best_dist > TOLERANCE:
-        return {"recognized": False}
+@router.post("/check_in_out", response_model=CheckRes)
+async def check_in_out(
+    request: Request,
+    req: CheckReq,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    await run_in_threadpool(
+        check_face_budget, request, req.warehouse_id or current_user.warehouse_id, user_id=current_user.id
+    )
+    probe = await face_pipeline.encode_face(_decode_base64_image(req.image_base64))
+    return await run_in_threadpool(_check_probe, db, probe, req.warehouse_id)
 
-    recognized_employee = next((e for e in employees if e.id == best_id), None)
-    if recognized_employee:
-        enc_s = serialize_encoding(probe.tolist())
-        new_encoding = FaceEncoding(employee_id=best_id, encoding=enc_s)
-        db.add(new_encoding)
 
-    event = decide_event(db, best_id)
-    log = AccessLog(employee_id=best_id, warehouse_id=req.warehouse_id, event=event)
-    db.add(log)
-    db.commit()
+@router.post("/check_in_out/upload", response_model=CheckRes)
+async def check_in_out_upload(
+    request: Request,
+    warehouse_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Igual que /check_in_out con la imagen como multipart (`image`) o como
+    cuerpo binario image/jpeg; warehouse_id va en la query string
+    """
+    await run_in_threadpool(
+        check_face_budget, request, warehouse_id or current_user.warehouse_id, user_id=current_user.id
+    )
+    probe = await face_pipeline.encode_face(await _read_image_body(request))
+    return await run_in_threadpool(_check_probe, db, probe, warehouse_id)
 
-    return {
-        "recognized": True,
-        "employee_id": best_id,
-        "name": best_name,
-        "distance": float(best_dist),
-        "event": event,
-        "ts": log.ts.isoformat(),
-    }
+
+@router.post("/check_in_out/batch", response_model=CheckBatchRes)
+async def check_in_out_batch(
+    request: Request,
+    req: CheckBatchReq,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Reconoce todas las caras de varios frames en una sola petición.
+    Cada empleado reconocido registra un único evento aunque aparezca
+    en varios frames; se usa su match más cercano.
+    """
+    # Cada frame cuenta como un request para el presupuesto
+    await run_in_threadpool(
+        check_face_budget,
+        request, req.warehouse_id or current_user.warehouse_id,
+        cost=len(req.images_base64), user_id=current_user.id,
+    )
+    frames = await face_pipeline.encode_frames(
+        [_decode_base64_image(image) for image in req.images_base64]
+    )
+    return await run_in_threadpool(_check_frames, db, frames, req.warehouse_id)
 
 
 @router.get("/", response_model=List[Employee])
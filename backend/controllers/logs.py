@@ -1,4 +1,5 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
@@ -11,26 +12,82 @@ from models import User
 
 router = APIRouter()
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+EXPORT_FORMATS = {
+    "csv": (log_service.access_logs_csv, "text/csv; charset=utf-8"),
+    "ndjson": (log_service.access_logs_ndjson, "application/x-ndjson"),
+}
+
+
+def _parse_cursor(cursor: Optional[str]):
+    if cursor is None:
+        return None
+    try:
+        return log_service.decode_cursor(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def _set_next_cursor(response: Response, logs: list, limit: int) -> None:
+    # La siguiente página se pide con ?cursor=<valor>; sin header no hay más
+    cursor = log_service.next_cursor(logs, limit)
+    if cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
+
 
 @router.get("/access", response_model=List[AccessLog])
 def list_access_logs(
+    response: Response,
     employee_id: Optional[int] = None,
     warehouse_id: Optional[int] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return log_service.get_access_logs(
+    logs = log_service.get_access_logs(
         db,
         employee_id=employee_id,
         warehouse_id=warehouse_id,
         start_date=start_date,
         end_date=end_date,
         skip=skip,
-        limit=limit
+        limit=limit,
+        cursor=_parse_cursor(cursor)
+    )
+    _set_next_cursor(response, logs, limit)
+    return logs
+
+
+@router.get("/access/export")
+def export_access_logs(
+    employee_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Exporta los logs de acceso del rango completo sin paginar (CSV o NDJSON)
+    """
+    render, media_type = EXPORT_FORMATS[export_format]
+    batches = log_service.iter_access_log_batches(
+        db,
+        employee_id=employee_id,
+        warehouse_id=warehouse_id,
+        start_date=start_date,
+        end_date=end_date
+    )
+    return StreamingResponse(
+        render(batches),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="access_logs.{export_format}"'}
     )
 
 
@@ -56,19 +113,24 @@ def list_login_logs(
 
 @router.get("/user-login", response_model=List[UserLoginLog])
 def list_user_login_logs(
+    response: Response,
     user_id: Optional[int] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return log_service.get_user_login_logs(
+    logs = log_service.get_user_login_logs(
         db,
         user_id=user_id,
         start_date=start_date,
         end_date=end_date,
         skip=skip,
-        limit=limit
+        limit=limit,
+        cursor=_parse_cursor(cursor)
     )
+    _set_next_cursor(response, logs, limit)
+    return logs
@@ -1,15 +1,19 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from typing import Optional
-from datetime import datetime
+from datetime import date, datetime
 
 from database import get_db
 from services import report_service
+from services.hours_service import punch_range
+from services.report_cache import report_cache
 from dependencies import get_current_user
 from models import User
 
 router = APIRouter()
 
+MAX_HOURS_REPORT_DAYS = 366
+
 
 @router.get("/checkins")
 def get_checkin_report(
@@ -20,25 +24,34 @@ def get_checkin_report(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    results = report_service.get_employee_checkin_report(
-        db, 
-        employee_id=employee_id,
-        warehouse_id=warehouse_id,
-        start_date=start_date,
-        end_date=end_date
+    def compute():
+        results = report_service.get_employee_checkin_report(
+            db,
+            employee_id=employee_id,
+            warehouse_id=warehouse_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+
+        return [
+            {
+                "employee_id": r.employee_id,
+                "employee_name": r.employee_name,
+                "total_check_ins": r.total_check_ins,
+                "total_check_outs": r.total_check_outs,
+                "last_event": r.last_event,
+                "last_event_time": r.last_event_time.isoformat() if r.last_event_time else None
+            }
+            for r in results
+        ]
+
+    return report_cache.cached(
+        "checkins",
+        {"employee_id": employee_id, "warehouse_id": warehouse_id, "start_date": start_date, "end_date": end_date},
+        start_date,
+        end_date,
+        compute
     )
-    
-    return [
-        {
-            "employee_id": r.employee_id,
-            "employee_name": r.employee_name,
-            "total_check_ins": r.total_check_ins,
-            "total_check_outs": r.total_check_outs,
-            "last_event": r.last_event,
-            "last_event_time": r.last_event_time.isoformat() if r.last_event_time else None
-        }
-        for r in results
-    ]
 
 
 @router.get("/warehouse-activity")
@@ -49,22 +62,31 @@ def get_warehouse_activity(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    results = report_service.get_warehouse_activity_report(
-        db,
-        warehouse_id=warehouse_id,
-        start_date=start_date,
-        end_date=end_date
+    def compute():
+        results = report_service.get_warehouse_activity_report(
+            db,
+            warehouse_id=warehouse_id,
+            start_date=start_date,
+            end_date=end_date
+        )
+
+        return [
+            {
+                "warehouse_id": r.warehouse_id,
+                "warehouse_name": r.warehouse_name,
+                "total_events": r.total_events,
+                "unique_employees": r.unique_employees
+            }
+            for r in results
+        ]
+
+    return report_cache.cached(
+        "warehouse-activity",
+        {"warehouse_id": warehouse_id, "start_date": start_date, "end_date": end_date},
+        start_date,
+        end_date,
+        compute
     )
-    
-    return [
-        {
-            "warehouse_id": r.warehouse_id,
-            "warehouse_name": r.warehouse_name,
-            "total_events": r.total_events,
-            "unique_employees": r.unique_employees
-        }
-        for r in results
-    ]
 
 
 @router.get("/frequent-employees")
@@ -75,18 +97,75 @@ def get_frequent_employees(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    results = report_service.get_frequent_employees(
-        db,
-        warehouse_id=warehouse_id,
-        days=days,
-        limit=limit
+    def compute():
+        results = report_service.get_frequent_employees(
+            db,
+            warehouse_id=warehouse_id,
+            days=days,
+            limit=limit
+        )
+
+        return [
+            {
+                "employee_id": r.employee_id,
+                "employee_name": r.employee_name,
+                "total_events": r.total_events
+            }
+            for r in results
+        ]
+
+    # Rango relativo a ahora: siempre abierto, se renueva con el bucket de tiempo
+    return report_cache.cached(
+        "frequent-employees",
+        {"warehouse_id": warehouse_id, "days": days, "limit": limit},
+        None,
+        None,
+        compute
+    )
+
+
+@router.get("/hours")
+def get_hours(
+    start_date: date,
+    end_date: date,
+    employee_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+    period: str = Query("day", pattern="^(day|week)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date.")
+    if (end_date - start_date).days > MAX_HOURS_REPORT_DAYS:
+        raise HTTPException(status_code=400, detail=f"The range cannot exceed {MAX_HOURS_REPORT_DAYS} days.")
+
+    def compute():
+        results = report_service.get_hours_report(
+            db,
+            start_date,
+            end_date,
+            employee_id=employee_id,
+            warehouse_id=warehouse_id,
+            period=period
+        )
+
+        return [
+            {
+                "employee_id": r.employee_id,
+                "employee_name": r.employee_name,
+                "period_start": r.period_start.isoformat(),
+                "hours": r.hours,
+                "shifts": r.shifts,
+                "missing_punches": r.missing_punches
+            }
+            for r in results
+        ]
+
+    # Días locales: se invalida con el mismo rango UTC ampliado que lee el cálculo
+    return report_cache.cached(
+        "hours",
+        {"employee_id": employee_id, "warehouse_id": warehouse_id, "start_date": start_date,
+         "end_date": end_date, "period": period},
+        *punch_range(start_date, end_date),
+        compute
     )
-    
-    return [
-        {
-            "employee_id": r.id,
-            "employee_name": r.name,
-            "total_events": r.total_events
-        }
-        for r in results
-    ]
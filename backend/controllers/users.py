@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from pydantic import BaseModel, EmailStr
+from starlette.concurrency import run_in_threadpool
 
 from database import get_db
 from services import user_service
@@ -53,8 +54,25 @@ def get_current_user_info(current_user: User = Depends(get_current_user)):
     return current_user
 
 
+def _check_available(db: Session, user_data: UserCreateRequest) -> None:
+    # Check if username already exists
+    existing_user = user_service.get_user_by_username(db, user_data.username)
+    if existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username already registered",
+        )
+
+    # Check if email already exists
+    existing_email = user_service.get_user_by_email(db, user_data.email)
+    if existing_email:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
+        )
+
+
 @router.post("/", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_user(
+async def create_user(
     user_data: UserCreateRequest,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db),
@@ -82,22 +100,9 @@ def create_user(
             detail="Can only create users in your own warehouse",
         )
 
-    # Check if username already exists
-    existing_user = user_service.get_user_by_username(db, user_data.username)
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Username already registered",
-        )
-
-    # Check if email already exists
-    existing_email = user_service.get_user_by_email(db, user_data.email)
-    if existing_email:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
-        )
+    await run_in_threadpool(_check_available, db, user_data)
 
-    new_user = user_service.create_user(
+    new_user = await user_service.create_user(
         db=db,
         username=user_data.username,
         email=user_data.email,
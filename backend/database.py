@@ -1,8 +1,13 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 from dotenv import load_dotenv
 
+from utils.metrics import registry
+
 # 👇 Forzar a leer el .env de la raíz del proyecto
 
 load_dotenv( override=True)
@@ -13,13 +18,93 @@ DB_HOST = os.getenv("DB_HOST")
 DB_DATABASE = os.getenv("DB_DATABASE")
 DB_PORT = os.getenv("DB_PORT")
 
+# Pool de conexiones (un único engine por proceso)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # < wait_timeout de MySQL
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
+
 DATABASE_URL = (
     f"mysql+mysqldb://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_DATABASE}"
 )
-print("->" + DATABASE_URL)
+
+POOL_WAIT_SECONDS = registry.histogram(
+    "db_pool_wait_seconds",
+    "Time spent waiting for a connection from the pool in seconds",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+POOL_TIMEOUTS = registry.counter(
+    "db_pool_timeouts_total", "Connection checkouts that timed out waiting for the pool"
+)
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool que mide la espera de cada checkout y cuenta los timeouts
+    (pool agotado: pool_size + max_overflow conexiones en uso)
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - started)
+
+
+def create_db_engine(url: str = DATABASE_URL, **overrides) -> Engine:
+    """
+    Engine con el pool configurado por variables de entorno;
+    overrides reemplaza cualquier argumento de create_engine
+    """
+    options = dict(
+        poolclass=InstrumentedQueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=DB_POOL_PRE_PING,
+    )
+    options.update(overrides)
+    return create_engine(url, **options)
+
+
+def pool_status(db_engine: Engine) -> dict:
+    """
+    Estado actual del pool: conexiones en uso, libres y de overflow
+    """
+    pool = db_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": getattr(pool, "_max_overflow", 0),
+        "timeout": pool.timeout(),
+    }
+
 
 # Crear el engine
-engine = create_engine(DATABASE_URL)
+engine = create_db_engine()
+print("-> " + engine.url.render_as_string(hide_password=True))
+
+registry.gauge(
+    "db_pool_checked_out", "Connections currently checked out from the pool",
+    lambda: engine.pool.checkedout(),
+)
+registry.gauge(
+    "db_pool_checked_in", "Idle connections available in the pool",
+    lambda: engine.pool.checkedin(),
+)
+registry.gauge(
+    "db_pool_overflow", "Connections open beyond pool_size",
+    lambda: max(engine.pool.overflow(), 0),
+)
+registry.gauge("db_pool_size", "Configured pool_size", lambda: engine.pool.size())
 
 # Configurar la sesión
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -1,15 +1,21 @@
-from fastapi import Depends, HTTPException, status
+import os
+import secrets
+
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 
 from database import get_db
 from models import User
-from services import user_service
+from services.principal_cache import get_principal
 from utils import jwt_handler
 
 # Configurar OAuth2 para Swagger UI con el nombre del esquema de seguridad
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", scheme_name="BearerAuth")
 
+# Token estático para los scrapers de /metrics (vacío = endpoints de métricas deshabilitados)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
 
 def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
@@ -35,8 +41,8 @@ def get_current_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Obtener usuario por ID para mayor seguridad
-    user = user_service.get_user(db, user_id=user_id)
+    # Obtener usuario por ID para mayor seguridad (con rol, cacheado por unos segundos)
+    user = get_principal(db, user_id)
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -82,6 +88,24 @@ def require_role(required_role: str):
     return role_checker
 
 
+def require_metrics_token(request: Request) -> None:
+    """
+    Protege /metrics y /metrics/pool: sin METRICS_TOKEN responden 404 y con él
+    exigen `Authorization: Bearer <METRICS_TOKEN>`
+    """
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(
+        token.encode(), METRICS_TOKEN.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid metrics token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+
 # Dependencias específicas por rol
 require_admin = require_role("admin")
 require_manager = require_role("manager")
@@ -1,13 +1,13 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi import Request
-from sqlalchemy import create_engine
 import os
+import time
 
 # Panel de administración Vue.js integrado
-from database import SessionLocal, DATABASE_URL
+from database import SessionLocal, engine, pool_status, POOL_TIMEOUTS, POOL_WAIT_SECONDS
 from controllers import (
     employees,
     logs,
@@ -30,11 +30,14 @@ except ImportError:
     )
 
 from config.openapi_config import configure_openapi_schema, get_openapi_tags
-
-engine = create_engine(DATABASE_URL, future=True)
-print("🚀🚀🚀Engine created")
-print(DATABASE_URL)
-SessionLocal.configure(bind=engine)
+from services.encoding_set_service import start_compaction_worker
+from services.rollup_service import start_rollup_worker
+from services.face_gallery_sync import start_prune_worker
+from services.face_pipeline import face_pipeline
+from utils.security import password_hasher
+from utils.refresh_tokens import RefreshTokenService, start_housekeeping_worker
+from utils import metrics
+from dependencies import require_metrics_token
 
 app = FastAPI(
     title="Employee TIME TRACKER",
@@ -65,8 +68,33 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+
+@app.middleware("http")
+async def measure_request(request: Request, call_next):
+    """
+    Latencia por ruta y cabecera Server-Timing con los spans de la petición
+    """
+    token, spans = metrics.start_request()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        metrics.end_request(token)
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - start,
+        method=request.method,
+        route=route.path if route is not None else "unmatched",
+        status=response.status_code,
+    )
+    if spans and metrics.METRICS_SERVER_TIMING:
+        response.headers["Server-Timing"] = metrics.server_timing_header(spans)
+    return response
+
+
 app.include_router(auth.router, prefix="/auth", tags=["auth"])
 app.include_router(companies.router, prefix="/companies", tags=["companies"])
 app.include_router(roles.router, prefix="/roles", tags=["roles"])
@@ -124,6 +152,55 @@ else:
     print(f"⚠️ Admin panel directory not found: {admin_static_path}")
     print("💡 Build the frontend first: cd frontend && npm run build && npm run copy-to-www")
 
+@app.on_event("startup")
+def start_background_jobs():
+    # Compactación periódica de encodings (ENCODING_COMPACTION_INTERVAL > 0)
+    if start_compaction_worker(SessionLocal):
+        print("✅ Face encoding compaction job started")
+    # Purga de face_gallery_changes (siempre activa, independiente de la compactación)
+    if start_prune_worker(SessionLocal):
+        print("✅ Face gallery change pruning job started")
+    # Rollups diarios de access_logs para reportes (un solo worker a la vez vía GET_LOCK)
+    if start_rollup_worker(SessionLocal):
+        print("✅ Access log rollup job started")
+    # Volcado de last_used y limpieza por lotes de refresh tokens expirados
+    if start_housekeeping_worker(SessionLocal):
+        print("✅ Refresh token housekeeping job started")
+
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    face_pipeline.shutdown()
+    password_hasher.shutdown()
+    db = SessionLocal()
+    try:
+        RefreshTokenService.flush_last_used(db)
+    finally:
+        db.close()
+
+
 @app.get("/health")
 def health():
     return {"status": "ok"}
+
+
+@app.get(
+    "/metrics",
+    response_class=PlainTextResponse,
+    include_in_schema=False,
+    dependencies=[Depends(require_metrics_token)],
+)
+def prometheus_metrics():
+    return PlainTextResponse(
+        metrics.registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@app.get("/metrics/pool", include_in_schema=False, dependencies=[Depends(require_metrics_token)])
+def database_pool_metrics():
+    return {
+        **pool_status(engine),
+        "waits": POOL_WAIT_SECONDS.count(),
+        "wait_seconds_total": round(POOL_WAIT_SECONDS.total(), 6),
+        "timeouts": int(POOL_TIMEOUTS.value()),
+    }
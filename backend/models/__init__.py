@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Text, Boolean, JSON, LargeBinary, Index
 from sqlalchemy.orm import relationship
 import datetime
 from database import Base
@@ -110,6 +110,10 @@ class Employee(Base):
     encodings = relationship("FaceEncoding", back_populates="employee", cascade="all, delete-orphan")
     access_logs = relationship("AccessLog", back_populates="employee", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        Index("ix_employees_warehouse_id_is_active", "warehouse_id", "is_active"),  # Warehouse filters on logs/reports
+    )
+
 
 class FaceEncoding(Base):
     """Face encoding data for employees"""
@@ -118,8 +122,8 @@ class FaceEncoding(Base):
     id = Column(Integer, primary_key=True, autoincrement=True)
     employee_id = Column(Integer, ForeignKey("employees.id"), nullable=False)
     
-    encoding = Column(Text, nullable=False)
-    encoding_version = Column(String(20), default="1.0")  # New field for versioning
+    encoding = Column(LargeBinary, nullable=False)         # 128 float32 little-endian (512 bytes)
+    encoding_version = Column(String(20), default="2.0")  # "1.0" = legacy text, "2.0" = float32 bytes
     confidence_score = Column(String(10), nullable=True)   # New field for encoding quality
     
     created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
@@ -128,6 +132,15 @@ class FaceEncoding(Base):
     employee = relationship("Employee", back_populates="encodings")
 
 
+class FaceGalleryChange(Base):
+    """Change log of employees whose face gallery entries must be refreshed (cross-process signal)"""
+    __tablename__ = "face_gallery_changes"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)  # Generation number
+    employee_id = Column(Integer, nullable=False)  # No FK: the employee may have been deleted
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+
+
 class AccessLog(Base):
     """Enhanced access log with additional information (removed warehouse FK as it's implicit via employee)"""
     __tablename__ = "access_logs"
@@ -154,6 +167,53 @@ class AccessLog(Base):
     # Relationships
     employee = relationship("Employee", back_populates="access_logs")
 
+    __table_args__ = (
+        Index("ix_access_logs_employee_id_timestamp", "employee_id", "timestamp"),  # Per-employee history
+        Index("ix_access_logs_timestamp", "timestamp"),                              # Date ranges and latest-first lists
+    )
+
+
+class EmployeePresence(Base):
+    """Last access event per employee (in/out state), updated with every AccessLog insert"""
+    __tablename__ = "employee_presence"
+
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    last_event = Column(String(50), nullable=False)                # event_type of the last AccessLog
+    last_event_at = Column(DateTime, nullable=False)
+    last_access_log_id = Column(Integer, nullable=False)           # Version for conditional updates
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+
+class EmployeeDailyStats(Base):
+    """Per employee per UTC day access_logs rollup, rebuilt by services.rollup_service"""
+    __tablename__ = "employee_daily_stats"
+
+    day = Column(Date, primary_key=True)
+    employee_id = Column(Integer, ForeignKey("employees.id", ondelete="CASCADE"), primary_key=True)
+    warehouse_id = Column(Integer, ForeignKey("warehouses.id"), nullable=True)  # Employee's warehouse when rolled up
+    check_ins = Column(Integer, default=0, nullable=False)
+    check_outs = Column(Integer, default=0, nullable=False)
+    events = Column(Integer, default=0, nullable=False)
+    first_in = Column(DateTime, nullable=True)
+    last_out = Column(DateTime, nullable=True)
+    last_event = Column(String(50), nullable=True)
+    last_event_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_employee_daily_stats_employee_id_day", "employee_id", "day"),
+        Index("ix_employee_daily_stats_warehouse_id_day", "warehouse_id", "day"),
+    )
+
+
+class RollupDay(Base):
+    """Days already rolled up; reports read these from employee_daily_stats"""
+    __tablename__ = "rollup_days"
+
+    day = Column(Date, primary_key=True)
+    rolled_at = Column(DateTime, default=datetime.datetime.utcnow, nullable=False)
+    last_access_log_id = Column(Integer, nullable=True)  # Highest log id included
+
 
 class UserLoginLog(Base):
     """Enhanced user login tracking with additional security information"""
@@ -182,6 +242,11 @@ class UserLoginLog(Base):
     # Relationships
     user = relationship("User", back_populates="user_login_logs")
 
+    __table_args__ = (
+        Index("ix_user_login_logs_user_id_timestamp", "user_id", "timestamp"),
+        Index("ix_user_login_logs_timestamp", "timestamp"),
+    )
+
 
 class PasswordHistory(Base):
     """Password history for security compliance"""
@@ -201,7 +266,7 @@ class RefreshToken(Base):
     __tablename__ = "refresh_tokens"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     token = Column(String(255), nullable=False, unique=True, index=True)
     expires_at = Column(DateTime, nullable=False)
     is_revoked = Column(Boolean, default=False, nullable=False)
@@ -210,6 +275,11 @@ class RefreshToken(Base):
     # Tracking information
     user_agent = Column(String(500), nullable=True)
     ip_address = Column(String(45), nullable=True)  # IPv6 compatible
+    last_used = Column(DateTime, nullable=True)  # Written in batches by RefreshTokenService
+
+    __table_args__ = (
+        Index("ix_refresh_tokens_user_id_is_revoked_expires_at", "user_id", "is_revoked", "expires_at"),  # Active sessions and revocation
+    )
 
     # Relationships
     user = relationship("User")
\ No newline at end of file
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional, List, Literal
 import datetime
 
@@ -33,6 +33,20 @@ class CheckRes(BaseModel):
     ts: Optional[str] = None
 
 
+class CheckBatchReq(BaseModel):
+    images_base64: List[str] = Field(..., min_length=1, max_length=16)
+    warehouse_id: Optional[int] = None
+
+
+class CheckBatchFace(CheckRes):
+    frame: int
+    face: int
+
+
+class CheckBatchRes(BaseModel):
+    results: List[CheckBatchFace]
+
+
 # ========== Company Schemas ==========
 
 
@@ -244,9 +258,9 @@ class UserLoginLog(BaseModel):
 class AccessLog(BaseModel):
     id: int
     employee_id: int
-    warehouse_id: Optional[int] = None
-    event: str
-    ts: datetime.datetime
+    event_type: str
+    access_method: Optional[str] = None
+    timestamp: datetime.datetime
 
     class Config:
         from_attributes = True
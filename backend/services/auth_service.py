@@ -1,29 +1,22 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, status
 from services.user_service import get_user_by_username, get_user_by_email
-from utils.security import verify_password
+from starlette.concurrency import run_in_threadpool
+from utils.security import verify_password_async
 from utils.jwt_handler import create_access_token
 
 
-def login(db: Session, username_or_email: str, password: str) -> dict:
-    """
-    Authenticate user by username or email
-    """
+def _find_user(db: Session, username_or_email: str):
     # Intentar por username primero
     user = get_user_by_username(db, username_or_email)
 
     # Si no se encuentra por username, intentar por email
     if not user:
         user = get_user_by_email(db, username_or_email)
+    return user
 
-    # Verify if user exists and password is correct
-    if not user or not verify_password(password, user.password):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect username/email or password",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
 
+def _login_response(user) -> dict:
     # Verify if user is active
     if not user.is_active:
         raise HTTPException(
@@ -57,21 +50,27 @@ def login(db: Session, username_or_email: str, password: str) -> dict:
     }
 
 
-def register_user(
-    db: Session,
-    username: str,
-    email: str,
-    password: str,
-    first_name: str = None,
-    last_name: str = None,
-    warehouse_id: int = None,
-    role_id: int = 3,  # Default role 'employee'
-) -> dict:
+async def login(db: Session, username_or_email: str, password: str) -> dict:
     """
-    Register a new user
+    Authenticate user by username or email
+    La base de datos se consulta en el threadpool y bcrypt corre en el
+    executor de contraseñas, así el login no retiene un hilo del threadpool
+    mientras verifica
     """
-    from services.user_service import create_user
+    user = await run_in_threadpool(_find_user, db, username_or_email)
+
+    # Verify if user exists and password is correct
+    if not user or not await verify_password_async(password, user.password):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username/email or password",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    return await run_in_threadpool(_login_response, user)
 
+
+def _check_available(db: Session, username: str, email: str) -> None:
     # Check if username already exists
     existing_user = get_user_by_username(db, username)
     if existing_user:
@@ -87,8 +86,27 @@ def register_user(
             status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered"
         )
 
+
+async def register_user(
+    db: Session,
+    username: str,
+    email: str,
+    password: str,
+    first_name: str = None,
+    last_name: str = None,
+    warehouse_id: int = None,
+    role_id: int = 3,  # Default role 'employee'
+) -> dict:
+    """
+    Register a new user
+    Igual que login: consultas en el threadpool y bcrypt en el executor
+    """
+    from services.user_service import create_user
+
+    await run_in_threadpool(_check_available, db, username, email)
+
     # Create the user
-    user = create_user(
+    user = await create_user(
         db=db,
         username=username,
         email=email,
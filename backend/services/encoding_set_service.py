@@ -0,0 +1,209 @@
+"""
+Gestión del conjunto acotado de encodings por empleado
+
+En lugar de agregar un FaceEncoding en cada check_in_out, sólo se guarda un
+probe si aporta diversidad (está lejos de los encodings existentes) y el
+conjunto nunca supera MAX_ENCODINGS_PER_EMPLOYEE. El encoding de registro
+(el más antiguo) se conserva siempre como ancla.
+"""
+
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from models import FaceEncoding
+from services.face_gallery_sync import record_change
+from services.face_recognition_service import (
+    ENCODING_DIM,
+    deserialize_encodings,
+    serialize_encoding,
+)
+
+MAX_ENCODINGS_PER_EMPLOYEE = int(os.getenv("MAX_ENCODINGS_PER_EMPLOYEE", "8"))
+# Distancia mínima a los encodings existentes para considerar un probe "nuevo"
+MIN_NOVELTY_DISTANCE = float(os.getenv("ENCODING_MIN_NOVELTY_DISTANCE", "0.2"))
+# Intervalo del job de compactación en segundos (0 = deshabilitado)
+COMPACTION_INTERVAL_SECONDS = int(os.getenv("ENCODING_COMPACTION_INTERVAL", "0"))
+
+
+@dataclass
+class EncodingSetUpdate:
+    """Resultado de intentar agregar un probe al conjunto de un empleado"""
+
+    added: Optional[FaceEncoding] = None
+    evicted_ids: List[int] = field(default_factory=list)
+
+
+def _pairwise_distances(vectors: np.ndarray) -> np.ndarray:
+    sq_norms = np.einsum("ij,ij->i", vectors, vectors)
+    sq_dist = sq_norms[:, None] - 2.0 * (vectors @ vectors.T) + sq_norms[None, :]
+    return np.sqrt(np.maximum(sq_dist, 0.0))
+
+
+def most_redundant_index(vectors: np.ndarray) -> int:
+    """
+    Índice del encoding más redundante (menor distancia a su vecino más cercano),
+    sin considerar el ancla en la posición 0. En empate se elige el más antiguo.
+    """
+    distances = _pairwise_distances(vectors)
+    np.fill_diagonal(distances, np.inf)
+    nearest = distances.min(axis=1)
+    nearest[0] = np.inf
+    # argmin devuelve el primer mínimo: las filas están ordenadas por antigüedad
+    return int(np.argmin(nearest))
+
+
+def select_diverse(
+    vectors: np.ndarray,
+    max_size: Optional[int] = None,
+    min_distance: Optional[float] = None,
+) -> List[int]:
+    """
+    Elige qué filas conservar de un conjunto ordenado por antigüedad.
+
+    Conserva el ancla (fila 0) y recorre el resto del más nuevo al más antiguo,
+    agregando cada encoding que esté a min_distance o más de los ya elegidos.
+    """
+    max_size = max_size or MAX_ENCODINGS_PER_EMPLOYEE
+    min_distance = MIN_NOVELTY_DISTANCE if min_distance is None else min_distance
+    if len(vectors) == 0:
+        return []
+    keep = [0]
+    for index in range(len(vectors) - 1, 0, -1):
+        if len(keep) >= max_size:
+            break
+        distances = np.linalg.norm(vectors[keep] - vectors[index], axis=1)
+        if distances.min() >= min_distance:
+            keep.append(index)
+    return sorted(keep)
+
+
+def _load_set(db: Session, employee_id: int):
+    rows = db.execute(
+        select(FaceEncoding.id, FaceEncoding.encoding)
+        .where(FaceEncoding.employee_id == employee_id)
+        .order_by(FaceEncoding.created_at, FaceEncoding.id)
+    ).all()
+    ids = [row_id for row_id, _ in rows]
+    vectors = (
+        deserialize_encodings([encoding for _, encoding in rows])
+        if rows
+        else np.empty((0, ENCODING_DIM), dtype=np.float32)
+    )
+    return ids, vectors
+
+
+def add_probe(db: Session, employee_id: int, probe) -> EncodingSetUpdate:
+    """
+    Agrega el probe al conjunto del empleado si aporta diversidad, expulsando
+    el encoding más redundante cuando el conjunto está lleno.
+    No hace commit: los cambios se confirman con la transacción del check.
+    """
+    probe = np.asarray(probe, dtype=np.float32)
+    ids, vectors = _load_set(db, employee_id)
+    update = EncodingSetUpdate()
+
+    if len(vectors):
+        nearest = float(np.linalg.norm(vectors - probe, axis=1).min())
+        if nearest < MIN_NOVELTY_DISTANCE:
+            return update
+
+    if len(ids) >= MAX_ENCODINGS_PER_EMPLOYEE:
+        victim = most_redundant_index(np.vstack([vectors, probe[None, :]]))
+        if victim == len(ids):
+            # El probe es el más redundante del conjunto: no vale la pena guardarlo
+            return update
+        db.query(FaceEncoding).filter(FaceEncoding.id == ids[victim]).delete(
+            synchronize_session=False
+        )
+        record_change(db, [employee_id])
+        update.evicted_ids.append(ids[victim])
+
+    update.added = FaceEncoding(
+        employee_id=employee_id, encoding=serialize_encoding(probe)
+    )
+    db.add(update.added)
+    return update
+
+
+def compact_employee(db: Session, employee_id: int) -> int:
+    """
+    Reduce el conjunto de un empleado a un subconjunto diverso y acotado.
+    Retorna la cantidad de encodings eliminados.
+    """
+    ids, vectors = _load_set(db, employee_id)
+    keep = set(select_diverse(vectors))
+    to_delete = [row_id for index, row_id in enumerate(ids) if index not in keep]
+    if to_delete:
+        db.query(FaceEncoding).filter(FaceEncoding.id.in_(to_delete)).delete(
+            synchronize_session=False
+        )
+        record_change(db, [employee_id])
+        db.commit()
+    return len(to_delete)
+
+
+def get_bloated_employee_ids(db: Session, max_size: Optional[int] = None) -> List[int]:
+    max_size = max_size or MAX_ENCODINGS_PER_EMPLOYEE
+    return list(
+        db.execute(
+            select(FaceEncoding.employee_id)
+            .group_by(FaceEncoding.employee_id)
+            .having(func.count(FaceEncoding.id) > max_size)
+        ).scalars()
+    )
+
+
+def compact_all(db: Session) -> int:
+    """
+    Compacta todos los empleados con más encodings que el máximo permitido.
+    Hace commit por empleado para no mantener locks largos.
+    """
+    removed = 0
+    for employee_id in get_bloated_employee_ids(db):
+        removed += compact_employee(db, employee_id)
+    return removed
+
+
+def start_compaction_worker(
+    session_factory, interval_seconds: int = COMPACTION_INTERVAL_SECONDS
+) -> Optional[threading.Thread]:
+    """
+    Lanza un hilo daemon que ejecuta compact_all periódicamente
+    """
+    if interval_seconds <= 0:
+        return None
+
+    def run():
+        while True:
+            time.sleep(interval_seconds)
+            db = session_factory()
+            try:
+                removed = compact_all(db)
+                if removed:
+                    print(f"🧹 Encoding compaction removed {removed} encodings")
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Encoding compaction failed: {e}")
+            finally:
+                db.close()
+
+    worker = threading.Thread(target=run, name="encoding-compaction", daemon=True)
+    worker.start()
+    return worker
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    session = SessionLocal()
+    try:
+        print(f"Removed {compact_all(session)} redundant face encodings")
+    finally:
+        session.close()
@@ -0,0 +1,424 @@
+"""
+Galería de encodings faciales residente en memoria
+
+Mantiene todos los encodings de empleados activos como una matriz float32
+contigua por warehouse, con un array paralelo de employee_ids, de modo que
+un match sea un único cálculo de distancias vectorizado más un argmin.
+"""
+
+import os
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import select, false, func
+from sqlalchemy.orm import Session
+
+from models import Employee, FaceEncoding, FaceGalleryChange
+from services import face_index
+from services import face_gallery_sync  # noqa: F401 registra los hooks de sesión
+from services.face_recognition_service import ENCODING_DIM, deserialize_encodings
+
+_INITIAL_CAPACITY = 64
+
+# Cada cuántos segundos consultar face_gallery_changes por cambios de otros procesos
+GALLERY_POLL_INTERVAL = float(os.getenv("GALLERY_POLL_INTERVAL", "1.0"))
+# Con más cambios pendientes que esto, conviene recargar la galería completa
+_MAX_INCREMENTAL_CHANGES = 1000
+
+
+@dataclass
+class GalleryMatch:
+    employee_id: int
+    name: str
+    distance: float
+    warehouse_id: Optional[int] = None
+
+
+class WarehouseGallery:
+    """
+    Bloque de encodings de un warehouse.
+
+    Las filas [0, size) de `_vectors` son válidas. Los appends escriben en la
+    capacidad libre y sólo reasignan al crecer, así que un lector que tomó un
+    snapshot con `view()` nunca ve filas a medio escribir.
+    """
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        capacity = max(capacity, 1)
+        self._vectors = np.empty((capacity, ENCODING_DIM), dtype=np.float32)
+        self._sq_norms = np.empty(capacity, dtype=np.float32)
+        self._employee_ids = np.empty(capacity, dtype=np.int64)
+        self.size = 0
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self._vectors)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        vectors = np.empty((capacity, ENCODING_DIM), dtype=np.float32)
+        sq_norms = np.empty(capacity, dtype=np.float32)
+        employee_ids = np.empty(capacity, dtype=np.int64)
+        vectors[: self.size] = self._vectors[: self.size]
+        sq_norms[: self.size] = self._sq_norms[: self.size]
+        employee_ids[: self.size] = self._employee_ids[: self.size]
+        self._vectors, self._sq_norms, self._employee_ids = (
+            vectors,
+            sq_norms,
+            employee_ids,
+        )
+
+    def append(self, employee_ids: np.ndarray, vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        count = len(vectors)
+        if count == 0:
+            return
+        self._grow(self.size + count)
+        end = self.size + count
+        self._vectors[self.size : end] = vectors
+        self._sq_norms[self.size : end] = np.einsum("ij,ij->i", vectors, vectors)
+        self._employee_ids[self.size : end] = employee_ids
+        self.size = end
+
+    def without_employee(self, employee_id: int) -> "WarehouseGallery":
+        """
+        Copia del bloque sin las filas del empleado (el original no se modifica)
+        """
+        vectors, _, employee_ids = self.view()
+        keep = employee_ids != employee_id
+        block = WarehouseGallery(capacity=max(int(keep.sum()) * 2, _INITIAL_CAPACITY))
+        block.append(employee_ids[keep], vectors[keep])
+        return block
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        size = self.size
+        return (
+            self._vectors[:size],
+            self._sq_norms[:size],
+            self._employee_ids[:size],
+        )
+
+    def nearest(self, probe: np.ndarray) -> Optional[Tuple[int, float]]:
+        """
+        Retorna (employee_id, distancia euclídea) del encoding más cercano
+        """
+        vectors, sq_norms, employee_ids = self.view()
+        if len(vectors) == 0:
+            return None
+        # ||v - p||^2 = ||v||^2 - 2 v·p + ||p||^2 con las normas precalculadas
+        sq_dist = sq_norms - 2.0 * (vectors @ probe) + float(probe @ probe)
+        best = int(np.argmin(sq_dist))
+        return int(employee_ids[best]), float(np.sqrt(max(sq_dist[best], 0.0)))
+
+    def nearest_many(self, probes: np.ndarray) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Versión por lotes de `nearest`: una sola multiplicación de matrices
+        (m, 128) x (128, n). Retorna (employee_ids, distancias), una fila por probe.
+        """
+        vectors, sq_norms, employee_ids = self.view()
+        if len(vectors) == 0:
+            return None
+        probe_sq = np.einsum("ij,ij->i", probes, probes)
+        sq_dist = sq_norms[None, :] - 2.0 * (probes @ vectors.T) + probe_sq[:, None]
+        best = np.argmin(sq_dist, axis=1)
+        best_sq = sq_dist[np.arange(len(probes)), best]
+        return employee_ids[best], np.sqrt(np.maximum(best_sq, 0.0))
+
+
+class FaceGallery:
+    """
+    Galería de todos los warehouses, cargada perezosamente desde la base de datos.
+
+    Se mantiene sincronizada de forma incremental: los hooks de
+    services.face_gallery_sync marcan empleados como pendientes y `refresh`
+    re-lee sólo esos empleados. Los cambios hechos por otros procesos se
+    detectan consultando face_gallery_changes cada GALLERY_POLL_INTERVAL.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._warehouses: Dict[int, WarehouseGallery] = {}
+        self._names: Dict[int, str] = {}
+        self._employee_warehouses: Dict[int, int] = {}
+        self._loaded = False
+        # Índice aproximado para búsquedas sin warehouse (FACE_MATCH_MODE=ivf)
+        self._index: Optional[face_index.IVFIndex] = None
+        # Versión por warehouse: se incrementa con cada cambio aplicado a su bloque
+        self._versions: Dict[int, int] = defaultdict(int)
+        self._stale: Set[int] = set()
+        self._generation = 0
+        self._last_poll = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    @property
+    def generation(self) -> int:
+        """Último id de face_gallery_changes aplicado"""
+        return self._generation
+
+    def version(self, warehouse_id: int) -> int:
+        return self._versions[warehouse_id]
+
+    def load(self, db: Session) -> None:
+        """
+        Carga la galería completa con una sola query plana (sin ORM por fila)
+        """
+        # La generación se lee antes del snapshot: un cambio concurrente se re-aplica
+        generation = db.execute(select(func.max(FaceGalleryChange.id))).scalar() or 0
+        rows = db.execute(
+            select(
+                FaceEncoding.employee_id,
+                FaceEncoding.encoding,
+                Employee.warehouse_id,
+                Employee.first_name,
+                Employee.last_name,
+            )
+            .join(Employee, Employee.id == FaceEncoding.employee_id)
+            .where(Employee.is_active.is_not(false()))
+            .order_by(Employee.warehouse_id, FaceEncoding.id)
+        ).all()
+
+        grouped: Dict[int, Tuple[List[int], list]] = {}
+        names: Dict[int, str] = {}
+        employee_warehouses: Dict[int, int] = {}
+        for employee_id, encoding, warehouse_id, first_name, last_name in rows:
+            ids, encodings = grouped.setdefault(warehouse_id, ([], []))
+            ids.append(employee_id)
+            encodings.append(encoding)
+            names[employee_id] = f"{first_name} {last_name}"
+            employee_warehouses[employee_id] = warehouse_id
+
+        warehouses: Dict[int, WarehouseGallery] = {}
+        for warehouse_id, (ids, encodings) in grouped.items():
+            block = WarehouseGallery(capacity=len(ids) * 2)
+            block.append(np.asarray(ids, dtype=np.int64), deserialize_encodings(encodings))
+            warehouses[warehouse_id] = block
+
+        with self._lock:
+            self._warehouses = warehouses
+            self._names = names
+            self._employee_warehouses = employee_warehouses
+            self._index = None
+            for warehouse_id in warehouses:
+                self._versions[warehouse_id] += 1
+            self._stale = set()
+            self._generation = generation
+            self._last_poll = time.monotonic()
+            self._loaded = True
+
+    def ensure_loaded(self, db: Session) -> None:
+        if not self._loaded:
+            self.load(db)
+
+    def mark_stale(self, employee_ids: Iterable[int]) -> None:
+        """
+        Marca empleados cuyos encodings deben re-leerse en la próxima consulta
+        """
+        with self._lock:
+            if self._loaded:
+                self._stale.update(employee_ids)
+
+    def poll_changes(self, db: Session) -> None:
+        """
+        Incorpora los cambios registrados por otros procesos desde la última generación
+        """
+        rows = db.execute(
+            select(FaceGalleryChange.id, FaceGalleryChange.employee_id)
+            .where(FaceGalleryChange.id > self._generation)
+            .order_by(FaceGalleryChange.id)
+            .limit(_MAX_INCREMENTAL_CHANGES)
+        ).all()
+        self._last_poll = time.monotonic()
+        if len(rows) >= _MAX_INCREMENTAL_CHANGES:
+            self.load(db)
+            return
+        if rows:
+            with self._lock:
+                self._stale.update(employee_id for _, employee_id in rows)
+                self._generation = max(self._generation, rows[-1][0])
+
+    def refresh(self, db: Session) -> None:
+        """
+        Carga la galería si hace falta, consulta cambios externos y aplica los pendientes
+        """
+        if not self._loaded:
+            self.load(db)
+            return
+        if time.monotonic() - self._last_poll >= GALLERY_POLL_INTERVAL:
+            self.poll_changes(db)
+        if self._stale:
+            with self._lock:
+                stale, self._stale = self._stale, set()
+            for employee_id in stale:
+                self.reload_employee(db, employee_id)
+
+    def invalidate(self) -> None:
+        """
+        Descarta la galería; la siguiente consulta la recarga desde la base de datos
+        """
+        with self._lock:
+            self._warehouses = {}
+            self._names = {}
+            self._employee_warehouses = {}
+            self._index = None
+            self._loaded = False
+
+    def add_encoding(
+        self, warehouse_id: int, employee_id: int, name: str, encoding
+    ) -> None:
+        """
+        Agrega un encoding recién persistido sin recargar la galería
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            block = self._warehouses.get(warehouse_id)
+            if block is None:
+                block = self._warehouses[warehouse_id] = WarehouseGallery()
+            employee_ids = np.array([employee_id], dtype=np.int64)
+            block.append(employee_ids, encoding)
+            self._versions[warehouse_id] += 1
+            self._names[employee_id] = name
+            self._employee_warehouses[employee_id] = warehouse_id
+            if self._index is not None:
+                self._index.add(employee_ids, encoding)
+
+    def remove_employee(self, employee_id: int) -> None:
+        """
+        Quita todos los encodings de un empleado de la galería
+        """
+        with self._lock:
+            if not self._loaded:
+                return
+            for warehouse_id, block in list(self._warehouses.items()):
+                if np.any(block.view()[2] == employee_id):
+                    self._warehouses[warehouse_id] = block.without_employee(employee_id)
+                    self._versions[warehouse_id] += 1
+            self._names.pop(employee_id, None)
+            self._employee_warehouses.pop(employee_id, None)
+            if self._index is not None:
+                self._index.remove_employee(employee_id)
+
+    def reload_employee(self, db: Session, employee_id: int) -> None:
+        """
+        Reemplaza los encodings de un empleado con los persistidos en la base de datos
+        """
+        if not self._loaded:
+            return
+        employee = db.get(Employee, employee_id)
+        rows = db.execute(
+            select(FaceEncoding.encoding)
+            .where(FaceEncoding.employee_id == employee_id)
+            .order_by(FaceEncoding.id)
+        ).scalars().all()
+
+        self.remove_employee(employee_id)
+        if employee is None or employee.is_active is False or not rows:
+            return
+        vectors = deserialize_encodings(rows)
+        with self._lock:
+            block = self._warehouses.get(employee.warehouse_id)
+            if block is None:
+                block = self._warehouses[employee.warehouse_id] = WarehouseGallery()
+            employee_ids = np.full(len(vectors), employee_id, dtype=np.int64)
+            block.append(employee_ids, vectors)
+            self._versions[employee.warehouse_id] += 1
+            self._names[employee_id] = f"{employee.first_name} {employee.last_name}"
+            self._employee_warehouses[employee_id] = employee.warehouse_id
+            if self._index is not None:
+                self._index.add(employee_ids, vectors)
+
+    def match(
+        self, db: Session, probe, warehouse_id: Optional[int] = None
+    ) -> Optional[GalleryMatch]:
+        """
+        Busca el encoding más cercano al probe, restringido a un warehouse si se indica
+        """
+        return self.match_many(db, [probe], warehouse_id=warehouse_id)[0]
+
+    def match_many(
+        self, db: Session, probes, warehouse_id: Optional[int] = None
+    ) -> List[Optional[GalleryMatch]]:
+        """
+        Busca el encoding más cercano a cada probe (una fila por cara) en un
+        único cálculo de distancias por warehouse
+        """
+        self.refresh(db)
+        probes = np.asarray(probes, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        count = len(probes)
+        if count == 0:
+            return []
+
+        if warehouse_id:
+            block = self._warehouses.get(warehouse_id)
+            blocks = [block] if block is not None else []
+        else:
+            blocks = list(self._warehouses.values())
+
+        best_ids = np.full(count, -1, dtype=np.int64)
+        best_dist = np.full(count, np.inf)
+        index = self._get_index() if not warehouse_id else None
+        if index is not None:
+            for row, probe in enumerate(probes):
+                found = index.search(probe)
+                if found is not None:
+                    best_ids[row], best_dist[row] = found
+        else:
+            for block in blocks:
+                candidate = block.nearest_many(probes)
+                if candidate is None:
+                    continue
+                ids, dist = candidate
+                better = dist < best_dist
+                best_ids[better] = ids[better]
+                best_dist[better] = dist[better]
+
+        return [
+            GalleryMatch(
+                employee_id=int(employee_id),
+                name=self._names.get(int(employee_id), ""),
+                distance=float(distance),
+                warehouse_id=self._employee_warehouses.get(int(employee_id)),
+            )
+            if employee_id >= 0
+            else None
+            for employee_id, distance in zip(best_ids, best_dist)
+        ]
+
+    def _get_index(self) -> Optional[face_index.IVFIndex]:
+        """
+        Índice aproximado sobre todos los warehouses, construido de forma perezosa.
+        Sólo se usa en modo "ivf" y para galerías de al menos FACE_ANN_MIN_GALLERY.
+        """
+        if face_index.FACE_MATCH_MODE != "ivf":
+            return None
+        if self.size() < face_index.FACE_ANN_MIN_GALLERY:
+            return None
+        with self._lock:
+            index = self._index
+            # Re-entrenar los centroides si la galería creció mucho desde el build
+            if index is None or index.size > 4 * index.trained_size:
+                views = [block.view() for block in self._warehouses.values()]
+                index = face_index.IVFIndex()
+                index.build(
+                    np.concatenate([employee_ids for _, _, employee_ids in views]),
+                    np.concatenate([vectors for vectors, _, _ in views]),
+                )
+                self._index = index
+            return index
+
+    def size(self, warehouse_id: Optional[int] = None) -> int:
+        if warehouse_id:
+            block = self._warehouses.get(warehouse_id)
+            return block.size if block else 0
+        return sum(block.size for block in self._warehouses.values())
+
+
+# Instancia global de la galería (una por proceso)
+face_gallery = FaceGallery()
@@ -0,0 +1,132 @@
+"""
+Sincronización de la galería facial con los cambios en la base de datos
+
+Hooks de sesión de SQLAlchemy detectan cambios en Employee y FaceEncoding.
+En el mismo flush se inserta una fila en face_gallery_changes (el id es el
+número de generación que los demás procesos consultan de forma perezosa) y,
+tras el commit, los empleados afectados se marcan como pendientes en la
+galería local para re-leer sólo sus filas.
+"""
+
+import datetime
+import os
+import threading
+import time
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import delete, event, insert, inspect
+from sqlalchemy.orm import Session
+
+from models import Employee, FaceEncoding, FaceGalleryChange
+
+# Cambios de estos campos de Employee afectan a la galería
+_EMPLOYEE_FIELDS = ("is_active", "warehouse_id", "first_name", "last_name")
+_PENDING_KEY = "face_gallery_pending"
+
+# Antigüedad máxima de las filas de face_gallery_changes
+GALLERY_CHANGE_RETENTION_HOURS = int(os.getenv("GALLERY_CHANGE_RETENTION_HOURS", "24"))
+# Intervalo de la purga de face_gallery_changes en segundos (0 = deshabilitada)
+GALLERY_CHANGE_PRUNE_INTERVAL_SECONDS = int(os.getenv("GALLERY_CHANGE_PRUNE_INTERVAL_SECONDS", "3600"))
+
+
+def record_change(session: Session, employee_ids: Iterable[int]) -> None:
+    """
+    Registra que la galería de estos empleados cambió en la transacción actual.
+    Usar explícitamente tras deletes/updates masivos que no pasan por el flush.
+    """
+    employee_ids = {int(e) for e in employee_ids if e is not None}
+    if not employee_ids:
+        return
+    session.info.setdefault(_PENDING_KEY, set()).update(employee_ids)
+    session.connection().execute(
+        insert(FaceGalleryChange),
+        [
+            {"employee_id": employee_id, "created_at": datetime.datetime.utcnow()}
+            for employee_id in sorted(employee_ids)
+        ],
+    )
+
+
+def _employee_changed(employee: Employee) -> bool:
+    state = inspect(employee)
+    return any(state.attrs[name].history.has_changes() for name in _EMPLOYEE_FIELDS)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    changed: Set[int] = set()
+
+    for obj in session.new:
+        if isinstance(obj, FaceEncoding):
+            changed.add(obj.employee_id)
+    for obj in session.dirty:
+        if isinstance(obj, Employee) and _employee_changed(obj):
+            changed.add(obj.id)
+        elif isinstance(obj, FaceEncoding):
+            changed.add(obj.employee_id)
+    for obj in session.deleted:
+        if isinstance(obj, Employee):
+            changed.add(obj.id)
+        elif isinstance(obj, FaceEncoding):
+            changed.add(obj.employee_id)
+
+    record_change(session, changed)
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        from services.face_gallery import face_gallery
+
+        face_gallery.mark_stale(pending)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def prune_changes(db: Session) -> int:
+    """
+    Elimina filas de face_gallery_changes más antiguas que la retención
+    """
+    cutoff = datetime.datetime.utcnow() - datetime.timedelta(
+        hours=GALLERY_CHANGE_RETENTION_HOURS
+    )
+    result = db.execute(
+        delete(FaceGalleryChange).where(FaceGalleryChange.created_at < cutoff)
+    )
+    db.commit()
+    return result.rowcount
+
+
+def start_prune_worker(
+    session_factory, interval_seconds: int = GALLERY_CHANGE_PRUNE_INTERVAL_SECONDS
+) -> Optional[threading.Thread]:
+    """
+    Lanza un hilo daemon que ejecuta prune_changes periódicamente.
+    Corre en todos los procesos: el DELETE por antigüedad es idempotente.
+    """
+    if interval_seconds <= 0:
+        return None
+
+    def run():
+        while True:
+            db = session_factory()
+            try:
+                pruned = prune_changes(db)
+                if pruned:
+                    print(f"🧹 Pruned {pruned} face gallery change rows")
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Face gallery change pruning failed: {e}")
+            finally:
+                db.close()
+            time.sleep(interval_seconds)
+
+    worker = threading.Thread(target=run, name="face-gallery-change-pruning", daemon=True)
+    worker.start()
+    return worker
+
+
+event.listen(Session, "after_flush", _after_flush)
+event.listen(Session, "after_commit", _after_commit)
+event.listen(Session, "after_rollback", _after_rollback)
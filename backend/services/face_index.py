@@ -0,0 +1,185 @@
+"""
+Índice aproximado (IVF) para galerías grandes de encodings
+
+Particiona los encodings con k-means en `nlist` listas invertidas. Una búsqueda
+sólo recorre las `nprobe` listas cuyos centroides están más cerca del probe y
+luego re-rankea de forma exacta los mejores candidatos usando todos los
+encodings de cada empleado candidato, de modo que la distancia retornada es la
+misma que daría la búsqueda por fuerza bruta.
+"""
+
+import math
+import os
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+# "exact" = fuerza bruta sobre la matriz de cada warehouse, "ivf" = índice aproximado
+FACE_MATCH_MODE = os.getenv("FACE_MATCH_MODE", "exact")
+# Tamaño mínimo de galería para usar el índice aproximado
+FACE_ANN_MIN_GALLERY = int(os.getenv("FACE_ANN_MIN_GALLERY", "20000"))
+FACE_IVF_NLIST = int(os.getenv("FACE_IVF_NLIST", "0"))  # 0 = sqrt(n)
+FACE_IVF_NPROBE = int(os.getenv("FACE_IVF_NPROBE", "8"))
+FACE_ANN_RERANK = int(os.getenv("FACE_ANN_RERANK", "5"))
+
+_KMEANS_SAMPLE = 50000
+_KMEANS_ITERATIONS = 10
+_ASSIGN_CHUNK = 16384
+
+
+def _sq_norms(vectors: np.ndarray) -> np.ndarray:
+    return np.einsum("ij,ij->i", vectors, vectors)
+
+
+def _nearest_centroids(
+    vectors: np.ndarray, centroids: np.ndarray, centroid_sq_norms: np.ndarray
+) -> np.ndarray:
+    """Asigna cada vector a su centroide más cercano (por bloques para acotar memoria)"""
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), _ASSIGN_CHUNK):
+        chunk = vectors[start : start + _ASSIGN_CHUNK]
+        # ||c||^2 - 2 v·c; ||v||^2 no cambia el argmin
+        scores = centroid_sq_norms[None, :] - 2.0 * (chunk @ centroids.T)
+        assignments[start : start + len(chunk)] = np.argmin(scores, axis=1)
+    return assignments
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, seed: int = 0) -> np.ndarray:
+    """
+    K-means (Lloyd) sobre una muestra de los vectores
+    """
+    rng = np.random.default_rng(seed)
+    if len(vectors) > _KMEANS_SAMPLE:
+        vectors = vectors[rng.choice(len(vectors), _KMEANS_SAMPLE, replace=False)]
+    nlist = min(nlist, len(vectors))
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+
+    for _ in range(_KMEANS_ITERATIONS):
+        assignments = _nearest_centroids(vectors, centroids, _sq_norms(centroids))
+        counts = np.bincount(assignments, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+        # Las listas vacías se re-siembran con puntos al azar
+        empty = np.flatnonzero(~non_empty)
+        if len(empty):
+            centroids[empty] = vectors[rng.choice(len(vectors), len(empty), replace=False)]
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """
+    Índice de listas invertidas sobre encodings float32
+    """
+
+    def __init__(
+        self,
+        nlist: int = FACE_IVF_NLIST,
+        nprobe: int = FACE_IVF_NPROBE,
+        rerank: int = FACE_ANN_RERANK,
+    ):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.rerank = rerank
+        self.trained_size = 0
+        self._centroids: Optional[np.ndarray] = None
+        self._centroid_sq_norms: Optional[np.ndarray] = None
+        self._vectors: List[np.ndarray] = []
+        self._sq_norms: List[np.ndarray] = []
+        self._ids: List[np.ndarray] = []
+        # employee_id -> listas que contienen al menos un encoding suyo
+        self._employee_lists: Dict[int, Set[int]] = defaultdict(set)
+
+    @property
+    def size(self) -> int:
+        return sum(len(ids) for ids in self._ids)
+
+    def build(self, employee_ids: np.ndarray, vectors: np.ndarray) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        nlist = self.nlist or max(1, int(math.sqrt(len(vectors))))
+        self._centroids = train_centroids(vectors, nlist)
+        self._centroid_sq_norms = _sq_norms(self._centroids)
+        count = len(self._centroids)
+        self._vectors = [np.empty((0, vectors.shape[1]), dtype=np.float32)] * count
+        self._sq_norms = [np.empty(0, dtype=np.float32)] * count
+        self._ids = [np.empty(0, dtype=np.int64)] * count
+        self._employee_lists = defaultdict(set)
+        self.trained_size = len(vectors)
+        self.add(employee_ids, vectors)
+
+    def add(self, employee_ids: np.ndarray, vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(employee_ids), -1)
+        employee_ids = np.asarray(employee_ids, dtype=np.int64)
+        assignments = _nearest_centroids(
+            vectors, self._centroids, self._centroid_sq_norms
+        )
+        for list_id in np.unique(assignments):
+            rows = assignments == list_id
+            self._vectors[list_id] = np.concatenate(
+                [self._vectors[list_id], vectors[rows]]
+            )
+            self._sq_norms[list_id] = np.concatenate(
+                [self._sq_norms[list_id], _sq_norms(vectors[rows])]
+            )
+            self._ids[list_id] = np.concatenate([self._ids[list_id], employee_ids[rows]])
+            for employee_id in np.unique(employee_ids[rows]):
+                self._employee_lists[int(employee_id)].add(int(list_id))
+
+    def remove_employee(self, employee_id: int) -> None:
+        for list_id in self._employee_lists.pop(employee_id, set()):
+            keep = self._ids[list_id] != employee_id
+            self._vectors[list_id] = self._vectors[list_id][keep]
+            self._sq_norms[list_id] = self._sq_norms[list_id][keep]
+            self._ids[list_id] = self._ids[list_id][keep]
+
+    def _employee_distance(self, employee_id: int, probe: np.ndarray, probe_sq: float) -> float:
+        best = np.inf
+        for list_id in self._employee_lists.get(employee_id, ()):
+            rows = self._ids[list_id] == employee_id
+            sq_dist = (
+                self._sq_norms[list_id][rows]
+                - 2.0 * (self._vectors[list_id][rows] @ probe)
+                + probe_sq
+            )
+            best = min(best, float(sq_dist.min()))
+        return math.sqrt(max(best, 0.0))
+
+    def search(self, probe: np.ndarray) -> Optional[Tuple[int, float]]:
+        """
+        Retorna (employee_id, distancia exacta) del empleado más cercano encontrado
+        """
+        if self._centroids is None or self.size == 0:
+            return None
+        probe = np.asarray(probe, dtype=np.float32)
+        probe_sq = float(probe @ probe)
+
+        centroid_scores = self._centroid_sq_norms - 2.0 * (self._centroids @ probe)
+        nprobe = min(self.nprobe, len(centroid_scores))
+        probed = np.argpartition(centroid_scores, nprobe - 1)[:nprobe]
+
+        candidate_ids = []
+        candidate_dist = []
+        for list_id in probed:
+            if len(self._ids[list_id]) == 0:
+                continue
+            candidate_ids.append(self._ids[list_id])
+            candidate_dist.append(
+                self._sq_norms[list_id] - 2.0 * (self._vectors[list_id] @ probe)
+            )
+        if not candidate_ids:
+            return None
+        candidate_ids = np.concatenate(candidate_ids)
+        candidate_dist = np.concatenate(candidate_dist)
+
+        # Mejores empleados distintos entre los candidatos, luego re-rank exacto
+        order = np.argsort(candidate_dist)
+        _, first = np.unique(candidate_ids[order], return_index=True)
+        top_employees = candidate_ids[order][np.sort(first)][: self.rerank]
+
+        reranked = [
+            (int(employee_id), self._employee_distance(int(employee_id), probe, probe_sq))
+            for employee_id in top_employees
+        ]
+        return min(reranked, key=lambda item: item[1])
@@ -0,0 +1,154 @@
+"""
+Pool de procesos para la etapa CPU del reconocimiento facial
+
+La decodificación de la imagen, la detección HOG y el encoding de dlib se
+ejecutan en un ProcessPoolExecutor, de modo que una instancia de la API use
+todos los núcleos sin competir por el GIL. Los endpoints async esperan el
+resultado sin ocupar un hilo del threadpool.
+
+Back-pressure: si hay FACE_QUEUE_LIMIT trabajos en curso o en cola, las
+nuevas peticiones se rechazan con 503 en lugar de acumular latencia.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from services.face_recognition_service import compute_image_encodings
+from utils import metrics
+
+# Procesos del pool (0 = ejecutar en el threadpool del propio proceso)
+FACE_WORKERS = int(os.getenv("FACE_WORKERS", str(os.cpu_count() or 1)))
+# Trabajos en curso + en cola antes de responder 503 (0 = 4 x FACE_WORKERS)
+FACE_QUEUE_LIMIT = int(os.getenv("FACE_QUEUE_LIMIT", "0"))
+FACE_RETRY_AFTER_SECONDS = 1
+
+
+REJECTED = metrics.registry.counter(
+    "face_pipeline_rejected_total",
+    "Face jobs rejected with 503",
+    ["reason"],
+)
+
+
+def _warm_up() -> None:
+    # Carga los modelos de dlib al arrancar el proceso y no en la primera petición
+    import face_recognition  # noqa: F401
+
+
+def _encode_with_spans(images: List[bytes]):
+    # Los spans medidos en el worker vuelven con el resultado para registrarlos aquí
+    with metrics.capture_spans() as spans:
+        encodings = compute_image_encodings(images)
+    return encodings, spans
+
+
+class FacePipeline:
+    """
+    Ejecuta funciones CPU-bound en un pool de procesos con un límite de cola
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_limit: Optional[int] = None):
+        self.workers = FACE_WORKERS if workers is None else workers
+        limit = FACE_QUEUE_LIMIT if queue_limit is None else queue_limit
+        self.queue_limit = limit or 4 * max(self.workers, 1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # spawn: el proceso padre tiene hilos y conexiones que no deben heredarse
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_warm_up,
+                )
+            return self._executor
+
+    def _acquire(self) -> None:
+        with self._lock:
+            if self._pending >= self.queue_limit:
+                REJECTED.inc(reason="queue_full")
+                raise HTTPException(
+                    status_code=503,
+                    detail="Face recognition is busy, try again shortly.",
+                    headers={"Retry-After": str(FACE_RETRY_AFTER_SECONDS)},
+                )
+            self._pending += 1
+
+    def _release(self) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn: Callable, *args):
+        """
+        Ejecuta fn(*args) en el pool. fn y sus argumentos deben ser picklables.
+        """
+        self._acquire()
+        try:
+            if self.workers <= 0:
+                return await run_in_threadpool(fn, *args)
+            loop = asyncio.get_running_loop()
+            try:
+                return await loop.run_in_executor(self._get_executor(), partial(fn, *args))
+            except BrokenProcessPool:
+                # Un worker murió (p. ej. por memoria): el siguiente trabajo crea otro pool
+                with self._lock:
+                    self._executor = None
+                REJECTED.inc(reason="worker_crashed")
+                raise HTTPException(
+                    status_code=503,
+                    detail="Face recognition worker crashed, try again.",
+                    headers={"Retry-After": str(FACE_RETRY_AFTER_SECONDS)},
+                )
+        finally:
+            self._release()
+
+    async def encode_frames(self, images: Sequence[bytes]) -> List[np.ndarray]:
+        """
+        Encodings de todas las caras de cada frame (ver compute_image_encodings)
+        """
+        with metrics.span("face_pipeline"):
+            encodings, spans = await self.run(_encode_with_spans, list(images))
+        metrics.record_spans(spans)
+        return encodings
+
+    async def encode_face(self, image: bytes) -> np.ndarray:
+        """
+        Encoding de la primera cara detectada; 422 si la imagen no tiene caras
+        """
+        (encodings,) = await self.encode_frames([image])
+        if len(encodings) == 0:
+            raise HTTPException(status_code=422, detail="No face detected in the image.")
+        return encodings[0]
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Instancia global del pool (una por proceso de la API)
+face_pipeline = FacePipeline()
+
+metrics.registry.gauge(
+    "face_pipeline_pending",
+    "Face jobs running or queued in the process pool",
+    lambda: face_pipeline.pending,
+)
@@ -1,37 +1,135 @@
-import base64, io
+import base64, io, os
 from PIL import Image
 import numpy as np
 import face_recognition
-from typing import List
+from typing import List, Optional, Sequence, Tuple, Union
 from sqlalchemy.orm import Session
-from sqlalchemy import select
 from fastapi import HTTPException
-from models import AccessLog
+from services.presence_service import get_presence, next_event
+from utils.metrics import span
 import numpy as np
 
+# Formato de almacenamiento de FaceEncoding.encoding (columna encoding_version)
+LEGACY_ENCODING_VERSION = "1.0"  # texto: 128 floats "%.8f" separados por comas
+ENCODING_VERSION = "2.0"  # binario: 128 float32 little-endian (512 bytes)
+ENCODING_DTYPE = np.dtype("<f4")
+ENCODING_DIM = 128
+
+# Lado mayor (px) de la imagen usada para el encoding y para la detección HOG.
+# El costo de HOG crece con el número de píxeles; el encoding sólo necesita un
+# recorte de la cara a resolución moderada (0 = sin límite).
+FACE_ENCODE_MAX_DIM = int(os.getenv("FACE_ENCODE_MAX_DIM", "1280"))
+FACE_DETECT_MAX_DIM = int(os.getenv("FACE_DETECT_MAX_DIM", "640"))
+
 def b64_to_rgb_np(b64: str) -> np.ndarray:
     img_bytes = base64.b64decode(b64)
     img = Image.open(io.BytesIO(img_bytes)).convert('RGB')
     return np.array(img)
 
-def compute_encoding(b64: str) -> List[float]:
-    image_np = b64_to_rgb_np(b64)
-    boxes = face_recognition.face_locations(image_np, model="hog")
+def _limit_size(size: Tuple[int, int], max_dim: int) -> Tuple[int, int]:
+    width, height = size
+    if max_dim <= 0 or max(width, height) <= max_dim:
+        return width, height
+    scale = max_dim / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+def decode_image(img_bytes: bytes, max_dim: Optional[int] = None) -> Image.Image:
+    """
+    Decodifica la imagen a RGB con el lado mayor limitado a max_dim.
+    Para JPEG se usa el modo draft, que decodifica directamente a 1/2, 1/4 u 1/8
+    de la resolución original sin pasar por la imagen completa.
+    """
+    max_dim = FACE_ENCODE_MAX_DIM if max_dim is None else max_dim
+    with span("image_decode"):
+        img = Image.open(io.BytesIO(img_bytes))
+        if max_dim > 0:
+            img.draft("RGB", _limit_size(img.size, max_dim))
+        img = img.convert('RGB')
+        target = _limit_size(img.size, max_dim)
+        if target != img.size:
+            img = img.resize(target, Image.BILINEAR)
+    return img
+
+def face_encodings_from_image(img: Image.Image) -> np.ndarray:
+    """
+    Detecta las caras sobre una copia reducida a FACE_DETECT_MAX_DIM y calcula
+    los encodings sobre `img`, con las cajas re-escaladas a su resolución.
+    Retorna una matriz (caras, 128) float32.
+    """
+    image_np = np.array(img)
+    detect_size = _limit_size(img.size, FACE_DETECT_MAX_DIM)
+    with span("face_detect"):
+        if detect_size == img.size:
+            boxes = face_recognition.face_locations(image_np, model="hog")
+        else:
+            small = np.array(img.resize(detect_size, Image.BILINEAR))
+            scale = img.size[0] / detect_size[0]
+            height, width = image_np.shape[:2]
+            boxes = [
+                (
+                    max(0, int(top * scale)),
+                    min(width, int(round(right * scale))),
+                    min(height, int(round(bottom * scale))),
+                    max(0, int(left * scale)),
+                )
+                for top, right, bottom, left in face_recognition.face_locations(
+                    small, model="hog"
+                )
+            ]
     if not boxes:
+        return np.empty((0, ENCODING_DIM), dtype=np.float32)
+    with span("face_encode"):
+        encs = face_recognition.face_encodings(image_np, boxes)
+    return np.asarray(encs, dtype=np.float32).reshape(len(encs), ENCODING_DIM)
+
+def compute_encoding(b64: str) -> List[float]:
+    encs = face_encodings_from_image(decode_image(base64.b64decode(b64)))
+    if len(encs) == 0:
         raise HTTPException(status_code=422, detail="No face detected in the image.")
-    encs = face_recognition.face_encodings(image_np, boxes)
-    if not encs:
-        raise HTTPException(status_code=422, detail="Could not extract face encoding.")
     return encs[0].tolist()
 
-def serialize_encoding(enc: List[float]) -> str:
+def compute_image_encodings(images: Sequence[bytes]) -> List[np.ndarray]:
+    """
+    Detecta todas las caras de cada frame (bytes de la imagen codificada) y
+    retorna, por frame, una matriz (caras, 128) float32. Un frame sin caras
+    produce una matriz vacía.
+    """
+    return [face_encodings_from_image(decode_image(data)) for data in images]
+
+def compute_face_encodings(images_b64: Sequence[str]) -> List[np.ndarray]:
+    return compute_image_encodings([base64.b64decode(b64) for b64 in images_b64])
+
+def serialize_encoding(enc: Sequence[float]) -> bytes:
+    return np.asarray(enc, dtype=ENCODING_DTYPE).tobytes()
+
+def deserialize_encoding(data: Union[bytes, str]) -> np.ndarray:
+    """
+    Vista de sólo lectura sobre los bytes almacenados (sin copia).
+    Acepta también el formato de texto 1.0 para filas aún no migradas.
+    """
+    if isinstance(data, str):
+        return deserialize_legacy_encoding(data)
+    return np.frombuffer(data, dtype=ENCODING_DTYPE)
+
+def deserialize_encodings(rows: Sequence[Union[bytes, str]]) -> np.ndarray:
+    """
+    Convierte muchos encodings almacenados en una matriz (n, 128) float32
+    """
+    if all(isinstance(row, (bytes, bytearray, memoryview)) for row in rows):
+        data = b"".join(rows)
+        return np.frombuffer(data, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_DIM)
+    return np.vstack([deserialize_encoding(row) for row in rows]).reshape(-1, ENCODING_DIM)
+
+def serialize_legacy_encoding(enc: Sequence[float]) -> str:
     return ",".join(f"{v:.8f}" for v in enc)
 
-def deserialize_encoding(s: str) -> np.ndarray:
+def deserialize_legacy_encoding(s: str) -> np.ndarray:
     return np.array([float(x) for x in s.split(",")], dtype=np.float32)
 
-def decide_event(session: Session, employee_id: str) -> str:
-    last = session.execute(
-        select(AccessLog).where(AccessLog.employee_id == employee_id).order_by(AccessLog.ts.desc()).limit(1)
-    ).scalar_one_or_none()
-    return "out" if (last and last.event == "in") else "in"
+def decide_event(session: Session, employee_id: int) -> str:
+    """
+    Próximo evento (in/out) del empleado según employee_presence.
+    Para registrar el evento usar presence_service.record_event.
+    """
+    state = get_presence(session, employee_id)
+    return next_event(state.last_event if state else None)
@@ -0,0 +1,248 @@
+"""
+Cálculo de horas trabajadas a partir de pares in/out de access_logs
+
+Los eventos se cargan como arreglos (empleado, tipo, timestamp UTC) ordenados
+por empleado y tiempo; un "in" seguido por un "out" del mismo empleado a
+menos de HOURS_MAX_SHIFT_HOURS forma un turno. Todo el emparejamiento y las
+sumas por período se hacen con operaciones vectorizadas de NumPy.
+
+- Turnos nocturnos: el turno completo se asigna al día local en que empezó.
+- Marcas faltantes: un "in" sin "out" (o un "out" sin "in") no suma horas y
+  se cuenta en missing_punches del día local de esa marca.
+- Zona horaria: el día local se calcula con Warehouse.timezone del almacén
+  del empleado (UTC si no tiene o no es válida), respetando cambios de horario.
+"""
+
+import datetime
+import os
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from models import AccessLog, Employee, Warehouse
+
+HOURS_MAX_SHIFT_HOURS = float(os.getenv("HOURS_MAX_SHIFT_HOURS", "16"))
+# Margen en UTC alrededor de los días pedidos: turnos nocturnos y zonas horarias lejos de UTC
+HOURS_RANGE_MARGIN = datetime.timedelta(days=1, hours=HOURS_MAX_SHIFT_HOURS)
+
+_DAY = 86400
+# Paso de la grilla de offsets: las transiciones de horario caen en múltiplos de 15 min
+_OFFSET_STEP = 900
+_EPOCH = datetime.date(1970, 1, 1)  # Los días locales se cuentan desde aquí
+
+
+@dataclass
+class HoursRow:
+    employee_id: int
+    period_start: datetime.date
+    hours: float
+    shifts: int
+    missing_punches: int
+
+
+@dataclass
+class Shifts:
+    """Resultado del emparejamiento (índices sobre los arreglos de entrada)"""
+
+    starts: np.ndarray          # "in" que abren un turno
+    ends: np.ndarray            # "out" que lo cierran (mismo largo que starts)
+    missing: np.ndarray         # marcas sin pareja
+
+
+def pair_punches(
+    employee_ids: np.ndarray,
+    is_in: np.ndarray,
+    timestamps: np.ndarray,
+    max_shift_seconds: float,
+) -> Shifts:
+    """
+    Empareja cada "in" con el evento siguiente si es un "out" del mismo
+    empleado dentro de max_shift_seconds. Los arreglos deben venir ordenados
+    por (empleado, timestamp).
+    """
+    if len(timestamps) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return Shifts(empty, empty, empty)
+
+    paired = (
+        is_in[:-1]
+        & ~is_in[1:]
+        & (employee_ids[:-1] == employee_ids[1:])
+        & (timestamps[1:] - timestamps[:-1] <= max_shift_seconds)
+    )
+    starts = np.flatnonzero(paired)
+    ends = starts + 1
+    used = np.zeros(len(timestamps), dtype=bool)
+    used[starts] = True
+    used[ends] = True
+    return Shifts(starts, ends, np.flatnonzero(~used))
+
+
+def _zone(name: Optional[str]) -> datetime.tzinfo:
+    try:
+        return ZoneInfo(name) if name else datetime.timezone.utc
+    except (ZoneInfoNotFoundError, ValueError):
+        return datetime.timezone.utc
+
+
+def utc_offsets(timestamps: np.ndarray, zone_index: np.ndarray, zones: Sequence[Optional[str]]) -> np.ndarray:
+    """
+    Offset UTC (segundos) de cada timestamp en la zona zones[zone_index[i]].
+    Los offsets se calculan una vez por zona sobre una grilla de 15 minutos y
+    se indexan, en lugar de convertir cada evento.
+    """
+    offsets = np.zeros(len(timestamps), dtype=np.int64)
+    if len(timestamps) == 0:
+        return offsets
+    origin = int(timestamps.min()) // _OFFSET_STEP * _OFFSET_STEP
+    slots = (timestamps - origin) // _OFFSET_STEP
+    for position, name in enumerate(zones):
+        mask = zone_index == position
+        if not mask.any():
+            continue
+        zone = _zone(name)
+        grid = np.array(
+            [
+                datetime.datetime.fromtimestamp(origin + slot * _OFFSET_STEP, zone).utcoffset().total_seconds()
+                for slot in range(int(slots[mask].max()) + 1)
+            ],
+            dtype=np.int64,
+        )
+        offsets[mask] = grid[slots[mask]]
+    return offsets
+
+
+def summarize(
+    employee_ids: np.ndarray,
+    is_in: np.ndarray,
+    timestamps: np.ndarray,
+    offsets: np.ndarray,
+    first_day: datetime.date,
+    last_day: datetime.date,
+    period: str = "day",
+    max_shift_seconds: float = HOURS_MAX_SHIFT_HOURS * 3600,
+) -> List[HoursRow]:
+    """
+    Horas por (empleado, período) para los días locales [first_day, last_day].
+    Los arreglos deben venir ordenados por (empleado, timestamp).
+    """
+    shifts = pair_punches(employee_ids, is_in, timestamps, max_shift_seconds)
+    local_days = (timestamps + offsets) // _DAY
+    first, last = (first_day - _EPOCH).days, (last_day - _EPOCH).days
+
+    # Cada turno y cada marca faltante cuentan en el día local de su primera marca
+    marks = np.concatenate([shifts.starts, shifts.missing])
+    seconds = np.concatenate(
+        [timestamps[shifts.ends] - timestamps[shifts.starts], np.zeros(len(shifts.missing), dtype=np.int64)]
+    )
+    is_shift = np.concatenate([np.ones(len(shifts.starts), bool), np.zeros(len(shifts.missing), bool)])
+
+    days = local_days[marks]
+    keep = (days >= first) & (days <= last)
+    marks, seconds, is_shift, days = marks[keep], seconds[keep], is_shift[keep], days[keep]
+    if period == "week":
+        days = days - (days + 3) % 7  # 1970-01-01 fue jueves: lunes de la semana
+    if len(marks) == 0:
+        return []
+
+    # Clave única (empleado, período) en un int64 para agrupar con un solo np.unique
+    span = last - first + 7
+    groups, inverse = np.unique(employee_ids[marks] * span + (days - first + 6), return_inverse=True)
+    worked = np.bincount(inverse, weights=seconds, minlength=len(groups))
+    shift_counts = np.bincount(inverse, weights=is_shift, minlength=len(groups))
+    missing_counts = np.bincount(inverse, weights=~is_shift, minlength=len(groups))
+    group_employees, group_days = np.divmod(groups, span)
+    group_days += first - 6
+
+    return [
+        HoursRow(employee_id, period_start, hours, shifts, missing)
+        for employee_id, period_start, hours, shifts, missing in zip(
+            group_employees.tolist(),
+            group_days.astype("datetime64[D]").tolist(),
+            np.round(worked / 3600, 2).tolist(),
+            shift_counts.astype(np.int64).tolist(),
+            missing_counts.astype(np.int64).tolist(),
+        )
+    ]
+
+
+def load_punches(
+    db: Session,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    employee_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Eventos in/out en [start, end) como arreglos ordenados por (empleado,
+    timestamp, id): ids de empleado, is_in, timestamps UTC en segundos y
+    offset UTC de cada evento según el almacén del empleado
+    """
+    query = (
+        select(AccessLog.employee_id, AccessLog.event_type, AccessLog.timestamp, AccessLog.id, Warehouse.timezone)
+        .join(Employee, Employee.id == AccessLog.employee_id)
+        .join(Warehouse, Warehouse.id == Employee.warehouse_id)
+        .where(
+            AccessLog.timestamp >= start,
+            AccessLog.timestamp < end,
+            AccessLog.event_type.in_(("in", "out")),
+        )
+    )
+    if employee_id:
+        query = query.where(AccessLog.employee_id == employee_id)
+    if warehouse_id:
+        query = query.where(Employee.warehouse_id == warehouse_id)
+
+    rows = db.execute(query).all()
+    if not rows:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, np.empty(0, dtype=bool), empty, empty
+
+    employee_ids, events, times, log_ids, zone_names = zip(*rows)
+    employee_ids = np.array(employee_ids, dtype=np.int64)
+    is_in = np.array(events) == "in"
+    timestamps = np.array(times, dtype="datetime64[s]").astype(np.int64)
+    log_ids = np.array(log_ids, dtype=np.int64)
+    zones, zone_index = np.unique(np.array([z or "" for z in zone_names], dtype=object), return_inverse=True)
+
+    order = np.lexsort((log_ids, timestamps, employee_ids))
+    employee_ids, is_in, timestamps = employee_ids[order], is_in[order], timestamps[order]
+    offsets = utc_offsets(timestamps, zone_index.ravel()[order], list(zones))
+    return employee_ids, is_in, timestamps, offsets
+
+
+def punch_range(
+    start_date: datetime.date, end_date: datetime.date
+) -> Tuple[datetime.datetime, datetime.datetime]:
+    """
+    Rango UTC [start, end) de marcas que puede afectar a los días locales
+    entre start_date y end_date inclusive
+    """
+    start = datetime.datetime.combine(start_date, datetime.time()) - HOURS_RANGE_MARGIN
+    end = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time()) + HOURS_RANGE_MARGIN
+    return start, end
+
+
+def worked_hours(
+    db: Session,
+    start_date: datetime.date,
+    end_date: datetime.date,
+    employee_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+    period: str = "day",
+) -> List[HoursRow]:
+    """
+    Horas trabajadas por empleado y día (o semana, desde el lunes) local
+    entre start_date y end_date inclusive
+    """
+    start, end = punch_range(start_date, end_date)
+    employee_ids, is_in, timestamps, offsets = load_punches(db, start, end, employee_id, warehouse_id)
+    return summarize(
+        employee_ids, is_in, timestamps, offsets, start_date, end_date,
+        period=period, max_shift_seconds=HOURS_MAX_SHIFT_HOURS * 3600,
+    )
+
@@ -1,8 +1,70 @@
+import base64
+import binascii
+import csv
+import io
+import json
+import os
+from sqlalchemy import and_, or_, select
 from sqlalchemy.orm import Session
-from typing import Optional
-from models import AccessLog, UserLoginLog
+from typing import Iterator, List, Optional, Sequence, Tuple
+from models import AccessLog, Employee, UserLoginLog
 from datetime import datetime
 
+LOG_EXPORT_BATCH_SIZE = int(os.getenv("LOG_EXPORT_BATCH_SIZE", "1000"))
+
+# Columnas de la exportación (orden del CSV)
+EXPORT_COLUMNS = (
+    "id",
+    "employee_id",
+    "first_name",
+    "last_name",
+    "warehouse_id",
+    "event_type",
+    "access_method",
+    "timestamp",
+)
+
+# Posición de una página: (timestamp, id) del último registro entregado
+Cursor = Tuple[datetime, int]
+
+
+def encode_cursor(timestamp: datetime, log_id: int) -> str:
+    """
+    Cursor opaco (base64 url-safe) con el timestamp y el id del último registro
+    """
+    raw = json.dumps([timestamp.isoformat(), log_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Inverso de encode_cursor. Lanza ValueError si el cursor no es válido.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, log_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def next_cursor(logs: list, limit: int) -> Optional[str]:
+    """
+    Cursor de la página siguiente, o None si ésta fue la última
+    """
+    if not logs or len(logs) < limit:
+        return None
+    return encode_cursor(logs[-1].timestamp, logs[-1].id)
+
+
+def _after(model, cursor: Cursor):
+    # (timestamp, id) < cursor, expandido para que MySQL use el índice
+    timestamp, log_id = cursor
+    return or_(
+        model.timestamp < timestamp,
+        and_(model.timestamp == timestamp, model.id < log_id),
+    )
+
 
 def get_access_logs(
     db: Session,
@@ -11,20 +73,31 @@ def get_access_logs(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[Cursor] = None
 ):
+    """
+    Logs de acceso del más reciente al más antiguo. Con cursor se pagina por
+    keyset (costo constante en cualquier página) y skip se ignora.
+    """
     query = db.query(AccessLog)
     
     if employee_id:
         query = query.filter(AccessLog.employee_id == employee_id)
     if warehouse_id:
-        query = query.filter(AccessLog.warehouse_id == warehouse_id)
+        # access_logs no guarda el almacén: se filtra por el almacén del empleado
+        query = query.join(Employee, Employee.id == AccessLog.employee_id).filter(
+            Employee.warehouse_id == warehouse_id
+        )
     if start_date:
-        query = query.filter(AccessLog.ts >= start_date)
+        query = query.filter(AccessLog.timestamp >= start_date)
     if end_date:
-        query = query.filter(AccessLog.ts <= end_date)
+        query = query.filter(AccessLog.timestamp <= end_date)
     
-    return query.order_by(AccessLog.ts.desc()).offset(skip).limit(limit).all()
+    query = query.order_by(AccessLog.timestamp.desc(), AccessLog.id.desc())
+    if cursor is not None:
+        return query.filter(_after(AccessLog, cursor)).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
 
 
 def get_user_login_logs(
@@ -33,8 +106,12 @@ def get_user_login_logs(
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
     skip: int = 0,
-    limit: int = 100
+    limit: int = 100,
+    cursor: Optional[Cursor] = None
 ):
+    """
+    Igual que get_access_logs para los logs de login de usuarios
+    """
     query = db.query(UserLoginLog)
     
     if user_id:
@@ -44,7 +121,10 @@ def get_user_login_logs(
     if end_date:
         query = query.filter(UserLoginLog.timestamp <= end_date)
     
-    return query.order_by(UserLoginLog.timestamp.desc()).offset(skip).limit(limit).all()
+    query = query.order_by(UserLoginLog.timestamp.desc(), UserLoginLog.id.desc())
+    if cursor is not None:
+        return query.filter(_after(UserLoginLog, cursor)).limit(limit).all()
+    return query.offset(skip).limit(limit).all()
 
 
 
@@ -54,3 +134,79 @@ def create_user_login_log(db: Session, user_id: int, location: str = None, brows
     db.add(log)
     db.commit()
     return log
+
+
+def iter_access_log_batches(
+    db: Session,
+    employee_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    batch_size: int = LOG_EXPORT_BATCH_SIZE
+) -> Iterator[Sequence[tuple]]:
+    """
+    Logs de acceso en orden cronológico, en lotes de batch_size filas.
+    Usa un cursor del lado del servidor y tuplas (no objetos ORM), así la
+    memoria no depende del tamaño del rango.
+    """
+    query = select(
+        AccessLog.id,
+        AccessLog.employee_id,
+        Employee.first_name,
+        Employee.last_name,
+        Employee.warehouse_id,
+        AccessLog.event_type,
+        AccessLog.access_method,
+        AccessLog.timestamp,
+    ).join(Employee, Employee.id == AccessLog.employee_id)
+
+    if employee_id:
+        query = query.where(AccessLog.employee_id == employee_id)
+    if warehouse_id:
+        query = query.where(Employee.warehouse_id == warehouse_id)
+    if start_date:
+        query = query.where(AccessLog.timestamp >= start_date)
+    if end_date:
+        query = query.where(AccessLog.timestamp <= end_date)
+
+    result = db.execute(
+        query.order_by(AccessLog.timestamp, AccessLog.id).execution_options(
+            stream_results=True, yield_per=batch_size
+        )
+    )
+    try:
+        for rows in result.partitions():
+            yield rows
+    finally:
+        result.close()
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def access_logs_csv(batches: Iterator[Sequence[tuple]]) -> Iterator[str]:
+    """
+    CSV con cabecera; un fragmento por lote
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_export_value(v) for v in row] for row in rows)
+        yield buffer.getvalue()
+
+
+def access_logs_ndjson(batches: Iterator[Sequence[tuple]]) -> Iterator[str]:
+    """
+    Un objeto JSON por línea; un fragmento por lote
+    """
+    for rows in batches:
+        lines: List[str] = [
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_export_value, row))), separators=(",", ":"))
+            for row in rows
+        ]
+        yield "\n".join(lines) + "\n"
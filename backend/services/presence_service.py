@@ -0,0 +1,214 @@
+"""
+Estado de presencia por empleado (último evento de acceso)
+
+employee_presence guarda el último evento de cada empleado y se actualiza en
+la misma transacción que el insert en access_logs, de modo que la decisión
+in/out es un lookup por clave primaria sin importar el volumen de logs.
+
+Delante de la tabla hay una cache en proceso con (último evento, id del
+access_log). El id cacheado se usa como valor esperado de un UPDATE
+condicional: si otro kiosko o proceso registró un evento mientras tanto, el
+UPDATE no afecta filas y la decisión se repite con la fila bloqueada
+(SELECT ... FOR UPDATE), así dos kioskos nunca registran el mismo evento.
+"""
+
+import datetime
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models import AccessLog, EmployeePresence
+
+PRESENCE_CACHE_SIZE = int(os.getenv("PRESENCE_CACHE_SIZE", "10000"))
+_PENDING_KEY = "presence_pending"
+
+
+@dataclass(frozen=True)
+class PresenceState:
+    last_event: str
+    last_access_log_id: int
+    last_event_at: datetime.datetime
+    warehouse_id: Optional[int] = None
+
+
+class PresenceCache:
+    """
+    Cache LRU acotada employee_id -> PresenceState
+    """
+
+    def __init__(self, max_size: int = PRESENCE_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[int, PresenceState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, employee_id: int) -> Optional[PresenceState]:
+        with self._lock:
+            state = self._items.get(employee_id)
+            if state is not None:
+                self._items.move_to_end(employee_id)
+            return state
+
+    def put(self, employee_id: int, state: PresenceState) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[employee_id] = state
+            self._items.move_to_end(employee_id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def discard(self, employee_id: int) -> None:
+        with self._lock:
+            self._items.pop(employee_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# Cache global (una por proceso)
+presence_cache = PresenceCache()
+
+
+def next_event(last_event: Optional[str]) -> str:
+    return "out" if last_event == "in" else "in"
+
+
+def _load_state(db: Session, employee_id: int, lock: bool = False) -> Optional[PresenceState]:
+    query = select(
+        EmployeePresence.last_event,
+        EmployeePresence.last_access_log_id,
+        EmployeePresence.last_event_at,
+        EmployeePresence.warehouse_id,
+    ).where(EmployeePresence.employee_id == employee_id)
+    if lock:
+        query = query.with_for_update()
+    row = db.execute(query).first()
+    return PresenceState(*row) if row is not None else None
+
+
+def get_presence(db: Session, employee_id: int) -> Optional[PresenceState]:
+    """
+    Último evento del empleado (cache o lookup por clave primaria)
+    """
+    state = presence_cache.get(employee_id)
+    if state is None:
+        state = _load_state(db, employee_id)
+        if state is not None:
+            presence_cache.put(employee_id, state)
+    return state
+
+
+def _advance(
+    db: Session,
+    log: AccessLog,
+    warehouse_id: Optional[int],
+    expected_log_id: Optional[int] = None,
+) -> bool:
+    """
+    Apunta la fila de presencia al nuevo log. Con expected_log_id el UPDATE
+    sólo se aplica si la fila no cambió desde que se leyó ese estado.
+    """
+    statement = update(EmployeePresence).where(
+        EmployeePresence.employee_id == log.employee_id
+    )
+    if expected_log_id is not None:
+        statement = statement.where(EmployeePresence.last_access_log_id == expected_log_id)
+    result = db.execute(
+        statement.values(
+            last_event=log.event_type,
+            last_event_at=log.timestamp,
+            last_access_log_id=log.id,
+            warehouse_id=warehouse_id,
+            updated_at=datetime.datetime.utcnow(),
+        )
+    )
+    return result.rowcount == 1
+
+
+def _insert_presence(db: Session, log: AccessLog, warehouse_id: Optional[int]) -> bool:
+    try:
+        with db.begin_nested():
+            db.execute(
+                insert(EmployeePresence).values(
+                    employee_id=log.employee_id,
+                    last_event=log.event_type,
+                    last_event_at=log.timestamp,
+                    last_access_log_id=log.id,
+                    warehouse_id=warehouse_id,
+                    updated_at=datetime.datetime.utcnow(),
+                )
+            )
+        return True
+    except IntegrityError:
+        # Otro kiosko registró el primer evento del empleado al mismo tiempo
+        return False
+
+
+def record_event(
+    db: Session,
+    employee_id: int,
+    warehouse_id: Optional[int] = None,
+    access_method: str = "face_recognition",
+) -> AccessLog:
+    """
+    Inserta el AccessLog con el siguiente evento (in/out) y actualiza
+    employee_presence en la misma transacción. No hace commit.
+    """
+    cached = presence_cache.get(employee_id)
+    log = AccessLog(
+        employee_id=employee_id,
+        event_type=next_event(cached.last_event if cached else None),
+        access_method=access_method,
+        timestamp=datetime.datetime.utcnow(),
+    )
+    db.add(log)
+    db.flush()
+
+    # Camino rápido: el estado cacheado sigue vigente
+    if cached is not None and _advance(db, log, warehouse_id, cached.last_access_log_id):
+        _remember(db, employee_id, log, warehouse_id)
+        return log
+
+    # Cache vacía u obsoleta: se decide con la fila bloqueada
+    for _ in range(2):
+        state = _load_state(db, employee_id, lock=True)
+        log.event_type = next_event(state.last_event if state else None)
+        db.flush()
+        if state is not None:
+            _advance(db, log, warehouse_id)
+            break
+        if _insert_presence(db, log, warehouse_id):
+            break
+    _remember(db, employee_id, log, warehouse_id)
+    return log
+
+
+def _remember(db: Session, employee_id: int, log: AccessLog, warehouse_id: Optional[int]) -> None:
+    # La cache se actualiza sólo cuando la transacción confirma (ver _after_commit)
+    db.info.setdefault(_PENDING_KEY, {})[employee_id] = PresenceState(
+        log.event_type, log.id, log.timestamp, warehouse_id
+    )
+
+
+def _after_commit(session: Session) -> None:
+    for employee_id, state in session.info.pop(_PENDING_KEY, {}).items():
+        presence_cache.put(employee_id, state)
+
+
+def _after_rollback(session: Session) -> None:
+    for employee_id in session.info.pop(_PENDING_KEY, {}):
+        presence_cache.discard(employee_id)
+
+
+event.listen(Session, "after_commit", _after_commit)
+event.listen(Session, "after_rollback", _after_rollback)
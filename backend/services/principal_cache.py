@@ -0,0 +1,155 @@
+"""
+Cache del usuario autenticado (usuario + rol + almacén) por user_id
+
+get_current_user resuelve el usuario en cada request; con la cache, un hit
+no hace ninguna consulta y un miss carga usuario, rol y almacén en una sola.
+
+Las entradas son copias desacopladas de cualquier sesión; se incorporan a la
+sesión del request con merge(load=False), sin SQL, así que el resto del
+request las usa como cualquier objeto cargado (lazy loads, cambios, commit).
+
+Invalidación:
+- Tras el commit de una transacción que modifica o borra un User, se
+  descarta la entrada de ese usuario (actualización, desactivación, cambio
+  de contraseña, etc.).
+- Cambios en Role o Warehouse vacían la cache.
+- PRINCIPAL_CACHE_TTL_SECONDS acota el tiempo que otro proceso puede seguir
+  viendo un usuario ya modificado.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, joinedload
+
+from models import Role, User, Warehouse
+from utils.metrics import registry
+
+PRINCIPAL_CACHE_TTL_SECONDS = float(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "30"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+
+_PENDING_KEY = "principal_cache_pending"
+_CLEAR = "clear"
+
+REQUESTS = registry.counter(
+    "principal_cache_requests_total", "Authenticated user cache lookups", ["result"]
+)
+
+
+class PrincipalCache:
+    """
+    LRU en proceso con TTL por entrada, indexado por user_id
+    """
+
+    def __init__(self, ttl: float = PRINCIPAL_CACHE_TTL_SECONDS, max_size: int = PRINCIPAL_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._items: "OrderedDict[int, Tuple[float, User]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Se incrementa en cada invalidación: un miss que empezó antes no guarda
+        # una copia que ya puede estar vieja
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, user_id: int) -> Optional[User]:
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is None:
+                return None
+            expires_at, user = item
+            if expires_at <= time.monotonic():
+                del self._items[user_id]
+                return None
+            self._items.move_to_end(user_id)
+            return user
+
+    def set(self, user: User, generation: Optional[int] = None) -> None:
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._items[user.id] = (time.monotonic() + self.ttl, user)
+            self._items.move_to_end(user.id)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def invalidate(self, user_ids: Iterable[int]) -> None:
+        with self._lock:
+            self._generation += 1
+            for user_id in user_ids:
+                self._items.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+# Cache global (compartida entre requests del proceso)
+principal_cache = PrincipalCache()
+
+
+def get_principal(db: Session, user_id: int) -> Optional[User]:
+    """
+    Usuario con rol y almacén ya cargados, unido a la sesión db
+    """
+    cached = principal_cache.get(user_id)
+    if cached is not None:
+        REQUESTS.inc(result="hit")
+        return db.merge(cached, load=False)
+
+    REQUESTS.inc(result="miss")
+    generation = principal_cache.generation
+    user = db.execute(
+        select(User)
+        .options(joinedload(User.role), joinedload(User.warehouse))
+        .where(User.id == user_id)
+    ).scalar_one_or_none()
+    if user is None:
+        return None
+
+    # La copia cacheada no debe quedar ligada a esta sesión (commit la expiraría)
+    for obj in (user, user.role, user.warehouse):
+        if obj is not None:
+            db.expunge(obj)
+    principal_cache.set(user, generation)
+    return db.merge(user, load=False)
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, User):
+            pending.add(obj.id)
+        elif isinstance(obj, (Role, Warehouse)):
+            pending.add(_CLEAR)
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if _CLEAR in pending:
+        principal_cache.clear()
+    else:
+        principal_cache.invalidate(pending)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+event.listen(Session, "after_flush", _after_flush)
+event.listen(Session, "after_commit", _after_commit)
+event.listen(Session, "after_rollback", _after_rollback)
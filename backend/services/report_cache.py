@@ -0,0 +1,299 @@
+"""
+Cache de resultados de /reports/*
+
+La clave es (reporte, filtros, bucket de tiempo):
+
+- Rangos cerrados (end en el pasado): sin bucket ni TTL; el resultado sólo
+  cambia si llegan logs tardíos, y en ese caso se invalida (ver abajo).
+  Quedan en cache hasta que el LRU los desaloje (en Redis, como máximo
+  REPORT_CACHE_REDIS_TTL_SECONDS).
+- Rangos abiertos (sin end, o end en el futuro): la clave incluye el bucket
+  actual de REPORT_CACHE_BUCKET_SECONDS y la entrada expira con él.
+
+Cada entrada con end definido registra su rango. Tras el commit de una
+transacción que inserta o borra AccessLog, se descartan las entradas cuyo
+rango contiene alguno de esos timestamps. Cambios en empleados o almacenes
+(nombres en los reportes) vacían la cache.
+
+Backends: en proceso (LRU + TTL) o Redis (compartido entre procesos; cualquier
+cliente con get/set/delete/hset/hgetall/hdel/scan_iter).
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import AccessLog, Employee, Warehouse
+from utils.metrics import registry
+
+REPORT_CACHE_BACKEND = os.getenv("REPORT_CACHE_BACKEND", "memory")  # memory | redis | none
+REPORT_CACHE_SIZE = int(os.getenv("REPORT_CACHE_SIZE", "512"))
+REPORT_CACHE_BUCKET_SECONDS = int(os.getenv("REPORT_CACHE_BUCKET_SECONDS", "60"))
+REPORT_CACHE_REDIS_URL = os.getenv("REPORT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+# TTL en Redis de las entradas sobre rangos cerrados
+REPORT_CACHE_REDIS_TTL_SECONDS = int(os.getenv("REPORT_CACHE_REDIS_TTL_SECONDS", "86400"))
+
+_PENDING_KEY = "report_cache_pending"
+_CLEAR = "clear"
+
+# Rango cubierto por una entrada: (desde, hasta); desde None = sin límite
+Range = Tuple[Optional[datetime.datetime], datetime.datetime]
+
+REQUESTS = registry.counter(
+    "report_cache_requests_total", "Report cache lookups", ["report", "result"]
+)
+
+
+def _naive_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    """
+    Fechas con zona (p. ej. "...Z" en la query) a UTC naive, como access_logs
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class MemoryBackend:
+    """
+    Cache LRU en proceso con TTL por entrada
+    """
+
+    def __init__(self, max_size: int = REPORT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[str, Tuple[Optional[float], str]]" = OrderedDict()
+        self._ranges: Dict[str, Range] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None, covers: Optional[Range] = None) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + ttl if ttl else None, value)
+            self._items.move_to_end(key)
+            if covers is not None:
+                self._ranges[key] = covers
+            while len(self._items) > self.max_size:
+                self._remove(next(iter(self._items)))
+
+    def ranges(self) -> Dict[str, Range]:
+        with self._lock:
+            return dict(self._ranges)
+
+    def delete(self, keys: Iterable[str]) -> None:
+        with self._lock:
+            for key in keys:
+                self._remove(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._ranges.clear()
+
+    def _remove(self, key: str) -> None:
+        self._items.pop(key, None)
+        self._ranges.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class RedisBackend:
+    """
+    Cache compartida en Redis. Los rangos se guardan en un hash aparte
+    (<prefix>ranges) para que cualquier proceso pueda invalidar.
+    El LRU lo maneja Redis (maxmemory-policy allkeys-lru).
+
+    Cada rango guarda también el vencimiento de su entrada: al leer los rangos
+    se eliminan del hash los vencidos, así el hash no crece más que las
+    entradas creadas dentro del TTL aunque Redis las desaloje antes.
+    """
+
+    def __init__(self, client, prefix: str = "report_cache:",
+                 ttl: int = REPORT_CACHE_REDIS_TTL_SECONDS, clock: Callable[[], float] = time.time):
+        self.client = client
+        self.prefix = prefix
+        self.ttl = ttl
+        self.clock = clock
+        self._ranges_key = prefix + "ranges"
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.client.get(self.prefix + key)
+        return value.decode() if isinstance(value, bytes) else value
+
+    def set(self, key: str, value: str, ttl: Optional[int] = None, covers: Optional[Range] = None) -> None:
+        ttl = ttl or self.ttl
+        self.client.set(self.prefix + key, value, ex=ttl)
+        if covers is not None:
+            start, end = covers
+            self.client.hset(
+                self._ranges_key,
+                key,
+                f"{start.isoformat() if start else ''}|{end.isoformat()}|{self.clock() + ttl:.0f}",
+            )
+
+    def ranges(self) -> Dict[str, Range]:
+        ranges, expired = {}, []
+        now = self.clock()
+        for key, value in self.client.hgetall(self._ranges_key).items():
+            key = key.decode() if isinstance(key, bytes) else key
+            value = value.decode() if isinstance(value, bytes) else value
+            parts = value.split("|")
+            if len(parts) != 3 or float(parts[2]) <= now:
+                expired.append(key)
+                continue
+            start, end, _ = parts
+            ranges[key] = (
+                datetime.datetime.fromisoformat(start) if start else None,
+                datetime.datetime.fromisoformat(end),
+            )
+        if expired:
+            self.client.hdel(self._ranges_key, *expired)
+        return ranges
+
+    def delete(self, keys: Iterable[str]) -> None:
+        keys = list(keys)
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+            self.client.hdel(self._ranges_key, *keys)
+
+    def clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ReportCache:
+    """
+    Fachada usada por los controladores de reportes
+    """
+
+    def __init__(self, backend=None, bucket_seconds: int = REPORT_CACHE_BUCKET_SECONDS):
+        self.backend = backend
+        self.bucket_seconds = bucket_seconds
+
+    def key(self, report: str, filters: Dict[str, Any], covers: Tuple, bucket: Optional[int]) -> str:
+        payload = json.dumps([filters, covers, bucket], sort_keys=True, default=str)
+        return f"{report}:{hashlib.sha1(payload.encode()).hexdigest()}"
+
+    def cached(
+        self,
+        report: str,
+        filters: Dict[str, Any],
+        start: Optional[datetime.datetime],
+        end: Optional[datetime.datetime],
+        compute: Callable[[], List[Any]],
+    ) -> List[Any]:
+        """
+        Resultado de compute() (serializable a JSON) para el reporte y los
+        filtros dados; [start, end] es el rango de access_logs que lee
+        """
+        if self.backend is None:
+            return compute()
+
+        start, end = _naive_utc(start), _naive_utc(end)
+        now = datetime.datetime.utcnow()
+        closed = end is not None and end < now
+        bucket = None if closed else int(time.time()) // self.bucket_seconds
+        key = self.key(report, filters, (start, end), bucket)
+
+        value = self.backend.get(key)
+        if value is not None:
+            REQUESTS.inc(report=report, result="hit")
+            return json.loads(value)
+
+        REQUESTS.inc(report=report, result="miss")
+        result = compute()
+        self.backend.set(
+            key,
+            json.dumps(result),
+            ttl=None if closed else self.bucket_seconds,
+            covers=(start, end) if end is not None else None,
+        )
+        return result
+
+    def invalidate(self, timestamps: Iterable[datetime.datetime]) -> int:
+        """
+        Descarta las entradas cuyo rango contiene alguno de los timestamps
+        """
+        if self.backend is None:
+            return 0
+        timestamps = sorted(_naive_utc(t) for t in timestamps if t is not None)
+        if not timestamps:
+            return 0
+        stale = [
+            key
+            for key, (start, end) in self.backend.ranges().items()
+            if any((start is None or start <= t) and t <= end for t in timestamps)
+        ]
+        self.backend.delete(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        if self.backend is not None:
+            self.backend.clear()
+
+
+def create_backend(kind: str = REPORT_CACHE_BACKEND):
+    if kind == "none":
+        return None
+    if kind == "redis":
+        try:
+            import redis
+        except ImportError:
+            print("Warning: redis package not installed - using in-process report cache")
+        else:
+            return RedisBackend(redis.Redis.from_url(REPORT_CACHE_REDIS_URL))
+    return MemoryBackend()
+
+
+# Cache global (compartida entre requests del proceso)
+report_cache = ReportCache(create_backend())
+
+
+def _after_flush(session: Session, flush_context) -> None:
+    pending = session.info.setdefault(_PENDING_KEY, set())
+    for obj in list(session.new) + list(session.deleted):
+        if isinstance(obj, AccessLog):
+            pending.add(obj.timestamp)
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, (Employee, Warehouse)):
+            pending.add(_CLEAR)
+
+
+def _after_commit(session: Session) -> None:
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    if _CLEAR in pending:
+        report_cache.clear()
+    else:
+        report_cache.invalidate(pending)
+
+
+def _after_rollback(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+event.listen(Session, "after_flush", _after_flush)
+event.listen(Session, "after_commit", _after_commit)
+event.listen(Session, "after_rollback", _after_rollback)
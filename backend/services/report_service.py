@@ -1,8 +1,67 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
-from typing import List, Optional
-from datetime import datetime, timedelta
-from models import AccessLog, Employee, Warehouse
+from sqlalchemy import select
+from typing import Dict, Iterable, List, Optional
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from models import Employee, Warehouse
+from services import hours_service
+from services.rollup_service import EmployeeTotals, employee_totals
+
+
+@dataclass
+class EmployeeCheckinRow:
+    employee_id: int
+    employee_name: str
+    total_check_ins: int
+    total_check_outs: int
+    last_event: Optional[str]
+    last_event_time: Optional[datetime]
+
+
+@dataclass
+class WarehouseActivityRow:
+    warehouse_id: int
+    warehouse_name: str
+    total_events: int
+    unique_employees: int
+
+
+@dataclass
+class FrequentEmployeeRow:
+    employee_id: int
+    employee_name: str
+    total_events: int
+
+
+@dataclass
+class HoursReportRow:
+    employee_id: int
+    employee_name: str
+    period_start: date
+    hours: float
+    shifts: int
+    missing_punches: int
+
+
+def _employee_names(db: Session, employee_ids: Iterable[int]) -> Dict[int, str]:
+    employee_ids = list(employee_ids)
+    if not employee_ids:
+        return {}
+    rows = db.execute(
+        select(Employee.id, Employee.first_name, Employee.last_name).where(Employee.id.in_(employee_ids))
+    )
+    return {employee_id: f"{first} {last}" for employee_id, first, last in rows}
+
+
+def _by_employee(totals: List[EmployeeTotals]) -> Dict[int, EmployeeTotals]:
+    # Un empleado que cambió de almacén dentro del rango aparece una vez por almacén
+    merged: Dict[int, EmployeeTotals] = {}
+    for t in totals:
+        if t.employee_id in merged:
+            merged[t.employee_id].merge(t)
+        else:
+            merged[t.employee_id] = t
+    return merged
 
 
 def get_employee_checkin_report(
@@ -11,28 +70,22 @@ def get_employee_checkin_report(
     warehouse_id: Optional[int] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None
-):
-    query = db.query(
-        Employee.id.label("employee_id"),
-        func.concat(Employee.first_name, ' ', Employee.last_name).label("employee_name"),
-        func.sum(func.if_(AccessLog.event == 'in', 1, 0)).label("total_check_ins"),
-        func.sum(func.if_(AccessLog.event == 'out', 1, 0)).label("total_check_outs"),
-        func.max(AccessLog.event).label("last_event"),
-        func.max(AccessLog.ts).label("last_event_time")
-    ).join(AccessLog, Employee.id == AccessLog.employee_id)
-    
-    if employee_id:
-        query = query.filter(Employee.id == employee_id)
-    if warehouse_id:
-        query = query.filter(Employee.warehouse_id == warehouse_id)
-    if start_date:
-        query = query.filter(AccessLog.ts >= start_date)
-    if end_date:
-        query = query.filter(AccessLog.ts <= end_date)
-    
-    query = query.group_by(Employee.id)
-    
-    return query.all()
+) -> List[EmployeeCheckinRow]:
+    totals = _by_employee(
+        employee_totals(db, start_date, end_date, employee_id=employee_id, warehouse_id=warehouse_id)
+    )
+    names = _employee_names(db, totals)
+    return [
+        EmployeeCheckinRow(
+            employee_id=t.employee_id,
+            employee_name=names.get(t.employee_id, ""),
+            total_check_ins=t.check_ins,
+            total_check_outs=t.check_outs,
+            last_event=t.last_event,
+            last_event_time=t.last_event_at
+        )
+        for t in sorted(totals.values(), key=lambda t: t.employee_id)
+    ]
 
 
 def get_warehouse_activity_report(
@@ -40,26 +93,26 @@ def get_warehouse_activity_report(
     warehouse_id: Optional[int] = None,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None
-):
-    query = db.query(
-        Warehouse.id.label("warehouse_id"),
-        Warehouse.name.label("warehouse_name"),
-        func.count(AccessLog.id).label("total_events"),
-        func.count(func.distinct(AccessLog.employee_id)).label("unique_employees")
-    ).join(Employee, Warehouse.id == Employee.warehouse_id).join(
-        AccessLog, Employee.id == AccessLog.employee_id
-    )
-    
-    if warehouse_id:
-        query = query.filter(Warehouse.id == warehouse_id)
-    if start_date:
-        query = query.filter(AccessLog.ts >= start_date)
-    if end_date:
-        query = query.filter(AccessLog.ts <= end_date)
-    
-    query = query.group_by(Warehouse.id)
-    
-    return query.all()
+) -> List[WarehouseActivityRow]:
+    events: Dict[int, int] = {}
+    employees: Dict[int, set] = {}
+    for t in employee_totals(db, start_date, end_date, warehouse_id=warehouse_id):
+        events[t.warehouse_id] = events.get(t.warehouse_id, 0) + t.events
+        employees.setdefault(t.warehouse_id, set()).add(t.employee_id)
+    if not events:
+        return []
+
+    names = dict(db.execute(select(Warehouse.id, Warehouse.name).where(Warehouse.id.in_(list(events)))).all())
+    return [
+        WarehouseActivityRow(
+            warehouse_id=warehouse,
+            warehouse_name=names[warehouse],
+            total_events=events[warehouse],
+            unique_employees=len(employees[warehouse])
+        )
+        for warehouse in sorted(events)
+        if warehouse in names
+    ]
 
 
 def get_frequent_employees(
@@ -67,21 +120,41 @@ def get_frequent_employees(
     warehouse_id: Optional[int] = None,
     days: int = 7,
     limit: int = 10
-):
+) -> List[FrequentEmployeeRow]:
     start_date = datetime.utcnow() - timedelta(days=days)
-    
-    query = db.query(
-        Employee.id,
-        func.concat(Employee.first_name, ' ', Employee.last_name).label("name"),
-        func.count(AccessLog.id).label("total_events")
-    ).join(AccessLog, Employee.id == AccessLog.employee_id)
-    
-    if warehouse_id:
-        query = query.filter(Employee.warehouse_id == warehouse_id)
-    
-    query = query.filter(AccessLog.ts >= start_date)
-    query = query.group_by(Employee.id)
-    query = query.order_by(desc("total_events"))
-    query = query.limit(limit)
-    
-    return query.all()
+    totals = _by_employee(employee_totals(db, start_date, warehouse_id=warehouse_id))
+    top = sorted(totals.values(), key=lambda t: (-t.events, t.employee_id))[:limit]
+    names = _employee_names(db, (t.employee_id for t in top))
+    return [
+        FrequentEmployeeRow(
+            employee_id=t.employee_id,
+            employee_name=names.get(t.employee_id, ""),
+            total_events=t.events
+        )
+        for t in top
+    ]
+
+
+def get_hours_report(
+    db: Session,
+    start_date: date,
+    end_date: date,
+    employee_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+    period: str = "day"
+) -> List[HoursReportRow]:
+    rows = hours_service.worked_hours(
+        db, start_date, end_date, employee_id=employee_id, warehouse_id=warehouse_id, period=period
+    )
+    names = _employee_names(db, {r.employee_id for r in rows})
+    return [
+        HoursReportRow(
+            employee_id=r.employee_id,
+            employee_name=names.get(r.employee_id, ""),
+            period_start=r.period_start,
+            hours=r.hours,
+            shifts=r.shifts,
+            missing_punches=r.missing_punches
+        )
+        for r in rows
+    ]
@@ -0,0 +1,427 @@
+"""
+Rollups diarios de access_logs para reportes
+
+employee_daily_stats (empleado x día) guarda conteos de in/out, primer in,
+último out y último evento de cada día UTC completo. rollup_days registra qué
+días ya están consolidados. Los reportes por almacén también se calculan desde
+aquí: los empleados únicos de un rango no se pueden sumar día a día.
+
+Un job periódico (start_rollup_worker) consolida los días pendientes hasta
+ayer y vuelve a calcular los últimos ROLLUP_REOPEN_DAYS días para incluir
+eventos que llegaron tarde (kioskos sin conexión, relojes desfasados).
+Arranca en todos los workers; cada corrida toma el lock de MySQL
+GET_LOCK(ROLLUP_LOCK_NAME, 0) y, si otro proceso lo tiene, se salta la
+corrida, así nunca hay dos procesos borrando y reinsertando el mismo día.
+
+employee_totals combina ambas fuentes: rollups para los días completos del
+rango ya consolidados y access_logs sólo para los tramos parciales y los
+días sin consolidar (típicamente el día actual).
+"""
+
+import argparse
+import datetime
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, delete, func, insert, or_, select, text, true
+from sqlalchemy.orm import Session
+
+from models import AccessLog, Employee, EmployeeDailyStats, RollupDay
+
+# Intervalo del job de rollups en segundos (0 = deshabilitado)
+ROLLUP_INTERVAL_SECONDS = int(os.getenv("ROLLUP_INTERVAL_SECONDS", "3600"))
+# Lock con nombre de MySQL que asegura un solo proceso consolidando a la vez
+ROLLUP_LOCK_NAME = os.getenv("ROLLUP_LOCK_NAME", "access_log_rollups")
+# Días completos más recientes que se recalculan en cada corrida
+ROLLUP_REOPEN_DAYS = int(os.getenv("ROLLUP_REOPEN_DAYS", "2"))
+
+ONE_DAY = datetime.timedelta(days=1)
+
+# Tramo de access_logs: (desde inclusive, hasta, hasta inclusive); None = sin límite
+LogSpan = Tuple[Optional[datetime.datetime], Optional[datetime.datetime], bool]
+# Días consolidados contiguos: [primer día, día final exclusivo)
+DaySpan = Tuple[datetime.date, datetime.date]
+
+
+@dataclass
+class EmployeeTotals:
+    """Totales de un empleado (en un almacén) para un rango"""
+
+    employee_id: int
+    warehouse_id: Optional[int]
+    check_ins: int = 0
+    check_outs: int = 0
+    events: int = 0
+    first_in: Optional[datetime.datetime] = None
+    last_out: Optional[datetime.datetime] = None
+    last_event: Optional[str] = None
+    last_event_at: Optional[datetime.datetime] = None
+
+    def merge(self, other: "EmployeeTotals") -> None:
+        self.check_ins += other.check_ins
+        self.check_outs += other.check_outs
+        self.events += other.events
+        if other.first_in is not None and (self.first_in is None or other.first_in < self.first_in):
+            self.first_in = other.first_in
+        if other.last_out is not None and (self.last_out is None or other.last_out > self.last_out):
+            self.last_out = other.last_out
+        if other.last_event_at is not None and (
+            self.last_event_at is None or other.last_event_at > self.last_event_at
+        ):
+            self.last_event, self.last_event_at = other.last_event, other.last_event_at
+
+
+def _midnight(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time())
+
+
+def _naive_utc(value: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    # access_logs y los días consolidados son UTC naive
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+
+
+def split_range(
+    db: Session,
+    start_date: Optional[datetime.datetime],
+    end_date: Optional[datetime.datetime],
+) -> Tuple[List[DaySpan], List[LogSpan]]:
+    """
+    Divide [start_date, end_date] en días consolidados (se leen de los
+    rollups) y tramos que se leen de access_logs
+    """
+    query = select(RollupDay.day).order_by(RollupDay.day)
+    if start_date is not None:
+        first_day = start_date.date()
+        if start_date != _midnight(first_day):
+            first_day += ONE_DAY
+        query = query.where(RollupDay.day >= first_day)
+    if end_date is not None:
+        # Un día está completo si su último instante cae dentro del rango
+        query = query.where(RollupDay.day < (end_date + datetime.timedelta(microseconds=1)).date())
+
+    day_spans: List[DaySpan] = []
+    for day in db.execute(query).scalars():
+        if day_spans and day_spans[-1][1] == day:
+            day_spans[-1] = (day_spans[-1][0], day + ONE_DAY)
+        else:
+            day_spans.append((day, day + ONE_DAY))
+
+    log_spans: List[LogSpan] = []
+    cursor = start_date
+    for first, stop in day_spans:
+        if cursor is None or cursor < _midnight(first):
+            log_spans.append((cursor, _midnight(first), False))
+        cursor = _midnight(stop)
+    if cursor is None or end_date is None or cursor <= end_date:
+        log_spans.append((cursor, end_date, True))
+    return day_spans, log_spans
+
+
+def _log_span_condition(spans: Sequence[LogSpan]):
+    conditions = []
+    for start, end, end_inclusive in spans:
+        bounds = []
+        if start is not None:
+            bounds.append(AccessLog.timestamp >= start)
+        if end is not None:
+            bounds.append(AccessLog.timestamp <= end if end_inclusive else AccessLog.timestamp < end)
+        conditions.append(and_(*bounds) if bounds else true())
+    return or_(*conditions)
+
+
+def log_totals(
+    db: Session,
+    spans: Sequence[LogSpan],
+    employee_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+) -> List[EmployeeTotals]:
+    """
+    Totales por empleado calculados sobre access_logs
+    """
+    if not spans:
+        return []
+    conditions = [_log_span_condition(spans)]
+    if employee_id:
+        conditions.append(AccessLog.employee_id == employee_id)
+    if warehouse_id:
+        conditions.append(Employee.warehouse_id == warehouse_id)
+
+    is_in = AccessLog.event_type == "in"
+    is_out = AccessLog.event_type == "out"
+    rows = db.execute(
+        select(
+            AccessLog.employee_id,
+            Employee.warehouse_id,
+            func.sum(case((is_in, 1), else_=0)),
+            func.sum(case((is_out, 1), else_=0)),
+            func.count(AccessLog.id),
+            func.min(case((is_in, AccessLog.timestamp))),
+            func.max(case((is_out, AccessLog.timestamp))),
+            func.max(AccessLog.timestamp),
+        )
+        .join(Employee, Employee.id == AccessLog.employee_id)
+        .where(*conditions)
+        .group_by(AccessLog.employee_id, Employee.warehouse_id)
+    ).all()
+    if not rows:
+        return []
+
+    ranked = (
+        select(
+            AccessLog.employee_id,
+            AccessLog.event_type,
+            func.row_number()
+            .over(
+                partition_by=AccessLog.employee_id,
+                order_by=(AccessLog.timestamp.desc(), AccessLog.id.desc()),
+            )
+            .label("position"),
+        )
+        .join(Employee, Employee.id == AccessLog.employee_id)
+        .where(*conditions)
+        .subquery()
+    )
+    last_events = dict(
+        db.execute(
+            select(ranked.c.employee_id, ranked.c.event_type).where(ranked.c.position == 1)
+        ).all()
+    )
+    return [
+        EmployeeTotals(
+            employee_id, warehouse, ins or 0, outs or 0, events,
+            first_in, last_out, last_events.get(employee_id), last_at,
+        )
+        for employee_id, warehouse, ins, outs, events, first_in, last_out, last_at in rows
+    ]
+
+
+def rollup_totals(
+    db: Session,
+    spans: Sequence[DaySpan],
+    employee_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+) -> List[EmployeeTotals]:
+    """
+    Totales por empleado y almacén sumando employee_daily_stats
+    """
+    if not spans:
+        return []
+    stats = EmployeeDailyStats
+    conditions = [or_(*[and_(stats.day >= first, stats.day < stop) for first, stop in spans])]
+    if employee_id:
+        conditions.append(stats.employee_id == employee_id)
+    if warehouse_id:
+        conditions.append(stats.warehouse_id == warehouse_id)
+
+    rows = db.execute(
+        select(
+            stats.employee_id,
+            stats.warehouse_id,
+            func.sum(stats.check_ins),
+            func.sum(stats.check_outs),
+            func.sum(stats.events),
+            func.min(stats.first_in),
+            func.max(stats.last_out),
+            func.max(stats.last_event_at),
+        )
+        .where(*conditions)
+        .group_by(stats.employee_id, stats.warehouse_id)
+    ).all()
+    if not rows:
+        return []
+
+    ranked = (
+        select(
+            stats.employee_id,
+            stats.warehouse_id,
+            stats.last_event,
+            func.row_number()
+            .over(
+                partition_by=(stats.employee_id, stats.warehouse_id),
+                order_by=stats.last_event_at.desc(),
+            )
+            .label("position"),
+        )
+        .where(*conditions)
+        .subquery()
+    )
+    last_events = {
+        (employee, warehouse): event
+        for employee, warehouse, event in db.execute(
+            select(ranked.c.employee_id, ranked.c.warehouse_id, ranked.c.last_event).where(
+                ranked.c.position == 1
+            )
+        )
+    }
+    return [
+        EmployeeTotals(
+            employee_id, warehouse, int(ins), int(outs), int(events),
+            first_in, last_out, last_events.get((employee_id, warehouse)), last_at,
+        )
+        for employee_id, warehouse, ins, outs, events, first_in, last_out, last_at in rows
+    ]
+
+
+def employee_totals(
+    db: Session,
+    start_date: Optional[datetime.datetime] = None,
+    end_date: Optional[datetime.datetime] = None,
+    employee_id: Optional[int] = None,
+    warehouse_id: Optional[int] = None,
+) -> List[EmployeeTotals]:
+    """
+    Totales por (empleado, almacén) del rango: rollups para los días
+    consolidados y access_logs para el resto. En días consolidados el almacén
+    es el que tenía el empleado al consolidar; en el resto, el actual.
+    """
+    day_spans, log_spans = split_range(db, _naive_utc(start_date), _naive_utc(end_date))
+    merged: Dict[Tuple[int, Optional[int]], EmployeeTotals] = {}
+    for totals in rollup_totals(db, day_spans, employee_id, warehouse_id) + log_totals(
+        db, log_spans, employee_id, warehouse_id
+    ):
+        key = (totals.employee_id, totals.warehouse_id)
+        if key in merged:
+            merged[key].merge(totals)
+        else:
+            merged[key] = totals
+    return list(merged.values())
+
+
+def rollup_day(db: Session, day: datetime.date) -> int:
+    """
+    Recalcula los rollups de un día desde access_logs. No hace commit.
+    Retorna la cantidad de empleados con eventos ese día.
+    """
+    start = _midnight(day)
+    totals = log_totals(db, [(start, start + ONE_DAY, False)])
+
+    db.execute(delete(EmployeeDailyStats).where(EmployeeDailyStats.day == day))
+    if totals:
+        db.execute(insert(EmployeeDailyStats), [dict(asdict(t), day=day) for t in totals])
+
+    last_log_id = db.scalar(
+        select(func.max(AccessLog.id)).where(
+            AccessLog.timestamp >= start, AccessLog.timestamp < start + ONE_DAY
+        )
+    )
+    db.merge(RollupDay(day=day, rolled_at=datetime.datetime.utcnow(), last_access_log_id=last_log_id))
+    return len(totals)
+
+
+def refresh_rollups(db: Session, today: Optional[datetime.date] = None) -> int:
+    """
+    Consolida los días pendientes hasta ayer (UTC) y recalcula los últimos
+    ROLLUP_REOPEN_DAYS. Hace commit por día. Retorna los días procesados.
+    """
+    today = today or datetime.datetime.utcnow().date()
+    last_rolled = db.scalar(select(func.max(RollupDay.day)))
+    if last_rolled is None:
+        first_log = db.scalar(select(func.min(AccessLog.timestamp)))
+        if first_log is None:
+            return 0
+        day = first_log.date()
+    else:
+        day = min(last_rolled + ONE_DAY, today - ROLLUP_REOPEN_DAYS * ONE_DAY)
+
+    processed = 0
+    while day < today:
+        rollup_day(db, day)
+        db.commit()
+        day += ONE_DAY
+        processed += 1
+    return processed
+
+
+def rebuild_rollups(db: Session, since: Optional[datetime.date] = None) -> int:
+    """
+    Descarta los días consolidados desde `since` (o todos) y los recalcula
+    """
+    query = delete(RollupDay)
+    if since is not None:
+        query = query.where(RollupDay.day >= since)
+    db.execute(query)
+    db.commit()
+    return refresh_rollups(db)
+
+
+@contextmanager
+def single_runner(db: Session) -> Iterator[bool]:
+    """
+    True si este proceso puede consolidar. En MySQL toma GET_LOCK sin espera
+    en una conexión propia (los commits por día de la sesión devuelven la suya
+    al pool); en otros motores (SQLite en tests) no hay otros procesos.
+    """
+    bind = db.get_bind()
+    if bind.dialect.name != "mysql":
+        yield True
+        return
+
+    with bind.connect() as lock_connection:
+        acquired = lock_connection.scalar(
+            text("SELECT GET_LOCK(:name, 0)"), {"name": ROLLUP_LOCK_NAME}
+        )
+        try:
+            yield bool(acquired)
+        finally:
+            if acquired:
+                lock_connection.scalar(
+                    text("SELECT RELEASE_LOCK(:name)"), {"name": ROLLUP_LOCK_NAME}
+                )
+
+
+def start_rollup_worker(
+    session_factory, interval_seconds: int = ROLLUP_INTERVAL_SECONDS
+) -> Optional[threading.Thread]:
+    """
+    Lanza un hilo daemon que ejecuta refresh_rollups periódicamente.
+    Seguro en todos los workers: sólo consolida quien obtiene el lock.
+    """
+    if interval_seconds <= 0:
+        return None
+
+    def run():
+        while True:
+            db = session_factory()
+            try:
+                with single_runner(db) as acquired:
+                    days = refresh_rollups(db) if acquired else 0
+                if days:
+                    print(f"📊 Rolled up {days} days of access logs")
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Access log rollup failed: {e}")
+            finally:
+                db.close()
+            time.sleep(interval_seconds)
+
+    worker = threading.Thread(target=run, name="access-log-rollups", daemon=True)
+    worker.start()
+    return worker
+
+
+if __name__ == "__main__":
+    from database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Consolida access_logs en rollups diarios")
+    parser.add_argument("--rebuild", action="store_true", help="Recalcular días ya consolidados")
+    parser.add_argument("--since", type=datetime.date.fromisoformat, help="Primer día a recalcular (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    session = SessionLocal()
+    try:
+        with single_runner(session) as acquired:
+            if not acquired:
+                raise SystemExit("Another process is rolling up access logs, try again later")
+            if args.rebuild:
+                days = rebuild_rollups(session, args.since)
+            else:
+                days = refresh_rollups(session)
+        print(f"Rolled up {days} days of access logs")
+    finally:
+        session.close()
@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from models import User
-from utils.security import get_password_hash as hash_password
+from utils.security import get_password_hash as hash_password, hash_password_async
 import datetime
 
 
@@ -13,7 +14,7 @@ class UserService:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_user(
+    async def create_user(
         self,
         username: str,
         email: str,
@@ -25,9 +26,32 @@ class UserService:
     ) -> User:
         """
         Create a new user
-        """
-        hashed_password = hash_password(password)
+        bcrypt corre en el executor de contraseñas y la escritura en el
+        threadpool, así no se retiene un hilo del threadpool mientras se hashea
+        """
+        hashed_password = await hash_password_async(password)
+
+        return await run_in_threadpool(
+            self._save_new_user,
+            username,
+            email,
+            hashed_password,
+            first_name,
+            last_name,
+            warehouse_id,
+            role_id,
+        )
 
+    def _save_new_user(
+        self,
+        username: str,
+        email: str,
+        hashed_password: str,
+        first_name: str,
+        last_name: str,
+        warehouse_id: int,
+        role_id: int,
+    ) -> User:
         db_user = User(
             username=username,
             email=email,
@@ -150,7 +174,7 @@ class UserService:
 
 
 # Mantener compatibilidad con funciones originales
-def create_user(
+async def create_user(
     db: Session,
     username: str,
     email: str,
@@ -161,7 +185,7 @@ def create_user(
     role_id: int = 3,
 ) -> User:
     service = UserService(db)
-    return service.create_user(
+    return await service.create_user(
         username, email, password, first_name, last_name, warehouse_id, role_id
     )
 
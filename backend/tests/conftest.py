@@ -3,16 +3,22 @@ Common configuration for all tests
 Shared fixtures and unified database configuration
 """
 
+from contextlib import contextmanager
+from typing import Optional
+
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from main import app
 from database import get_db, Base
+from dependencies import get_current_user
 from models import User, Role, Company, Warehouse, Employee
 from utils.security import get_password_hash as hash_password
+from services.report_cache import report_cache
+from services.principal_cache import principal_cache
 
 # Strong passwords for tests
 TEST_PASSWORDS = {
@@ -44,6 +50,16 @@ def override_get_db():
 app.dependency_overrides[get_db] = override_get_db
 client = TestClient(app)
 
+@pytest.fixture(autouse=True)
+def clear_report_cache():
+    """Los datos de cada test se descartan con rollback; las caches en proceso también"""
+    report_cache.clear()
+    principal_cache.clear()
+    yield
+    report_cache.clear()
+    principal_cache.clear()
+
+
 @pytest.fixture(scope="session")
 def test_db():
     """Database fixture for the entire test session"""
@@ -254,6 +270,26 @@ def setup_test_data(db_session):
     }
 
 
+@contextmanager
+def recorded_statements(db, verb: Optional[str] = None):
+    """
+    Registra (sql, parámetros) de cada sentencia ejecutada en la conexión de
+    db dentro del bloque; con verb sólo las que empiezan así (p. ej. "SELECT")
+    """
+    statements = []
+    connection = db.connection()
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if verb is None or statement.lstrip().upper().startswith(verb):
+            statements.append((statement, parameters))
+
+    event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+
 def get_auth_token(username: str, password: str) -> str:
     """Helper para obtener token de autenticación"""
     response = client.post(
@@ -285,3 +321,23 @@ def employee_token(setup_test_data):
 def test_client():
     """Cliente de pruebas FastAPI"""
     return client
+
+
+@pytest.fixture
+def metrics_client(monkeypatch):
+    """Cliente con METRICS_TOKEN configurado y enviado en cada request"""
+    import dependencies
+
+    monkeypatch.setattr(dependencies, "METRICS_TOKEN", "metrics-test-token")
+    return TestClient(app, headers={"Authorization": "Bearer metrics-test-token"})
+
+
+@pytest.fixture
+def admin_client(db_session, setup_test_data):
+    """Cliente que comparte db_session, autenticado como el usuario admin"""
+    previous_get_db = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: db_session.get(User, 1)
+    yield client
+    app.dependency_overrides.pop(get_current_user)
+    app.dependency_overrides[get_db] = previous_get_db
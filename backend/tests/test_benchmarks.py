@@ -0,0 +1,39 @@
+"""
+Recognition benchmark smoke tests
+Runs the benchmark on a tiny SQLite gallery so the script keeps working
+"""
+
+from benchmarks.hours import bench_hours
+from benchmarks.jwt_decode import bench_jwt
+from benchmarks.recognition import MATCHERS, bench_matchers, bench_serialization, create_gallery_db
+
+
+def test_matchers_agree_on_small_gallery(tmp_path):
+    factory, centers = create_gallery_db(str(tmp_path / "gallery.db"), 200, per_employee=4)
+    try:
+        results = bench_matchers(
+            factory, centers, MATCHERS, queries=20, legacy_queries=3, batch=8
+        )
+    finally:
+        factory.kw["bind"].dispose()
+
+    assert results["load"]["ms"] > 0
+    for matcher in MATCHERS:
+        assert results[matcher]["accuracy"] == 1.0
+        assert results[matcher]["qps"] > 0
+
+
+def test_serialization_benchmark():
+    results = bench_serialization(count=100)
+    assert set(results["deserialize"]) == {"binary_us", "text_us", "binary_matrix_us"}
+
+
+def test_hours_benchmark():
+    results = bench_hours(employees=50, days=7)
+    assert results["day_rows"] > 0 and results["week_rows"] > 0
+
+
+def test_jwt_benchmark():
+    results = bench_jwt(iterations=20)
+    assert {"jose", "stdlib", "cached"} <= set(results)
+    assert all(r["decode_us"] > 0 for r in results.values())
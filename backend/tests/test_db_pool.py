@@ -0,0 +1,111 @@
+"""
+Database connection pool tests
+Single engine configuration, pool status, wait/timeout metrics and endpoints
+"""
+
+import threading
+
+import pytest
+from sqlalchemy import exc, text
+
+import database
+from database import POOL_TIMEOUTS, POOL_WAIT_SECONDS, InstrumentedQueuePool, create_db_engine, pool_status
+
+
+@pytest.fixture
+def small_engine(tmp_path):
+    engine = create_db_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        pool_size=2,
+        max_overflow=1,
+        pool_timeout=0.2,
+        connect_args={"check_same_thread": False},
+    )
+    yield engine
+    engine.dispose()
+
+
+class TestEngineConfiguration:
+    """One engine, configured from the environment"""
+
+    def test_session_factory_uses_module_engine(self):
+        assert database.SessionLocal.kw["bind"] is database.engine
+        assert isinstance(database.engine.pool, InstrumentedQueuePool)
+
+    def test_pool_settings_come_from_env(self):
+        pool = database.engine.pool
+        assert pool.size() == database.DB_POOL_SIZE
+        assert pool.timeout() == database.DB_POOL_TIMEOUT
+        assert pool._recycle == database.DB_POOL_RECYCLE
+        assert pool._pre_ping == database.DB_POOL_PRE_PING
+
+    def test_overrides_replace_env_settings(self, small_engine):
+        assert small_engine.pool.size() == 2
+        assert pool_status(small_engine)["max_overflow"] == 1
+
+
+class TestPoolStatus:
+    """Checked out / overflow accounting and wait metrics"""
+
+    def test_status_tracks_checkouts_and_overflow(self, small_engine):
+        connections = [small_engine.connect() for _ in range(3)]
+        status = pool_status(small_engine)
+        assert status["checked_out"] == 3
+        assert status["overflow"] == 1
+
+        for connection in connections:
+            connection.close()
+        status = pool_status(small_engine)
+        assert status["checked_out"] == 0
+        assert status["checked_in"] == 2
+
+    def test_checkout_records_wait_time(self, small_engine):
+        before = POOL_WAIT_SECONDS.count()
+        with small_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+        assert POOL_WAIT_SECONDS.count() == before + 1
+
+    def test_exhausted_pool_counts_timeout(self, small_engine):
+        before = POOL_TIMEOUTS.value()
+        connections = [small_engine.connect() for _ in range(3)]
+        try:
+            with pytest.raises(exc.TimeoutError):
+                small_engine.connect()
+        finally:
+            for connection in connections:
+                connection.close()
+        assert POOL_TIMEOUTS.value() == before + 1
+
+    def test_waiter_gets_released_connection(self, small_engine):
+        connections = [small_engine.connect() for _ in range(3)]
+        waited = []
+
+        def checkout():
+            with small_engine.connect():
+                waited.append(True)
+
+        waiter = threading.Thread(target=checkout)
+        waiter.start()
+        connections.pop().close()
+        waiter.join(timeout=2)
+        for connection in connections:
+            connection.close()
+        assert waited == [True]
+
+
+class TestPoolEndpoints:
+    """Instrumentation endpoints"""
+
+    def test_pool_endpoint(self, metrics_client):
+        response = metrics_client.get("/metrics/pool")
+        assert response.status_code == 200
+        body = response.json()
+        for field in ("size", "checked_out", "checked_in", "overflow", "waits", "wait_seconds_total", "timeouts"):
+            assert field in body
+        assert body["size"] == database.DB_POOL_SIZE
+
+    def test_prometheus_exposes_pool_gauges(self, metrics_client):
+        text_body = metrics_client.get("/metrics").text
+        assert "# TYPE db_pool_checked_out gauge" in text_body
+        assert "# TYPE db_pool_overflow gauge" in text_body
+        assert "# TYPE db_pool_wait_seconds histogram" in text_body
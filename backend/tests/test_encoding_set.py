@@ -0,0 +1,110 @@
+"""
+Bounded per-employee encoding set tests
+"""
+
+import numpy as np
+
+from models import FaceEncoding
+from services import encoding_set_service
+from services.face_recognition_service import serialize_encoding
+
+
+def spread_encodings(count, seed=0):
+    """Encodings far apart from each other (distance ~1.4)"""
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, 0.1, size=(count, 128)).astype(np.float32)
+
+
+def stored_ids(db_session, employee_id):
+    return [
+        row.id
+        for row in db_session.query(FaceEncoding)
+        .filter(FaceEncoding.employee_id == employee_id)
+        .order_by(FaceEncoding.id)
+    ]
+
+
+class TestSelectDiverse:
+    """Pure selection logic"""
+
+    def test_keeps_anchor_and_newest_diverse(self):
+        vectors = spread_encodings(5)
+        # Row 3 is a near-duplicate of row 4 (newer), so it is dropped
+        vectors[3] = vectors[4] + 0.001
+        keep = encoding_set_service.select_diverse(vectors, max_size=10, min_distance=0.2)
+        assert keep == [0, 1, 2, 4]
+
+    def test_respects_max_size(self):
+        vectors = spread_encodings(20)
+        keep = encoding_set_service.select_diverse(vectors, max_size=4, min_distance=0.2)
+        assert keep == [0, 17, 18, 19]
+
+    def test_most_redundant_never_returns_anchor(self):
+        vectors = spread_encodings(4)
+        vectors[1] = vectors[0] + 0.001
+        assert encoding_set_service.most_redundant_index(vectors) == 1
+
+
+class TestAddProbe:
+    """Adding probes after successful matches"""
+
+    def test_close_probe_is_not_stored(self, db_session, setup_test_data):
+        vector = spread_encodings(1)[0]
+        db_session.add(FaceEncoding(employee_id=1, encoding=serialize_encoding(vector)))
+        db_session.commit()
+
+        update = encoding_set_service.add_probe(db_session, 1, vector + 0.001)
+        assert update.added is None
+        assert update.evicted_ids == []
+
+    def test_novel_probe_is_stored(self, db_session, setup_test_data):
+        vectors = spread_encodings(2)
+        db_session.add(FaceEncoding(employee_id=1, encoding=serialize_encoding(vectors[0])))
+        db_session.commit()
+
+        update = encoding_set_service.add_probe(db_session, 1, vectors[1])
+        db_session.commit()
+        assert update.added is not None
+        assert len(stored_ids(db_session, 1)) == 2
+
+    def test_full_set_evicts_redundant_encoding(
+        self, db_session, setup_test_data, monkeypatch
+    ):
+        monkeypatch.setattr(encoding_set_service, "MAX_ENCODINGS_PER_EMPLOYEE", 3)
+        vectors = spread_encodings(4)
+        # Redundant pair, but still above the novelty threshold
+        vectors[2] = vectors[1] + np.full(128, 0.25 / np.sqrt(128), dtype=np.float32)
+        for vector in vectors[:3]:
+            db_session.add(FaceEncoding(employee_id=1, encoding=serialize_encoding(vector)))
+        db_session.commit()
+        anchor_id = stored_ids(db_session, 1)[0]
+
+        update = encoding_set_service.add_probe(db_session, 1, vectors[3])
+        db_session.commit()
+
+        ids = stored_ids(db_session, 1)
+        assert update.added is not None
+        assert len(update.evicted_ids) == 1
+        assert len(ids) == 3
+        assert anchor_id in ids
+
+
+class TestCompaction:
+    """Background compaction of bloated sets"""
+
+    def test_compact_all_bounds_every_employee(
+        self, db_session, setup_test_data, monkeypatch
+    ):
+        monkeypatch.setattr(encoding_set_service, "MAX_ENCODINGS_PER_EMPLOYEE", 4)
+        for vector in spread_encodings(10):
+            db_session.add(FaceEncoding(employee_id=1, encoding=serialize_encoding(vector)))
+        for vector in spread_encodings(2, seed=1):
+            db_session.add(FaceEncoding(employee_id=2, encoding=serialize_encoding(vector)))
+        db_session.commit()
+
+        assert encoding_set_service.get_bloated_employee_ids(db_session, 4) == [1]
+        removed = encoding_set_service.compact_all(db_session)
+
+        assert removed == 6
+        assert len(stored_ids(db_session, 1)) == 4
+        assert len(stored_ids(db_session, 2)) == 2
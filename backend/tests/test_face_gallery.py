@@ -0,0 +1,354 @@
+"""
+In-memory face gallery tests
+Uses synthetic 128-d encodings instead of real images
+"""
+
+import numpy as np
+import pytest
+
+from controllers import employees as employees_controller
+from database import get_db
+from dependencies import get_current_user
+from main import app
+from models import AccessLog, Employee, FaceEncoding, User
+from services import face_pipeline as face_pipeline_module
+from services.face_gallery import FaceGallery, WarehouseGallery, face_gallery
+from services.face_pipeline import face_pipeline
+from services.presence_service import presence_cache
+from utils.rate_limiter import BUDGET_REJECTED, MemoryBackend, face_budgets
+from services.face_recognition_service import (
+    deserialize_encoding,
+    deserialize_encodings,
+    serialize_encoding,
+    serialize_legacy_encoding,
+)
+
+
+def random_encodings(count, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, 0.1, size=(count, 128)).astype(np.float32)
+
+
+class TestEncodingStorage:
+    """Binary float32 storage format for FaceEncoding.encoding"""
+
+    def test_binary_round_trip(self):
+        vector = random_encodings(1)[0]
+        data = serialize_encoding(vector)
+        assert isinstance(data, bytes)
+        assert len(data) == 512
+        assert np.array_equal(deserialize_encoding(data), vector)
+
+    def test_legacy_text_is_still_readable(self):
+        vector = random_encodings(1)[0]
+        text = serialize_legacy_encoding(vector)
+        assert np.allclose(deserialize_encoding(text), vector, atol=1e-7)
+
+    def test_deserialize_many_into_matrix(self):
+        vectors = random_encodings(4)
+        stored = [serialize_encoding(v) for v in vectors]
+        assert np.array_equal(deserialize_encodings(stored), vectors)
+
+        stored[1] = serialize_legacy_encoding(vectors[1])
+        assert np.allclose(deserialize_encodings(stored), vectors, atol=1e-7)
+
+
+class TestWarehouseGallery:
+    """Vectorized nearest-neighbour block"""
+
+    def test_nearest_matches_brute_force(self):
+        vectors = random_encodings(500)
+        employee_ids = np.arange(500, dtype=np.int64) // 5
+        block = WarehouseGallery(capacity=1)
+        block.append(employee_ids[:200], vectors[:200])
+        block.append(employee_ids[200:], vectors[200:])
+        assert block.size == 500
+
+        probe = vectors[137] + 0.01
+        expected = np.linalg.norm(vectors - probe, axis=1)
+
+        employee_id, distance = block.nearest(probe)
+        assert employee_id == employee_ids[int(np.argmin(expected))]
+        assert abs(distance - float(expected.min())) < 1e-4
+
+    def test_nearest_many_matches_single_queries(self):
+        vectors = random_encodings(300)
+        block = WarehouseGallery()
+        block.append(np.arange(300, dtype=np.int64) // 3, vectors)
+
+        probes = random_encodings(7, seed=5)
+        ids, distances = block.nearest_many(probes)
+        for probe, employee_id, distance in zip(probes, ids, distances):
+            single_id, single_distance = block.nearest(probe)
+            assert employee_id == single_id
+            assert abs(distance - single_distance) < 1e-4
+
+    def test_empty_block_has_no_match(self):
+        assert WarehouseGallery().nearest(np.zeros(128, dtype=np.float32)) is None
+
+
+class TestFaceGallery:
+    """Gallery loading and matching from the database"""
+
+    def _seed_encodings(self, db_session):
+        vectors = random_encodings(6, seed=1)
+        # Employees 1, 2 and 3 live in warehouses 1, 2 and 3
+        for index, vector in enumerate(vectors):
+            db_session.add(
+                FaceEncoding(
+                    employee_id=index % 3 + 1, encoding=serialize_encoding(vector)
+                )
+            )
+        db_session.commit()
+        return vectors
+
+    def test_match_across_all_warehouses(self, db_session, setup_test_data):
+        vectors = self._seed_encodings(db_session)
+        gallery = FaceGallery()
+
+        match = gallery.match(db_session, vectors[4])
+        assert gallery.size() == 6
+        assert match.employee_id == 2
+        assert match.name == "Jane Smith"
+        assert match.distance < 1e-3
+
+    def test_match_restricted_to_warehouse(self, db_session, setup_test_data):
+        vectors = self._seed_encodings(db_session)
+        gallery = FaceGallery()
+
+        match = gallery.match(db_session, vectors[4], warehouse_id=1)
+        assert match.employee_id == 1
+        assert match.distance > 0.1
+        assert gallery.match(db_session, vectors[0], warehouse_id=99) is None
+
+    def test_inactive_employees_are_excluded(self, db_session, setup_test_data):
+        vectors = self._seed_encodings(db_session)
+        db_session.get(Employee, 2).is_active = False
+        db_session.commit()
+        gallery = FaceGallery()
+
+        match = gallery.match(db_session, vectors[4])
+        assert match.employee_id != 2
+        assert gallery.size(2) == 0
+        assert gallery.size() == 4
+
+    def test_add_encoding_and_invalidate(self, db_session, setup_test_data):
+        self._seed_encodings(db_session)
+        gallery = FaceGallery()
+        gallery.load(db_session)
+
+        probe = np.full(128, 0.5, dtype=np.float32)
+        gallery.add_encoding(1, 1, "John Doe", probe)
+        assert gallery.size(1) == 3
+        assert gallery.match(db_session, probe).distance < 1e-3
+
+        gallery.invalidate()
+        assert not gallery.loaded
+        assert gallery.size() == 0
+        gallery.ensure_loaded(db_session)
+        assert gallery.size() == 6
+
+    def test_match_many_returns_one_match_per_probe(self, db_session, setup_test_data):
+        vectors = self._seed_encodings(db_session)
+        gallery = FaceGallery()
+
+        matches = gallery.match_many(db_session, vectors[[0, 4, 2]])
+        assert [m.employee_id for m in matches] == [1, 2, 3]
+        assert gallery.match_many(db_session, vectors[:2], warehouse_id=99) == [None, None]
+
+
+@pytest.fixture
+def kiosk_client(db_session, setup_test_data, test_client, monkeypatch):
+    """Test client sharing db_session, authenticated as the admin user"""
+    monkeypatch.setattr(face_pipeline, "workers", 0)
+    monkeypatch.setattr(face_budgets, "backend", MemoryBackend())
+    presence_cache.clear()
+    previous_get_db = app.dependency_overrides.get(get_db)
+    app.dependency_overrides[get_db] = lambda: db_session
+    app.dependency_overrides[get_current_user] = lambda: db_session.get(User, 1)
+    face_gallery.invalidate()
+    yield test_client
+    face_gallery.invalidate()
+    app.dependency_overrides.pop(get_current_user)
+    app.dependency_overrides[get_db] = previous_get_db
+
+
+class TestBatchCheckInOut:
+    """POST /employees/check_in_out/batch with detection replaced by fixed encodings"""
+
+    def test_batch_logs_one_event_per_employee(self, db_session, kiosk_client, monkeypatch):
+        vectors = TestFaceGallery()._seed_encodings(db_session)
+        unknown = np.full(128, 0.9, dtype=np.float32)
+        frames = [np.stack([vectors[0], unknown]), vectors[[3]], np.empty((0, 128))]
+        monkeypatch.setattr(
+            face_pipeline_module, "compute_image_encodings", lambda images: frames
+        )
+
+        response = kiosk_client.post(
+            "/employees/check_in_out/batch",
+            json={"images_base64": ["YQ==", "Yg==", "Yw=="], "warehouse_id": 1},
+        )
+
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [(r["frame"], r["face"]) for r in results] == [(0, 0), (0, 1), (1, 0)]
+        assert [r["recognized"] for r in results] == [True, False, True]
+        assert results[0]["employee_id"] == results[2]["employee_id"] == 1
+        assert results[0]["event"] == results[2]["event"] == "in"
+        assert db_session.query(AccessLog).filter_by(employee_id=1).count() == 1
+
+    def test_batch_without_faces_is_rejected(self, kiosk_client, monkeypatch):
+        monkeypatch.setattr(
+            face_pipeline_module,
+            "compute_image_encodings",
+            lambda images: [np.empty((0, 128))],
+        )
+        response = kiosk_client.post(
+            "/employees/check_in_out/batch", json={"images_base64": ["YQ=="]}
+        )
+        assert response.status_code == 422
+
+
+class TestImageUploads:
+    """Multipart and raw binary variants of register_face and check_in_out"""
+
+    @pytest.fixture
+    def received(self, db_session, monkeypatch):
+        vectors = TestFaceGallery()._seed_encodings(db_session)
+        images = []
+
+        def compute_image_encodings(data):
+            images.extend(data)
+            return [vectors[[0]] for _ in data]
+
+        monkeypatch.setattr(
+            face_pipeline_module, "compute_image_encodings", compute_image_encodings
+        )
+        return images
+
+    def test_raw_jpeg_body(self, kiosk_client, received):
+        response = kiosk_client.post(
+            "/employees/check_in_out/upload?warehouse_id=1",
+            content=b"\xff\xd8raw-jpeg",
+            headers={"Content-Type": "image/jpeg"},
+        )
+        assert response.status_code == 200
+        assert response.json()["employee_id"] == 1
+        assert received == [b"\xff\xd8raw-jpeg"]
+        assert "gallery_match;dur=" in response.headers["Server-Timing"]
+
+    def test_multipart_check_in_out(self, kiosk_client, received):
+        response = kiosk_client.post(
+            "/employees/check_in_out/upload",
+            files={"image": ("face.jpg", b"multipart-jpeg", "image/jpeg")},
+        )
+        assert response.status_code == 200
+        assert response.json()["recognized"] is True
+        assert received == [b"multipart-jpeg"]
+
+    def test_multipart_register_face(self, db_session, kiosk_client, received):
+        response = kiosk_client.post(
+            "/employees/register_face/upload",
+            data={"warehouse_id": "2", "first_name": "Ana", "last_name": "Ruiz"},
+            files={"image": ("face.jpg", b"register-jpeg", "image/jpeg")},
+        )
+        assert response.status_code == 200
+        assert response.json()["employee_name"] == "Ana Ruiz"
+        employee = db_session.get(Employee, response.json()["employee_id"])
+        assert employee.warehouse_id == 2
+        assert len(employee.encodings) == 1
+
+    def test_raw_body_register_face(self, db_session, kiosk_client, received):
+        response = kiosk_client.post(
+            "/employees/register_face/upload?warehouse_id=2&first_name=Eva&last_name=Paz",
+            content=b"\xff\xd8register-jpeg",
+            headers={"Content-Type": "image/jpeg"},
+        )
+        assert response.status_code == 200
+        assert response.json()["employee_name"] == "Eva Paz"
+        assert db_session.get(Employee, response.json()["employee_id"]).warehouse_id == 2
+        assert received == [b"\xff\xd8register-jpeg"]
+
+    def test_register_face_requires_employee_fields(self, kiosk_client, received):
+        response = kiosk_client.post(
+            "/employees/register_face/upload?warehouse_id=2",
+            content=b"\xff\xd8register-jpeg",
+            headers={"Content-Type": "image/jpeg"},
+        )
+        assert response.status_code == 422
+        assert received == []
+
+    def test_unsupported_content_type(self, kiosk_client, received):
+        response = kiosk_client.post(
+            "/employees/check_in_out/upload",
+            content=b"{}",
+            headers={"Content-Type": "application/json"},
+        )
+        assert response.status_code == 415
+
+    def test_oversized_body(self, kiosk_client, received, monkeypatch):
+        monkeypatch.setattr(employees_controller, "FACE_MAX_UPLOAD_BYTES", 8)
+        response = kiosk_client.post(
+            "/employees/check_in_out/upload",
+            content=b"0123456789",
+            headers={"Content-Type": "image/jpeg"},
+        )
+        assert response.status_code == 413
+        assert received == []
+
+
+class TestFaceBudgets:
+    """Per-device and per-warehouse token buckets on the recognition endpoints"""
+
+    @pytest.fixture
+    def tight_budgets(self, monkeypatch):
+        monkeypatch.setattr(face_budgets, "budgets", {"device": (0.01, 2), "warehouse": (0.01, 3)})
+
+    def check(self, client, device, warehouse_id=1):
+        return client.post(
+            f"/employees/check_in_out/upload?warehouse_id={warehouse_id}",
+            content=b"\xff\xd8raw-jpeg",
+            headers={"Content-Type": "image/jpeg", "X-Device-Id": device},
+        )
+
+    def test_device_over_budget_gets_429(self, kiosk_client, tight_budgets, monkeypatch):
+        monkeypatch.setattr(face_pipeline_module, "compute_image_encodings", lambda data: [np.empty((0, 128))])
+        rejected = BUDGET_REJECTED.value(budget="device")
+
+        assert [self.check(kiosk_client, "kiosk-1").status_code for _ in range(2)] == [422, 422]
+        response = self.check(kiosk_client, "kiosk-1")
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) == 100
+        assert BUDGET_REJECTED.value(budget="device") == rejected + 1
+
+        # Another kiosk of the same warehouse still has its own budget
+        assert self.check(kiosk_client, "kiosk-2").status_code == 422
+
+    def test_warehouse_budget_is_shared_by_devices(self, kiosk_client, tight_budgets, monkeypatch):
+        monkeypatch.setattr(face_pipeline_module, "compute_image_encodings", lambda data: [np.empty((0, 128))])
+
+        statuses = [self.check(kiosk_client, f"kiosk-{i}").status_code for i in range(4)]
+        assert statuses == [422, 422, 422, 429]
+        assert self.check(kiosk_client, "kiosk-9", warehouse_id=2).status_code == 422
+
+    def test_warehouse_rejection_does_not_spend_device_budget(self, kiosk_client, tight_budgets, monkeypatch):
+        monkeypatch.setattr(face_pipeline_module, "compute_image_encodings", lambda data: [np.empty((0, 128))])
+        rejected = BUDGET_REJECTED.value(budget="warehouse")
+
+        assert [self.check(kiosk_client, device).status_code for device in ("kiosk-1", "kiosk-2", "kiosk-2")] == [422] * 3
+        assert self.check(kiosk_client, "kiosk-1").status_code == 429
+        assert BUDGET_REJECTED.value(budget="warehouse") == rejected + 1
+        # kiosk-1 still has the token the rejected request did not use
+        assert self.check(kiosk_client, "kiosk-1", warehouse_id=2).status_code == 422
+        assert self.check(kiosk_client, "kiosk-1", warehouse_id=2).status_code == 429
+
+    def test_batch_costs_one_token_per_frame(self, kiosk_client, tight_budgets, monkeypatch):
+        monkeypatch.setattr(face_pipeline_module, "compute_image_encodings", lambda images: [np.empty((0, 128))] * len(images))
+
+        response = kiosk_client.post(
+            "/employees/check_in_out/batch",
+            json={"images_base64": ["YQ==", "Yg=="], "warehouse_id": 1},
+            headers={"X-Device-Id": "kiosk-1"},
+        )
+        assert response.status_code == 422
+        assert self.check(kiosk_client, "kiosk-1").status_code == 429
@@ -0,0 +1,133 @@
+"""
+Incremental face gallery synchronization tests
+Session hooks on Employee/FaceEncoding and the cross-process change log
+"""
+
+import threading
+from datetime import datetime, timedelta
+
+import numpy as np
+import pytest
+
+import main
+from models import Employee, FaceEncoding, FaceGalleryChange
+from services import encoding_set_service
+from services import face_gallery as face_gallery_module
+from services.face_gallery import FaceGallery, face_gallery
+from services.face_recognition_service import serialize_encoding
+
+
+def vector(seed):
+    return np.random.default_rng(seed).normal(0, 0.1, 128).astype(np.float32)
+
+
+@pytest.fixture
+def loaded_gallery(db_session, setup_test_data):
+    """Global gallery loaded with one encoding per test employee"""
+    for employee_id in (1, 2, 3):
+        db_session.add(
+            FaceEncoding(employee_id=employee_id, encoding=serialize_encoding(vector(employee_id)))
+        )
+    db_session.commit()
+    face_gallery.load(db_session)
+    yield face_gallery
+    face_gallery.invalidate()
+
+
+class TestSessionHooks:
+    """In-process updates triggered by commits"""
+
+    def test_new_encoding_is_patched_in(self, db_session, loaded_gallery):
+        version = loaded_gallery.version(1)
+        db_session.add(FaceEncoding(employee_id=1, encoding=serialize_encoding(vector(10))))
+        db_session.commit()
+
+        assert 1 in loaded_gallery._stale
+        match = loaded_gallery.match(db_session, vector(10), warehouse_id=1)
+        assert match.distance < 1e-3
+        assert loaded_gallery.size(1) == 2
+        assert loaded_gallery.version(1) > version
+        # Other warehouses were not touched
+        assert loaded_gallery.size() == 4
+
+    def test_deactivated_employee_is_removed(self, db_session, loaded_gallery):
+        db_session.get(Employee, 2).is_active = False
+        db_session.commit()
+
+        match = loaded_gallery.match(db_session, vector(2))
+        assert match.employee_id != 2
+        assert loaded_gallery.size(2) == 0
+
+    def test_warehouse_move_is_applied(self, db_session, loaded_gallery):
+        db_session.get(Employee, 3).warehouse_id = 1
+        db_session.commit()
+
+        loaded_gallery.refresh(db_session)
+        assert loaded_gallery.size(3) == 0
+        assert loaded_gallery.match(db_session, vector(3), warehouse_id=1).employee_id == 3
+
+    def test_deleted_employee_is_removed(self, db_session, loaded_gallery):
+        db_session.delete(db_session.get(Employee, 1))
+        db_session.commit()
+
+        loaded_gallery.refresh(db_session)
+        assert loaded_gallery.size(1) == 0
+
+    def test_irrelevant_update_is_ignored(self, db_session, loaded_gallery):
+        db_session.get(Employee, 1).department = "Shipping"
+        db_session.commit()
+        assert loaded_gallery._stale == set()
+
+    def test_rollback_discards_pending_changes(self, db_session, loaded_gallery):
+        db_session.add(FaceEncoding(employee_id=1, encoding=serialize_encoding(vector(11))))
+        db_session.flush()
+        db_session.rollback()
+        assert loaded_gallery._stale == set()
+
+
+class TestCrossProcessSignal:
+    """Other workers see changes through face_gallery_changes"""
+
+    def test_change_log_row_is_written_with_the_change(self, db_session, loaded_gallery):
+        before = db_session.query(FaceGalleryChange).count()
+        db_session.add(FaceEncoding(employee_id=2, encoding=serialize_encoding(vector(12))))
+        db_session.commit()
+
+        rows = db_session.query(FaceGalleryChange).all()
+        assert len(rows) == before + 1
+        assert rows[-1].employee_id == 2
+
+    def test_other_process_polls_generation(self, db_session, loaded_gallery, monkeypatch):
+        monkeypatch.setattr(face_gallery_module, "GALLERY_POLL_INTERVAL", 0)
+        other = FaceGallery()
+        other.load(db_session)
+        generation = other.generation
+
+        db_session.add(FaceEncoding(employee_id=2, encoding=serialize_encoding(vector(13))))
+        db_session.commit()
+
+        match = other.match(db_session, vector(13))
+        assert other.generation > generation
+        assert match.employee_id == 2
+        assert match.distance < 1e-3
+
+
+class TestChangePruning:
+    """face_gallery_changes is pruned even with encoding compaction disabled"""
+
+    def test_startup_prunes_with_compaction_disabled(self, db_session, loaded_gallery, monkeypatch):
+        old = datetime.utcnow() - timedelta(hours=48)
+        db_session.add_all([FaceGalleryChange(employee_id=1, created_at=old) for _ in range(3)])
+        db_session.commit()
+        recent = db_session.query(FaceGalleryChange).filter(FaceGalleryChange.created_at > old).count()
+
+        pruned = threading.Event()
+        monkeypatch.setattr(db_session, "close", pruned.set)
+        monkeypatch.setattr(main, "SessionLocal", lambda: db_session)
+        monkeypatch.setattr(main, "start_rollup_worker", lambda session_factory: None)
+        monkeypatch.setattr(main, "start_housekeeping_worker", lambda session_factory: None)
+        assert encoding_set_service.COMPACTION_INTERVAL_SECONDS == 0
+
+        main.start_background_jobs()
+        assert pruned.wait(timeout=5)
+        assert db_session.query(FaceGalleryChange).count() == recent
@@ -0,0 +1,86 @@
+"""
+Approximate (IVF) face index tests
+"""
+
+import numpy as np
+
+from benchmarks.ann_recall import synthetic_gallery, synthetic_probes
+from services import face_index
+from services.face_gallery import FaceGallery, WarehouseGallery
+from services.face_index import IVFIndex
+
+
+def build_pair(employees=500, per_employee=4, nprobe=8):
+    centers, employee_ids, vectors = synthetic_gallery(employees, per_employee)
+    exact = WarehouseGallery(capacity=len(vectors))
+    exact.append(employee_ids, vectors)
+    index = IVFIndex(nlist=20, nprobe=nprobe)
+    index.build(employee_ids, vectors)
+    return centers, exact, index
+
+
+class TestIVFIndex:
+    """IVF search against brute force"""
+
+    def test_probing_every_list_is_exact(self):
+        centers, exact, index = build_pair(nprobe=20)
+        _, probes = synthetic_probes(centers, 50)
+        for probe in probes:
+            want = exact.nearest(probe)
+            got = index.search(probe)
+            assert got[0] == want[0]
+            assert abs(got[1] - want[1]) < 1e-4
+
+    def test_recall_with_few_lists_probed(self):
+        centers, exact, index = build_pair(nprobe=4)
+        _, probes = synthetic_probes(centers, 200)
+        hits = sum(index.search(p)[0] == exact.nearest(p)[0] for p in probes)
+        assert hits / len(probes) >= 0.9
+
+    def test_add_and_remove_employee(self):
+        centers, _, index = build_pair()
+        size = index.size
+
+        probe = np.full(128, 0.3, dtype=np.float32)
+        index.add(np.array([9999]), probe[None, :])
+        assert index.size == size + 1
+        assert index.search(probe)[0] == 9999
+
+        index.remove_employee(9999)
+        assert index.size == size
+        assert index.search(probe)[0] != 9999
+
+
+class TestGalleryMatchMode:
+    """FACE_MATCH_MODE switch in the gallery"""
+
+    def test_ivf_mode_builds_index_for_global_search(self, db_session, monkeypatch):
+        monkeypatch.setattr(face_index, "FACE_MATCH_MODE", "ivf")
+        monkeypatch.setattr(face_index, "FACE_ANN_MIN_GALLERY", 0)
+        centers, employee_ids, vectors = synthetic_gallery(300, 3)
+
+        gallery = FaceGallery()
+        gallery.load(db_session)
+        for employee_id, vector in zip(employee_ids, vectors):
+            gallery.add_encoding(int(employee_id) % 3 + 1, int(employee_id), "", vector)
+
+        match = gallery.match(db_session, vectors[10])
+        assert gallery._index is not None
+        assert match.employee_id == employee_ids[10]
+        assert match.distance < 1e-3
+
+        gallery.remove_employee(int(employee_ids[10]))
+        assert gallery.match(db_session, vectors[10]).employee_id != employee_ids[10]
+
+    def test_exact_mode_never_builds_index(self, db_session, monkeypatch):
+        monkeypatch.setattr(face_index, "FACE_MATCH_MODE", "exact")
+        monkeypatch.setattr(face_index, "FACE_ANN_MIN_GALLERY", 0)
+        _, employee_ids, vectors = synthetic_gallery(50, 2)
+
+        gallery = FaceGallery()
+        gallery.load(db_session)
+        for employee_id, vector in zip(employee_ids, vectors):
+            gallery.add_encoding(1, int(employee_id), "", vector)
+
+        assert gallery.match(db_session, vectors[0]).employee_id == employee_ids[0]
+        assert gallery._index is None
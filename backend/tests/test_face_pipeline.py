@@ -0,0 +1,59 @@
+"""
+Face pipeline process pool tests
+Back-pressure and offloading with picklable stand-in work functions
+"""
+
+import asyncio
+import operator
+import time
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from services import face_pipeline as face_pipeline_module
+from services.face_pipeline import FacePipeline
+
+
+class TestFacePipeline:
+    """Execution and queue limit of FacePipeline.run"""
+
+    def test_inline_mode_runs_in_threadpool(self):
+        pipeline = FacePipeline(workers=0)
+        assert asyncio.run(pipeline.run(operator.add, 2, 3)) == 5
+        assert pipeline.pending == 0
+
+    def test_process_pool_runs_work(self):
+        pipeline = FacePipeline(workers=1)
+        try:
+            assert asyncio.run(pipeline.run(operator.mul, 6, 7)) == 42
+        finally:
+            pipeline.shutdown()
+
+    def test_queue_limit_returns_503(self):
+        pipeline = FacePipeline(workers=0, queue_limit=1)
+
+        async def scenario():
+            slow = asyncio.ensure_future(pipeline.run(time.sleep, 0.2))
+            await asyncio.sleep(0.05)
+            with pytest.raises(HTTPException) as error:
+                await pipeline.run(operator.add, 1, 1)
+            await slow
+            return error.value
+
+        error = asyncio.run(scenario())
+        assert error.status_code == 503
+        assert error.headers["Retry-After"] == "1"
+        assert pipeline.pending == 0
+        assert asyncio.run(pipeline.run(operator.add, 1, 1)) == 2
+
+    def test_encode_face_without_faces_is_422(self, monkeypatch):
+        monkeypatch.setattr(
+            face_pipeline_module,
+            "compute_image_encodings",
+            lambda images: [np.empty((0, 128), dtype=np.float32)],
+        )
+        pipeline = FacePipeline(workers=0)
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(pipeline.encode_face(b"image"))
+        assert error.value.status_code == 422
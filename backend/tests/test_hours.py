@@ -0,0 +1,148 @@
+"""
+Worked-hours engine tests
+In/out pairing, local days per warehouse timezone and /reports/hours
+"""
+
+import calendar
+from datetime import date, datetime, timedelta
+
+import numpy as np
+import pytest
+
+from models import AccessLog
+from services import hours_service
+from services.hours_service import pair_punches, summarize, utc_offsets
+
+HOUR = 3600
+
+
+def arrays(*punches):
+    """(employee_id, "in"/"out", hour) tuples -> sorted engine arrays"""
+    employee_ids = np.array([p[0] for p in punches], dtype=np.int64)
+    is_in = np.array([p[1] == "in" for p in punches])
+    timestamps = np.array([int(p[2] * HOUR) for p in punches], dtype=np.int64)
+    return employee_ids, is_in, timestamps
+
+
+class TestPairing:
+    """pair_punches on sorted arrays"""
+
+    def test_pairs_and_missing_punches(self):
+        employee_ids, is_in, timestamps = arrays(
+            (1, "in", 8), (1, "out", 16),
+            (1, "in", 20),                 # never clocked out
+            (1, "in", 32), (1, "out", 40),
+            (2, "out", 9),                 # never clocked in
+            (2, "in", 10), (2, "out", 30),  # longer than the maximum shift
+        )
+        shifts = pair_punches(employee_ids, is_in, timestamps, 16 * HOUR)
+        assert shifts.starts.tolist() == [0, 3]
+        assert shifts.ends.tolist() == [1, 4]
+        assert shifts.missing.tolist() == [2, 5, 6, 7]
+
+    def test_does_not_pair_across_employees(self):
+        shifts = pair_punches(*arrays((1, "in", 8), (2, "out", 9)), 16 * HOUR)
+        assert shifts.starts.size == 0 and shifts.missing.tolist() == [0, 1]
+
+
+class TestSummaries:
+    """Daily and weekly totals"""
+
+    def test_overnight_shift_counts_on_start_day(self):
+        # Monday 2026-03-02 22:00 UTC to Tuesday 06:30 UTC
+        monday = (date(2026, 3, 2) - date(1970, 1, 1)).days * 24
+        employee_ids, is_in, timestamps = arrays((1, "in", monday + 22), (1, "out", monday + 30.5))
+        rows = summarize(employee_ids, is_in, timestamps, np.zeros(2, np.int64), date(2026, 3, 1), date(2026, 3, 31))
+        assert [(r.period_start, r.hours, r.shifts) for r in rows] == [(date(2026, 3, 2), 8.5, 1)]
+
+    def test_weekly_totals_start_on_monday(self):
+        sunday = (date(2026, 3, 1) - date(1970, 1, 1)).days * 24
+        punches = [(1, "in", sunday + 9), (1, "out", sunday + 13)]
+        for day in range(1, 4):  # Monday to Wednesday
+            punches += [(1, "in", sunday + 24 * day + 9), (1, "out", sunday + 24 * day + 17)]
+        punches.append((1, "in", sunday + 24 * 4 + 9))
+        employee_ids, is_in, timestamps = arrays(*punches)
+        rows = summarize(
+            employee_ids, is_in, timestamps, np.zeros(len(punches), np.int64),
+            date(2026, 3, 1), date(2026, 3, 31), period="week",
+        )
+        assert [(r.period_start, r.hours, r.shifts, r.missing_punches) for r in rows] == [
+            (date(2026, 2, 23), 4.0, 1, 0),
+            (date(2026, 3, 2), 24.0, 3, 1),
+        ]
+
+    def test_offsets_follow_daylight_saving(self):
+        before = calendar.timegm(datetime(2026, 3, 8, 6, 0).timetuple())
+        timestamps = np.array([before, before + 2 * HOUR], dtype=np.int64)  # 01:00 EST, 04:00 EDT
+        offsets = utc_offsets(timestamps, np.zeros(2, np.int64), ["America/New_York"])
+        assert (offsets // HOUR).tolist() == [-5, -4]
+
+    def test_invalid_timezone_falls_back_to_utc(self):
+        offsets = utc_offsets(np.array([0, 100000]), np.zeros(2, np.int64), ["Not/AZone"])
+        assert offsets.tolist() == [0, 0]
+
+
+@pytest.fixture
+def night_shift(db_session, setup_test_data):
+    """Employee 1 (warehouse in New York) works 21:00-05:00 local on March 10th"""
+    db_session.add_all([
+        AccessLog(employee_id=1, event_type="in", timestamp=datetime(2026, 3, 11, 1, 0)),
+        AccessLog(employee_id=1, event_type="out", timestamp=datetime(2026, 3, 11, 9, 0)),
+        AccessLog(employee_id=3, event_type="in", timestamp=datetime(2026, 3, 11, 14, 0)),
+    ])
+    db_session.flush()
+
+
+class TestWorkedHours:
+    """worked_hours and GET /reports/hours"""
+
+    def test_local_day_uses_warehouse_timezone(self, db_session, night_shift):
+        rows = hours_service.worked_hours(db_session, date(2026, 3, 1), date(2026, 3, 31))
+        assert [(r.employee_id, r.period_start, r.hours, r.shifts, r.missing_punches) for r in rows] == [
+            (1, date(2026, 3, 10), 8.0, 1, 0),
+            (3, date(2026, 3, 11), 0.0, 0, 1),
+        ]
+
+    def test_range_is_in_local_days(self, db_session, night_shift):
+        assert hours_service.worked_hours(db_session, date(2026, 3, 11), date(2026, 3, 11), employee_id=1) == []
+
+    def test_hours_endpoint(self, admin_client, night_shift):
+        response = admin_client.get(
+            "/reports/hours",
+            params={"start_date": "2026-03-01", "end_date": "2026-03-31", "warehouse_id": 1, "period": "week"},
+        )
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "employee_id": 1,
+                "employee_name": "John Doe",
+                "period_start": "2026-03-09",
+                "hours": 8.0,
+                "shifts": 1,
+                "missing_punches": 0,
+            }
+        ]
+
+    def test_punch_range_pads_by_the_shared_margin(self):
+        start, end = hours_service.punch_range(date(2026, 3, 10), date(2026, 3, 11))
+        assert start == datetime(2026, 3, 10) - hours_service.HOURS_RANGE_MARGIN
+        assert end == datetime(2026, 3, 12) + hours_service.HOURS_RANGE_MARGIN
+        assert hours_service.HOURS_RANGE_MARGIN == timedelta(days=1, hours=hours_service.HOURS_MAX_SHIFT_HOURS)
+
+    def test_hours_cache_covers_the_punches_read(self, admin_client, night_shift, monkeypatch):
+        from services.report_cache import report_cache
+
+        ranges = []
+
+        def cached(namespace, params, start, end, compute):
+            ranges.append((start, end))
+            return compute()
+
+        monkeypatch.setattr(report_cache, "cached", cached)
+        response = admin_client.get("/reports/hours", params={"start_date": "2026-03-10", "end_date": "2026-03-11"})
+        assert response.status_code == 200
+        assert ranges == [hours_service.punch_range(date(2026, 3, 10), date(2026, 3, 11))]
+
+    def test_hours_endpoint_rejects_inverted_range(self, admin_client):
+        response = admin_client.get("/reports/hours", params={"start_date": "2026-03-02", "end_date": "2026-03-01"})
+        assert response.status_code == 400
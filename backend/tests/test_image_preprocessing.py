@@ -0,0 +1,73 @@
+"""
+Image preprocessing tests
+Reduced-size decoding and detection box mapping before face encoding
+"""
+
+import io
+
+import numpy as np
+from PIL import Image
+
+from services import face_recognition_service
+from services.face_recognition_service import decode_image, face_encodings_from_image
+
+
+def jpeg_bytes(width, height):
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (120, 90, 60)).save(buffer, format="JPEG", quality=80)
+    return buffer.getvalue()
+
+
+class TestDecodeImage:
+    """decode_image size limits"""
+
+    def test_large_jpeg_is_reduced(self):
+        img = decode_image(jpeg_bytes(4000, 3000), max_dim=1000)
+        assert img.mode == "RGB"
+        assert img.size == (1000, 750)
+
+    def test_small_image_is_untouched(self):
+        img = decode_image(jpeg_bytes(320, 240), max_dim=1000)
+        assert img.size == (320, 240)
+
+    def test_zero_disables_the_limit(self):
+        assert decode_image(jpeg_bytes(1200, 900), max_dim=0).size == (1200, 900)
+
+
+class TestDetectionScaling:
+    """Boxes found on the downscaled copy are mapped back for encoding"""
+
+    def test_boxes_are_rescaled(self, monkeypatch):
+        seen = {}
+
+        def face_locations(image, model):
+            seen["detect_shape"] = image.shape
+            return [(10, 60, 70, 20)]
+
+        def face_encodings(image, boxes):
+            seen["encode_shape"] = image.shape
+            seen["boxes"] = boxes
+            return [np.zeros(128)]
+
+        monkeypatch.setattr(face_recognition_service, "FACE_DETECT_MAX_DIM", 200)
+        monkeypatch.setattr(
+            face_recognition_service.face_recognition, "face_locations", face_locations
+        )
+        monkeypatch.setattr(
+            face_recognition_service.face_recognition, "face_encodings", face_encodings
+        )
+
+        encodings = face_encodings_from_image(Image.new("RGB", (800, 600)))
+        assert encodings.shape == (1, 128)
+        assert seen["detect_shape"] == (150, 200, 3)
+        assert seen["encode_shape"] == (600, 800, 3)
+        assert seen["boxes"] == [(40, 240, 280, 80)]
+
+    def test_no_faces_gives_empty_matrix(self, monkeypatch):
+        monkeypatch.setattr(
+            face_recognition_service.face_recognition,
+            "face_locations",
+            lambda image, model: [],
+        )
+        encodings = face_encodings_from_image(Image.new("RGB", (100, 100)))
+        assert encodings.shape == (0, 128)
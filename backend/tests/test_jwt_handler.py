@@ -0,0 +1,118 @@
+"""
+JWT handler tests
+Backend interoperability, claim validation and the verified-token cache
+"""
+
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from utils import jwt_handler
+from utils.jwt_handler import DecodedTokenCache, InvalidTokenError, JoseBackend, StdlibBackend
+
+BACKENDS = ["jose", "stdlib", "pyjwt"]
+
+
+def make_backend(name):
+    if name == "pyjwt":
+        pytest.importorskip("jwt")
+    return jwt_handler.BACKENDS[name]()
+
+
+def in_minutes(minutes):
+    return datetime.utcnow() + timedelta(minutes=minutes)
+
+
+class CountingBackend:
+    """Wraps a backend and counts signature verifications"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.decodes = 0
+
+    def encode(self, claims):
+        return self.backend.encode(claims)
+
+    def decode(self, token):
+        self.decodes += 1
+        return self.backend.decode(token)
+
+
+@pytest.fixture
+def counting(monkeypatch):
+    backend = CountingBackend(jwt_handler.backend)
+    monkeypatch.setattr(jwt_handler, "backend", backend)
+    monkeypatch.setattr(jwt_handler, "token_cache", DecodedTokenCache(max_size=4))
+    return backend
+
+
+class TestBackends:
+    """Every backend accepts the others' tokens and rejects bad ones"""
+
+    @pytest.mark.parametrize("signer", BACKENDS)
+    @pytest.mark.parametrize("verifier", BACKENDS)
+    def test_interoperable(self, signer, verifier):
+        token = make_backend(signer).encode({"sub": "kiosk", "user_id": 7, "exp": in_minutes(5)})
+        claims = make_backend(verifier).decode(token)
+        assert claims["sub"] == "kiosk" and claims["user_id"] == 7
+
+    @pytest.mark.parametrize("name", BACKENDS)
+    def test_rejects_tampered_and_expired(self, name):
+        backend = make_backend(name)
+        token = backend.encode({"sub": "kiosk", "exp": in_minutes(5)})
+        with pytest.raises(InvalidTokenError):
+            backend.decode(token[:-2] + ("AA" if token[-2:] != "AA" else "BB"))
+        with pytest.raises(InvalidTokenError):
+            backend.decode(backend.encode({"sub": "kiosk", "exp": in_minutes(-1)}))
+        with pytest.raises(InvalidTokenError):
+            backend.decode("not-a-token")
+
+    def test_other_secret_is_rejected(self):
+        token = StdlibBackend(secret="other").encode({"sub": "kiosk", "exp": in_minutes(5)})
+        with pytest.raises(InvalidTokenError):
+            JoseBackend().decode(token)
+
+    def test_unknown_backend_falls_back_to_jose(self):
+        assert isinstance(jwt_handler.create_backend("nope"), JoseBackend)
+
+
+class TestDecodedTokenCache:
+    """Verified claims are reused until the token expires"""
+
+    def test_repeated_decodes_verify_once(self, counting):
+        token = jwt_handler.create_access_token({"sub": "kiosk", "user_id": 1})
+        for _ in range(5):
+            assert jwt_handler.decode_token(token)["user_id"] == 1
+        assert counting.decodes == 1
+
+    def test_callers_get_a_copy(self, counting):
+        token = jwt_handler.create_access_token({"sub": "kiosk", "user_id": 1})
+        jwt_handler.decode_token(token)["user_id"] = 99
+        assert jwt_handler.decode_token(token)["user_id"] == 1
+
+    def test_invalid_tokens_are_not_cached(self, counting):
+        assert jwt_handler.decode_token("not-a-token") is None
+        assert jwt_handler.decode_token("not-a-token") is None
+        assert counting.decodes == 2
+        assert len(jwt_handler.token_cache) == 0
+
+    def test_entries_expire_with_the_token(self):
+        cache = DecodedTokenCache()
+        cache.set("token", {"sub": "kiosk", "exp": 1000})
+        assert cache.get("token", 999.0) == {"sub": "kiosk", "exp": 1000}
+        assert cache.get("token", 1000.0) is None
+        assert len(cache) == 0
+
+    def test_tokens_without_exp_are_not_cached(self):
+        cache = DecodedTokenCache()
+        cache.set("token", {"sub": "kiosk"})
+        assert len(cache) == 0
+
+    def test_size_is_bounded(self):
+        cache = DecodedTokenCache(max_size=2)
+        exp = time.time() + 60
+        for token in ("a", "b", "c"):
+            cache.set(token, {"exp": exp})
+        assert len(cache) == 2
+        assert cache.get("a", time.time()) is None
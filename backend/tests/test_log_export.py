@@ -0,0 +1,73 @@
+"""
+Access log export tests
+Streaming CSV/NDJSON export of /logs/access/export
+"""
+
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import AccessLog
+from services import log_service
+
+
+@pytest.fixture
+def month_of_logs(db_session, setup_test_data):
+    base = datetime(2026, 2, 1, 8, 0)
+    logs = [
+        AccessLog(employee_id=i % 3 + 1, event_type="in" if i % 2 == 0 else "out",
+                  access_method="face_recognition", timestamp=base + timedelta(hours=i * 7))
+        for i in range(30)
+    ]
+    db_session.add_all(logs)
+    db_session.flush()
+    return logs
+
+
+class TestExportBatches:
+    """Server-side cursor batching"""
+
+    def test_batches_are_bounded_and_chronological(self, db_session, month_of_logs):
+        batches = list(log_service.iter_access_log_batches(db_session, batch_size=8))
+        assert [len(rows) for rows in batches] == [8, 8, 8, 6]
+        ids = [row[0] for rows in batches for row in rows]
+        assert ids == [log.id for log in sorted(month_of_logs, key=lambda log: log.timestamp)]
+
+    def test_csv_yields_one_chunk_per_batch(self, db_session, month_of_logs):
+        batches = log_service.iter_access_log_batches(db_session, employee_id=1, batch_size=4)
+        chunks = list(log_service.access_logs_csv(batches))
+        assert len(chunks) == 1 + 3  # header + 10 rows in batches of 4
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        assert rows[0] == list(log_service.EXPORT_COLUMNS)
+        assert len(rows) == 11 and {row[1] for row in rows[1:]} == {"1"}
+
+
+class TestExportEndpoint:
+    """GET /logs/access/export"""
+
+    def test_csv_export(self, admin_client, month_of_logs):
+        response = admin_client.get(
+            "/logs/access/export",
+            params={"start_date": "2026-02-01T00:00:00", "end_date": "2026-02-03T23:59:59"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/csv")
+        assert 'filename="access_logs.csv"' in response.headers["content-disposition"]
+        rows = list(csv.DictReader(io.StringIO(response.text)))
+        assert len(rows) == 10  # every 7 hours from Feb 1 08:00
+        assert rows[0]["event_type"] == "in"
+        assert rows[0]["timestamp"] == "2026-02-01T08:00:00"
+
+    def test_ndjson_export_filters_by_warehouse(self, admin_client, month_of_logs, db_session):
+        response = admin_client.get("/logs/access/export", params={"format": "ndjson", "warehouse_id": 1})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert records and {record["warehouse_id"] for record in records} == {1}
+
+    def test_unknown_format_is_rejected(self, admin_client):
+        response = admin_client.get("/logs/access/export", params={"format": "xlsx"})
+        assert response.status_code == 422
@@ -0,0 +1,108 @@
+"""
+Log pagination tests
+Keyset (cursor) pagination for /logs/access and /logs/user-login
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import AccessLog, UserLoginLog
+from services import log_service
+
+
+@pytest.fixture
+def access_logs(db_session, setup_test_data):
+    base = datetime(2026, 1, 1, 8, 0)
+    logs = []
+    for i in range(25):
+        # Pares con el mismo timestamp para probar el desempate por id
+        logs.append(AccessLog(employee_id=i % 3 + 1, event_type="in", timestamp=base + timedelta(minutes=i // 2)))
+    db_session.add_all(logs)
+    db_session.flush()
+    return sorted(logs, key=lambda log: (log.timestamp, log.id), reverse=True)
+
+
+def walk(fetch, limit):
+    pages, cursor = [], None
+    while True:
+        page = fetch(cursor)
+        pages.append(page)
+        cursor = log_service.next_cursor(page, limit)
+        if cursor is None:
+            return pages
+        cursor = log_service.decode_cursor(cursor)
+
+
+class TestCursor:
+    """Opaque cursor encoding"""
+
+    def test_round_trip(self):
+        timestamp = datetime(2026, 3, 4, 5, 6, 7, 890)
+        cursor = log_service.encode_cursor(timestamp, 42)
+        assert "=" not in cursor
+        assert log_service.decode_cursor(cursor) == (timestamp, 42)
+
+    @pytest.mark.parametrize("cursor", ["", "not-base64!", "WzFd", "eyJhIjoxfQ"])
+    def test_invalid_cursor(self, cursor):
+        with pytest.raises(ValueError):
+            log_service.decode_cursor(cursor)
+
+
+class TestKeysetPagination:
+    """Service-level paging"""
+
+    def test_pages_cover_every_log_once(self, db_session, access_logs):
+        pages = walk(lambda cursor: log_service.get_access_logs(db_session, limit=7, cursor=cursor), 7)
+        assert [len(page) for page in pages] == [7, 7, 7, 4]
+        assert [log.id for page in pages for log in page] == [log.id for log in access_logs]
+
+    def test_cursor_matches_offset(self, db_session, access_logs):
+        offset_page = log_service.get_access_logs(db_session, skip=10, limit=5)
+        previous = log_service.get_access_logs(db_session, limit=10)
+        cursor = log_service.decode_cursor(log_service.next_cursor(previous, 10))
+        assert log_service.get_access_logs(db_session, limit=5, cursor=cursor) == offset_page
+
+    def test_filters_apply_with_cursor(self, db_session, access_logs):
+        pages = walk(
+            lambda cursor: log_service.get_access_logs(db_session, employee_id=2, limit=3, cursor=cursor), 3
+        )
+        ids = [log.id for page in pages for log in page]
+        assert ids == [log.id for log in access_logs if log.employee_id == 2]
+
+    def test_user_login_logs(self, db_session, setup_test_data):
+        base = datetime(2026, 1, 1)
+        db_session.add_all(
+            UserLoginLog(user_id=1, login_type="login", status="success", timestamp=base + timedelta(hours=i))
+            for i in range(5)
+        )
+        db_session.flush()
+        pages = walk(lambda cursor: log_service.get_user_login_logs(db_session, user_id=1, limit=2, cursor=cursor), 2)
+        timestamps = [log.timestamp for page in pages for log in page]
+        assert timestamps == sorted(timestamps, reverse=True) and len(timestamps) == 5
+
+
+class TestLogEndpoints:
+    """GET /logs/access and /logs/user-login"""
+
+    def test_access_logs_follow_next_cursor_header(self, admin_client, access_logs):
+        seen, params = [], {"limit": 10}
+        while True:
+            response = admin_client.get("/logs/access", params=params)
+            assert response.status_code == 200
+            seen += [log["id"] for log in response.json()]
+            cursor = response.headers.get("X-Next-Cursor")
+            if cursor is None:
+                break
+            params = {"limit": 10, "cursor": cursor}
+        assert seen == [log.id for log in access_logs]
+        assert set(response.json()[0]) >= {"event_type", "timestamp"}
+
+    def test_legacy_offset_still_works(self, admin_client, access_logs):
+        response = admin_client.get("/logs/access", params={"skip": 20, "limit": 10})
+        assert [log["id"] for log in response.json()] == [log.id for log in access_logs[20:]]
+        assert "X-Next-Cursor" not in response.headers
+
+    def test_invalid_cursor_is_rejected(self, admin_client):
+        response = admin_client.get("/logs/user-login", params={"cursor": "garbage"})
+        assert response.status_code == 400
@@ -0,0 +1,91 @@
+"""
+Metrics instrumentation tests
+Histograms, span capture, Prometheus exposition and Server-Timing
+"""
+
+from utils import metrics
+from utils.metrics import Histogram, MetricsRegistry
+
+
+class TestHistogram:
+    """Prometheus text rendering"""
+
+    def test_buckets_are_cumulative(self):
+        histogram = Histogram("stage_seconds", "Stage time", ["stage"], buckets=(0.1, 1.0))
+        histogram.observe(0.05, stage="a")
+        histogram.observe(0.5, stage="a")
+        histogram.observe(5.0, stage="a")
+
+        lines = histogram.render()
+        assert 'stage_seconds_bucket{stage="a",le="0.1"} 1' in lines
+        assert 'stage_seconds_bucket{stage="a",le="1.0"} 2' in lines
+        assert 'stage_seconds_bucket{stage="a",le="+Inf"} 3' in lines
+        assert 'stage_seconds_count{stage="a"} 3' in lines
+        assert 'stage_seconds_sum{stage="a"} 5.55' in lines
+
+    def test_registry_renders_help_and_type(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("jobs_total", "Jobs", ["reason"])
+        counter.inc(reason="busy")
+        registry.gauge("queue_depth", "Queue", lambda: 3)
+
+        text = registry.render()
+        assert "# TYPE jobs_total counter" in text
+        assert 'jobs_total{reason="busy"} 1.0' in text
+        assert "queue_depth 3.0" in text
+        # Registering twice returns the existing metric
+        assert registry.counter("jobs_total", "Jobs", ["reason"]) is counter
+
+
+class TestSpans:
+    """Span recording per request and across processes"""
+
+    def test_spans_are_recorded_for_the_request(self):
+        before = metrics.STAGE_SECONDS.count(stage="unit_stage")
+        token, spans = metrics.start_request()
+        try:
+            with metrics.span("unit_stage"):
+                pass
+            with metrics.span("unit_stage"):
+                pass
+        finally:
+            metrics.end_request(token)
+
+        assert metrics.STAGE_SECONDS.count(stage="unit_stage") == before + 2
+        assert [stage for stage, _ in spans] == ["unit_stage", "unit_stage"]
+        assert metrics.server_timing_header(spans).startswith("unit_stage;dur=")
+
+    def test_captured_spans_are_not_recorded_twice(self):
+        before = metrics.STAGE_SECONDS.count(stage="worker_stage")
+        with metrics.capture_spans() as captured:
+            with metrics.span("worker_stage"):
+                pass
+        assert metrics.STAGE_SECONDS.count(stage="worker_stage") == before
+
+        metrics.record_spans(captured)
+        assert metrics.STAGE_SECONDS.count(stage="worker_stage") == before + 1
+
+
+class TestMetricsEndpoint:
+    """GET /metrics"""
+
+    def test_metrics_endpoint(self, test_client, metrics_client):
+        test_client.get("/health")
+        response = metrics_client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE face_stage_seconds histogram" in response.text
+        assert 'http_request_duration_seconds_count{method="GET",route="/health",status="200"}' in response.text
+
+    def test_disabled_without_token(self, test_client, monkeypatch):
+        import dependencies
+
+        monkeypatch.setattr(dependencies, "METRICS_TOKEN", "")
+        assert test_client.get("/metrics").status_code == 404
+        assert test_client.get("/metrics/pool").status_code == 404
+
+    def test_requires_the_metrics_token(self, test_client, metrics_client):
+        assert test_client.get("/metrics").status_code == 401
+        response = test_client.get("/metrics/pool", headers={"Authorization": "Bearer wrong"})
+        assert response.status_code == 401
+        assert response.headers["WWW-Authenticate"] == "Bearer"
@@ -0,0 +1,200 @@
+"""
+Password hashing executor tests
+Dedicated threads, parallel history verification, back-pressure and async login
+"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import TEST_PASSWORDS
+from utils import security
+from utils.password_history import PasswordHistoryService
+from utils.security import PasswordHasher, password_hasher
+
+
+class SlowContext:
+    """Stands in for the bcrypt context: records threads and concurrency"""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.delays = {}
+        self.threads = set()
+        self.running = 0
+        self.max_running = 0
+        self._lock = threading.Lock()
+
+    def verify(self, plain, hashed):
+        with self._lock:
+            self.threads.add(threading.current_thread().name)
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(self.delays.get(hashed, self.delay))
+        with self._lock:
+            self.running -= 1
+        return plain == hashed
+
+    def hash(self, plain):
+        return self.verify(plain, plain) and plain
+
+
+@pytest.fixture
+def slow_context(monkeypatch):
+    context = SlowContext()
+    monkeypatch.setattr(security, "pwd_context", context)
+    return context
+
+
+class TestPasswordHasher:
+    """Bounded executor for bcrypt"""
+
+    def test_roundtrip_uses_dedicated_threads(self):
+        hashed = security.get_password_hash("Secret123!")
+        assert security.verify_password("Secret123!", hashed)
+        assert not security.verify_password("Wrong123!", hashed)
+        assert password_hasher.pending == 0
+
+    def test_work_runs_outside_the_caller_thread(self, slow_context):
+        security.verify_password("a", "a")
+        assert slow_context.threads
+        assert all(name.startswith("password-hash") for name in slow_context.threads)
+
+    def test_verify_any_checks_hashes_in_parallel(self, slow_context):
+        hasher = PasswordHasher(workers=4)
+        try:
+            assert not hasher.verify_any("new", ["h1", "h2", "h3", "h4"])
+            assert hasher.verify_any("h3", ["h1", "h2", "h3", "h4"])
+        finally:
+            hasher.shutdown()
+        assert slow_context.max_running == 4
+
+    def test_verify_any_with_empty_history(self):
+        assert not security.verify_any("new", [])
+
+    def test_queue_limit_returns_503(self, slow_context):
+        hasher = PasswordHasher(workers=1, queue_limit=1)
+        slow_context.delay = 0.3
+        worker = threading.Thread(target=hasher.run, args=(slow_context.verify, "a", "a"))
+        worker.start()
+        time.sleep(0.05)
+        rejected = security.REJECTED.value()
+        try:
+            with pytest.raises(HTTPException) as error:
+                hasher.run(slow_context.verify, "b", "b")
+        finally:
+            worker.join()
+            hasher.shutdown()
+        assert error.value.status_code == 503
+        assert error.value.headers["Retry-After"] == "1"
+        assert security.REJECTED.value() == rejected + 1
+        assert hasher.pending == 0
+
+    def test_cancelled_wait_keeps_running_job_pending(self, slow_context):
+        hasher = PasswordHasher(workers=1)
+        slow_context.delay = 0.3
+
+        async def abandon():
+            task = asyncio.ensure_future(hasher.run_async(slow_context.verify, "a", "a"))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        try:
+            asyncio.run(abandon())
+            # bcrypt sigue corriendo aunque el cliente se haya ido
+            assert hasher.pending == 1
+            time.sleep(0.4)
+            assert hasher.pending == 0
+        finally:
+            hasher.shutdown()
+
+    def test_verify_any_match_keeps_running_jobs_pending(self, slow_context):
+        hasher = PasswordHasher(workers=2)
+        slow_context.delays = {"h1": 0.01, "h2": 0.3}
+        try:
+            assert hasher.verify_any("h1", ["h1", "h2"])
+            assert hasher.pending == 1
+            time.sleep(0.4)
+            assert hasher.pending == 0
+        finally:
+            hasher.shutdown()
+
+    def test_verify_any_async(self, slow_context):
+        hasher = PasswordHasher(workers=4)
+
+        async def check():
+            return (
+                await hasher.verify_any_async("new", ["h1", "h2", "h3"]),
+                await hasher.verify_any_async("h2", ["h1", "h2", "h3"]),
+                await hasher.verify_any_async("new", []),
+            )
+
+        try:
+            assert asyncio.run(check()) == (False, True, False)
+            time.sleep(0.1)
+            assert hasher.pending == 0
+        finally:
+            hasher.shutdown()
+        assert slow_context.max_running == 3
+
+    def test_password_reuse_check_is_async(self, slow_context, monkeypatch):
+        service = PasswordHistoryService(db_session=None)
+        monkeypatch.setattr(service, "_recent_hashes", lambda user_id: ["old1", "old2"])
+
+        assert asyncio.run(service.check_password_reuse(1, "old2"))
+        assert not asyncio.run(service.check_password_reuse(1, "new"))
+
+    def test_async_wrappers(self):
+        async def roundtrip():
+            hashed = await security.hash_password_async("Secret123!")
+            return await security.verify_password_async("Secret123!", hashed)
+
+        assert asyncio.run(roundtrip())
+
+
+class TestLogin:
+    """Async login endpoint verifies on the password executor"""
+
+    def test_login_success_and_failure(self, admin_client):
+        response = admin_client.post(
+            "/auth/login", json={"username_or_email": "admin_test", "password": TEST_PASSWORDS["admin"]}
+        )
+        assert response.status_code == 200
+        assert response.json()["user"]["role"] == "admin"
+
+        response = admin_client.post(
+            "/auth/login", json={"username_or_email": "admin_test", "password": "Wrong2024!"}
+        )
+        assert response.status_code == 401
+
+
+class TestUserCreation:
+    """Async user creation hashes on the password executor"""
+
+    def test_create_user_hashes_password(self, admin_client, db_session):
+        from models import User
+
+        response = admin_client.post(
+            "/users/",
+            json={
+                "username": "hashed_user",
+                "email": "hashed_user@test.com",
+                "password": "Secret2024!",
+                "first_name": "Hashed",
+                "last_name": "User",
+                "warehouse_id": 1,
+            },
+        )
+        assert response.status_code == 201
+        user = db_session.query(User).filter(User.username == "hashed_user").one()
+        assert security.verify_password("Secret2024!", user.password)
+
+        response = admin_client.post(
+            "/users/",
+            json={"username": "hashed_user", "email": "other@test.com", "password": "Secret2024!"},
+        )
+        assert response.status_code == 400
@@ -0,0 +1,84 @@
+"""
+Employee presence state tests
+In/out decisions from employee_presence and its in-process cache
+"""
+
+import pytest
+from sqlalchemy import update
+
+from models import AccessLog, EmployeePresence
+from services import presence_service
+from services.face_recognition_service import decide_event
+from services.presence_service import PresenceCache, PresenceState, presence_cache
+
+
+@pytest.fixture(autouse=True)
+def clean_cache():
+    presence_cache.clear()
+    yield
+    presence_cache.clear()
+
+
+def record(db, employee_id=1, warehouse_id=1):
+    log = presence_service.record_event(db, employee_id, warehouse_id=warehouse_id)
+    db.commit()
+    return log
+
+
+class TestRecordEvent:
+    """AccessLog insert plus presence update in one transaction"""
+
+    def test_events_alternate(self, db_session, setup_test_data):
+        events = [record(db_session).event_type for _ in range(3)]
+        assert events == ["in", "out", "in"]
+
+        presence = db_session.get(EmployeePresence, 1)
+        last_log = db_session.query(AccessLog).order_by(AccessLog.id.desc()).first()
+        assert presence.last_event == "in"
+        assert presence.last_access_log_id == last_log.id
+        assert presence.warehouse_id == 1
+        assert db_session.query(AccessLog).filter_by(employee_id=1).count() == 3
+
+    def test_cache_is_filled_after_commit(self, db_session, setup_test_data):
+        log = presence_service.record_event(db_session, 2)
+        assert presence_cache.get(2) is None
+        db_session.commit()
+        assert presence_cache.get(2).last_access_log_id == log.id
+        assert decide_event(db_session, 2) == "out"
+
+    def test_rollback_does_not_touch_cache(self, db_session, setup_test_data):
+        record(db_session, 2)
+        presence_service.record_event(db_session, 2)
+        db_session.rollback()
+        assert presence_cache.get(2) is None
+
+    def test_stale_cache_falls_back_to_locked_row(self, db_session, setup_test_data):
+        first = record(db_session)
+        # Another kiosk records an "out" that this process never saw
+        other = AccessLog(employee_id=1, event_type="out", timestamp=first.timestamp)
+        db_session.add(other)
+        db_session.flush()
+        db_session.execute(
+            update(EmployeePresence)
+            .where(EmployeePresence.employee_id == 1)
+            .values(last_event="out", last_access_log_id=other.id)
+        )
+        db_session.commit()
+        assert presence_cache.get(1).last_event == "in"
+
+        assert record(db_session).event_type == "in"
+        assert presence_cache.get(1).last_event == "in"
+
+
+class TestPresenceCache:
+    """Bounded LRU behaviour"""
+
+    def test_least_recently_used_is_evicted(self):
+        cache = PresenceCache(max_size=2)
+        for employee_id in (1, 2):
+            cache.put(employee_id, PresenceState("in", employee_id, None))
+        cache.get(1)
+        cache.put(3, PresenceState("in", 3, None))
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+        assert len(cache) == 2
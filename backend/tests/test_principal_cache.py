@@ -0,0 +1,118 @@
+"""
+Authenticated user cache tests
+Single-query load on miss, no queries on hit, invalidation on commit and TTL
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from conftest import recorded_statements
+from dependencies import get_current_user, require_admin
+from models import Role, User
+from services import principal_cache as principal_cache_module
+from services.principal_cache import PrincipalCache, get_principal, principal_cache
+from utils import jwt_handler
+
+
+def token_for(user_id, username):
+    return jwt_handler.create_access_token({"sub": username, "user_id": user_id})
+
+
+class TestPrincipalLoading:
+    """Queries per request"""
+
+    def test_miss_loads_user_and_role_in_one_query(self, db_session, setup_test_data):
+        with recorded_statements(db_session, "SELECT") as statements:
+            user = get_principal(db_session, 1)
+            assert user.role.name == "admin"
+            assert user.warehouse.name == "Main Warehouse A"
+        assert len(statements) == 1
+
+    def test_hit_runs_no_queries(self, db_session, setup_test_data):
+        get_principal(db_session, 2)
+        db_session.expunge_all()
+
+        with recorded_statements(db_session, "SELECT") as statements:
+            user = get_principal(db_session, 2)
+            assert user.username == "manager_test"
+            assert user.role.name == "manager"
+        assert statements == []
+        assert user in db_session
+
+    def test_unknown_user_is_not_cached(self, db_session, setup_test_data):
+        assert get_principal(db_session, 999) is None
+        assert len(principal_cache) == 0
+
+    def test_get_current_user_and_role_check(self, db_session, setup_test_data):
+        token = token_for(1, "admin_test")
+        get_current_user(token, db_session)
+
+        with recorded_statements(db_session, "SELECT") as statements:
+            user = get_current_user(token, db_session)
+            assert require_admin(user) is user
+        assert statements == []
+
+
+class TestInvalidation:
+    """Changes committed through any session evict the cached copy"""
+
+    def test_deactivated_user_is_rejected(self, db_session, setup_test_data):
+        token = token_for(3, "employee_test")
+        get_current_user(token, db_session)
+
+        db_session.get(User, 3).is_active = False
+        db_session.commit()
+
+        with pytest.raises(HTTPException) as error:
+            get_current_user(token, db_session)
+        assert error.value.detail == "User account is disabled"
+
+    def test_role_change_clears_cache(self, db_session, setup_test_data):
+        get_principal(db_session, 2)
+        db_session.get(Role, 2).name = "supervisor"
+        db_session.commit()
+
+        assert len(principal_cache) == 0
+        assert get_principal(db_session, 2).role.name == "supervisor"
+
+    def test_rollback_keeps_cache(self, db_session, setup_test_data):
+        get_principal(db_session, 1)
+        db_session.get(User, 1).first_name = "Changed"
+        db_session.flush()
+        db_session.rollback()
+
+        assert principal_cache.get(1) is not None
+
+    def test_stale_miss_is_not_stored(self, db_session, setup_test_data):
+        cache = PrincipalCache(ttl=30)
+        generation = cache.generation
+        cache.invalidate([1])
+        cache.set(db_session.get(User, 1), generation)
+        assert cache.get(1) is None
+
+
+class TestPrincipalCache:
+    """LRU and TTL"""
+
+    def test_entries_expire(self, db_session, setup_test_data, monkeypatch):
+        cache = PrincipalCache(ttl=30)
+        cache.set(db_session.get(User, 1))
+        assert cache.get(1) is not None
+
+        now = principal_cache_module.time.monotonic()
+        monkeypatch.setattr(principal_cache_module.time, "monotonic", lambda: now + 31)
+        assert cache.get(1) is None
+
+    def test_least_recently_used_is_evicted(self, db_session, setup_test_data):
+        cache = PrincipalCache(ttl=30, max_size=2)
+        cache.set(db_session.get(User, 1))
+        cache.set(db_session.get(User, 2))
+        cache.get(1)
+        cache.set(db_session.get(User, 3))
+        assert cache.get(2) is None
+        assert cache.get(1) is not None
+
+    def test_zero_ttl_disables_cache(self, db_session, setup_test_data):
+        cache = PrincipalCache(ttl=0)
+        cache.set(db_session.get(User, 1))
+        assert len(cache) == 0
@@ -0,0 +1,137 @@
+"""
+Query plan tests for the access/login log hot queries
+Runs the real service queries and checks with EXPLAIN that they use the
+composite indexes. The MySQL variant runs only when TEST_MYSQL_URL is set.
+"""
+
+import os
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from conftest import recorded_statements
+from database import Base
+from models import AccessLog, Company, Employee, Role, User, UserLoginLog, Warehouse
+from services import log_service, rollup_service
+
+TEST_MYSQL_URL = os.getenv("TEST_MYSQL_URL")
+
+
+def explain(db, statement, parameters):
+    """Returns the plan of a statement as one string per step/table"""
+    cursor = db.connection().connection.cursor()
+    try:
+        if db.get_bind().dialect.name == "sqlite":
+            cursor.execute("EXPLAIN QUERY PLAN " + statement, parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        cursor.execute("EXPLAIN " + statement, parameters)
+        columns = [c[0] for c in cursor.description]
+        return [f"{row['table']} key={row['key']}" for row in (dict(zip(columns, r)) for r in cursor.fetchall())]
+    finally:
+        cursor.close()
+
+
+def plan_of(db, fn, *args, position=-1, **kwargs):
+    """Plan of the SELECT at `position` among those run by fn (last by default)"""
+    with recorded_statements(db, "SELECT") as statements:
+        fn(db, *args, **kwargs)
+    assert statements, "the service did not run a SELECT"
+    return " | ".join(explain(db, *statements[position]))
+
+
+def seed_logs(db):
+    db.add(Company(id=1, name="Plan Company"))
+    db.add(Warehouse(id=1, company_id=1, name="W1"))
+    db.add(Warehouse(id=2, company_id=1, name="W2"))
+    db.add(Role(id=1, name="plan_role", permissions={}))
+    db.add(User(id=1, username="plan_user", email="plan@test.com", password="x", warehouse_id=1, role_id=1))
+    now = datetime.utcnow()
+    for employee_id in range(1, 21):
+        db.add(Employee(id=employee_id, warehouse_id=employee_id % 2 + 1,
+                        first_name="E", last_name=str(employee_id), is_active=True))
+    db.flush()
+    for i in range(200):
+        timestamp = now - timedelta(minutes=i)
+        db.add(AccessLog(employee_id=i % 20 + 1, event_type="in" if i % 2 else "out", timestamp=timestamp))
+        db.add(UserLoginLog(user_id=1, login_type="login", status="success", timestamp=timestamp))
+    db.flush()
+    return now
+
+
+def check_hot_queries(db, now):
+    week_ago = now - timedelta(days=7)
+
+    plan = plan_of(db, log_service.get_access_logs, employee_id=3)
+    assert "ix_access_logs_employee_id_timestamp" in plan
+
+    plan = plan_of(db, log_service.get_access_logs, employee_id=3, start_date=week_ago, end_date=now)
+    assert "ix_access_logs_employee_id_timestamp" in plan
+
+    plan = plan_of(db, log_service.get_access_logs)
+    assert "ix_access_logs_timestamp" in plan
+
+    plan = plan_of(db, log_service.get_access_logs, start_date=week_ago)
+    assert "ix_access_logs_timestamp" in plan
+
+    plan = plan_of(db, log_service.get_access_logs, warehouse_id=1)
+    assert "ix_employees_warehouse_id_is_active" in plan
+    assert "ix_access_logs_employee_id_timestamp" in plan
+
+    plan = plan_of(db, log_service.get_user_login_logs, user_id=1)
+    assert "ix_user_login_logs_user_id_timestamp" in plan
+
+    plan = plan_of(db, log_service.get_user_login_logs, start_date=week_ago)
+    assert "ix_user_login_logs_timestamp" in plan
+
+    # Reports: raw part of the range and the daily rollups
+    spans = [(week_ago, now, True)]
+    plan = plan_of(db, rollup_service.log_totals, spans, warehouse_id=1, position=0)
+    assert "ix_access_logs_timestamp" in plan or "ix_access_logs_employee_id_timestamp" in plan
+
+    plan = plan_of(db, rollup_service.log_totals, spans, employee_id=3, position=0)
+    assert "ix_access_logs_employee_id_timestamp" in plan
+
+    rollup_service.refresh_rollups(db, today=now.date() + timedelta(days=1))
+    days = [(week_ago.date(), now.date() + timedelta(days=1))]
+    plan = plan_of(db, rollup_service.rollup_totals, days, warehouse_id=1, position=0)
+    assert "ix_employee_daily_stats_warehouse_id_day" in plan
+
+    plan = plan_of(db, rollup_service.rollup_totals, days, employee_id=3, position=0)
+    assert "ix_employee_daily_stats_employee_id_day" in plan
+
+
+class TestSQLitePlans:
+    """EXPLAIN QUERY PLAN on the test database"""
+
+    def test_hot_queries_use_indexes(self, db_session):
+        now = seed_logs(db_session)
+        db_session.execute(text("ANALYZE"))
+        check_hot_queries(db_session, now)
+
+    def test_models_declare_indexes(self):
+        names = {index.name for index in AccessLog.__table__.indexes}
+        assert {"ix_access_logs_employee_id_timestamp", "ix_access_logs_timestamp"} <= names
+        names = {index.name for index in UserLoginLog.__table__.indexes}
+        assert {"ix_user_login_logs_user_id_timestamp", "ix_user_login_logs_timestamp"} <= names
+
+
+@pytest.mark.skipif(not TEST_MYSQL_URL, reason="TEST_MYSQL_URL not set")
+class TestMySQLPlans:
+    """EXPLAIN on a disposable MySQL database"""
+
+    def test_hot_queries_use_indexes(self):
+        engine = create_engine(TEST_MYSQL_URL)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        try:
+            with sessionmaker(bind=engine)() as db:
+                now = seed_logs(db)
+                db.commit()
+                for table in ("access_logs", "user_login_logs", "employees", "employee_daily_stats"):
+                    db.execute(text(f"ANALYZE TABLE {table}"))
+                check_hot_queries(db, now)
+        finally:
+            Base.metadata.drop_all(engine)
+            engine.dispose()
@@ -0,0 +1,282 @@
+"""
+Rate limiter tests
+Sliding window counter, GCRA token buckets, retry times, idle key eviction and backends
+"""
+
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from utils import rate_limiter as rate_limiter_module
+from utils.rate_limiter import (
+    BudgetLimiter,
+    MemoryBackend,
+    RateLimiter,
+    RedisBackend,
+    TAKE_ALL_SCRIPT,
+    retry_after,
+    sliding_count,
+)
+
+
+class FakeRedis:
+    """In-memory stand-in for the subset of redis-py used by RedisBackend"""
+
+    def __init__(self):
+        self.values, self.ttls = {}, {}
+        self.scripts = 0
+
+    def get(self, key):
+        value = self.values.get(key)
+        return None if value is None else str(value).encode()
+
+    def eval(self, script, numkeys, *keys_and_args):
+        # Mirrors TAKE_ALL_SCRIPT, which is the only script RedisBackend runs
+        assert script == TAKE_ALL_SCRIPT
+        self.scripts += 1
+        keys, args = keys_and_args[:numkeys], [float(arg) for arg in keys_and_args[numkeys:]]
+        now, tats = args[0], []
+        for i, key in enumerate(keys):
+            interval, burst, cost = args[3 * i + 1 : 3 * i + 4]
+            tat = max(float(self.values.get(key, now)), now) + cost * interval
+            if tat - now > burst * interval:
+                return [i + 1, repr(tat - now - burst * interval).encode()]
+            tats.append(tat)
+        for key, tat in zip(keys, tats):
+            self.values[key] = tat
+            self.ttls[key] = (tat - now) * 1000 + 1000
+        return [0, b"0"]
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    def decr(self, key):
+        self.values[key] = self.values.get(key, 0) - 1
+        return self.values[key]
+
+    def expire(self, key, seconds):
+        self.ttls[key] = seconds
+
+
+class Clock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=["memory", "redis"])
+def limiter(request):
+    backend = MemoryBackend() if request.param == "memory" else RedisBackend(FakeRedis())
+    limiter = RateLimiter(backend, clock=Clock())
+    limiter.limits = {"/auth/login": {"max_requests": 3, "window_seconds": 100}}
+    return limiter
+
+
+class TestSlidingWindow:
+    """Allow/deny decisions"""
+
+    def test_limit_per_ip_and_endpoint(self, limiter):
+        assert [limiter.is_allowed("1.1.1.1", "/auth/login") for _ in range(4)] == [True, True, True, False]
+        # Another IP and an unlimited endpoint are unaffected
+        assert limiter.is_allowed("2.2.2.2", "/auth/login")
+        assert all(limiter.is_allowed("1.1.1.1", "/employees/") for _ in range(10))
+
+    def test_rejected_attempts_are_not_counted(self, limiter):
+        for _ in range(3):
+            limiter.is_allowed("1.1.1.1", "/auth/login")
+        for _ in range(20):
+            assert not limiter.is_allowed("1.1.1.1", "/auth/login")
+        limiter.clock.now += 200
+        assert limiter.is_allowed("1.1.1.1", "/auth/login")
+
+    def test_previous_window_is_weighted(self, limiter):
+        limiter.clock.now = 1_000_050.0  # middle of a fixed window
+        for _ in range(3):
+            assert limiter.is_allowed("1.1.1.1", "/auth/login")
+        # 60% into the next window: 3 * 0.4 = 1.2 still counted, room for one more
+        limiter.clock.now = 1_000_160.0
+        assert limiter.is_allowed("1.1.1.1", "/auth/login")
+        assert not limiter.is_allowed("1.1.1.1", "/auth/login")
+
+    def test_retry_after_matches_next_allowed_time(self, limiter):
+        for _ in range(3):
+            limiter.is_allowed("1.1.1.1", "/auth/login")
+        allowed, wait = limiter.check("1.1.1.1", "/auth/login")
+        assert not allowed
+        assert limiter.get_reset_time("1.1.1.1", "/auth/login") == int(-(-wait // 1))
+
+        limiter.clock.now += wait - 1
+        assert not limiter.is_allowed("1.1.1.1", "/auth/login")
+        limiter.clock.now += 1
+        assert limiter.is_allowed("1.1.1.1", "/auth/login")
+
+
+class TestRetryAfter:
+    """Closed-form wait time"""
+
+    def test_no_wait_when_there_is_room(self):
+        assert retry_after(1, 1, 0.5, 5, 100) == 0
+
+    def test_wait_for_previous_window_to_fade(self):
+        # 4 * (1 - e) + 1 <= 2  ->  e >= 0.75
+        wait = retry_after(4, 1, 0.5, 3, 100)
+        assert wait == pytest.approx(25)
+        assert sliding_count(4, 1, 0.75) == pytest.approx(2)
+
+    def test_zero_limit_waits_a_full_window(self):
+        assert retry_after(0, 0, 0.3, 0, 100) == 100
+
+
+class TestMemoryBackend:
+    """Constant state per key and idle eviction"""
+
+    def test_state_is_constant_per_key(self):
+        backend = MemoryBackend()
+        for i in range(1000):
+            backend.hit("/auth/login:1.1.1.1", 10_000, 60, 1000.0 + i * 0.01)
+        assert len(backend) == 1
+
+    def test_idle_keys_are_evicted(self):
+        backend = MemoryBackend(sweep_seconds=10)
+        for i in range(100):
+            backend.hit(f"/auth/login:10.0.0.{i}", 5, 60, 1000.0)
+        assert len(backend) == 100
+
+        backend.hit("/auth/login:active", 5, 60, 1119.0)
+        assert len(backend) == 101
+        backend.hit("/auth/login:active", 5, 60, 1130.0)
+        assert len(backend) == 1
+
+
+class TestRedisBackend:
+    """Shared counters"""
+
+    def test_workers_share_counters(self):
+        client = FakeRedis()
+        clock = Clock()
+        workers = [RateLimiter(RedisBackend(client), clock=clock) for _ in range(3)]
+        results = [workers[i % 3].is_allowed("1.1.1.1", "/auth/login") for i in range(6)]
+        assert results == [True] * 5 + [False]
+
+    def test_counters_expire_after_two_windows(self):
+        client = FakeRedis()
+        RedisBackend(client).hit("/auth/login:1.1.1.1", 5, 300, 1000.0)
+        assert list(client.ttls.values()) == [600]
+
+    def test_rejection_leaves_counter_unchanged(self):
+        client = FakeRedis()
+        backend = RedisBackend(client)
+        for _ in range(5):
+            backend.hit("k", 2, 100, 1000.0)
+        assert list(client.values.values()) == [2]
+
+
+@pytest.fixture(params=["memory", "redis"])
+def budgets(request):
+    backend = MemoryBackend() if request.param == "memory" else RedisBackend(FakeRedis())
+    return BudgetLimiter({"device": (1.0, 3), "off": (0, 1)}, backend, clock=Clock())
+
+
+class TestTokenBucket:
+    """GCRA token buckets"""
+
+    def test_burst_then_steady_rate(self, budgets):
+        assert [budgets.take("device", "k")[0] for _ in range(4)] == [True, True, True, False]
+        budgets.clock.now += 1
+        assert budgets.take("device", "k")[0]
+        assert not budgets.take("device", "k")[0]
+
+    def test_retry_after_is_time_to_next_token(self, budgets):
+        for _ in range(3):
+            budgets.take("device", "k")
+        budgets.clock.now += 0.25
+        allowed, wait = budgets.take("device", "k")
+        assert not allowed
+        assert wait == pytest.approx(0.75)
+
+    def test_cost_is_capped_at_burst(self, budgets):
+        assert budgets.take("device", "k", cost=10)[0]
+        assert not budgets.take("device", "k")[0]
+        budgets.clock.now += 3
+        assert budgets.take("device", "k", cost=3)[0]
+
+    @pytest.mark.parametrize("backend", ["memory", "redis"])
+    def test_take_all_consumes_only_when_every_budget_allows(self, backend):
+        backend = MemoryBackend() if backend == "memory" else RedisBackend(FakeRedis())
+        budgets = BudgetLimiter({"device": (1.0, 2), "warehouse": (1.0, 1)}, backend, clock=Clock())
+        assert budgets.take_all([("device", "k"), ("warehouse", "w")]) == (None, 0.0)
+        budget, wait = budgets.take_all([("device", "k"), ("warehouse", "w")])
+        assert (budget, wait) == ("warehouse", pytest.approx(1.0))
+        # The rejected request left the device bucket untouched
+        assert budgets.take("device", "k")[0]
+        assert not budgets.take("device", "k")[0]
+
+    def test_redis_checks_every_budget_in_one_script(self):
+        client = FakeRedis()
+        budgets = BudgetLimiter({"device": (1.0, 2), "warehouse": (1.0, 5), "off": (0, 1)}, RedisBackend(client), clock=Clock())
+        budgets.take_all([("device", "k"), ("warehouse", "w"), ("off", "k")])
+        assert client.scripts == 1
+        assert set(client.values) == {"rate_limit:bucket:device:k", "rate_limit:bucket:warehouse:w"}
+        # Buckets expire once they would be full again
+        assert client.ttls["rate_limit:bucket:device:k"] == pytest.approx(2000)
+
+    def test_zero_rate_disables_budget(self, budgets):
+        assert all(budgets.take("off", "k")[0] for _ in range(10))
+
+    def test_full_buckets_are_evicted(self):
+        backend = MemoryBackend(sweep_seconds=1)
+        budgets = BudgetLimiter({"device": (1.0, 3)}, backend, clock=Clock())
+        for i in range(50):
+            budgets.take("device", f"kiosk-{i}")
+        assert len(backend) == 50
+        budgets.clock.now += 2
+        budgets.take("device", "kiosk-0")
+        assert len(backend) == 1
+
+
+class TestCheckRateLimit:
+    """HTTP error raised to clients"""
+
+    def test_429_with_retry_after(self, monkeypatch):
+        limiter = RateLimiter(MemoryBackend(), clock=time.time)
+        monkeypatch.setattr(rate_limiter_module, "rate_limiter", limiter)
+
+        class FakeRequest:
+            class client:
+                host = "9.9.9.9"
+
+        for _ in range(5):
+            rate_limiter_module.check_rate_limit(FakeRequest(), "/auth/login")
+        with pytest.raises(HTTPException) as error:
+            rate_limiter_module.check_rate_limit(FakeRequest(), "/auth/login")
+        assert error.value.status_code == 429
+        assert int(error.value.headers["Retry-After"]) > 0
+        assert error.value.detail["retry_after"] == int(error.value.headers["Retry-After"])
+
+
+class TestFaceDeviceKey:
+    """Device identity for face budgets"""
+
+    class FakeRequest:
+        def __init__(self, headers):
+            self.headers = headers
+
+            class client:
+                host = "10.0.0.1"
+
+            self.client = client
+
+    def test_header_wins(self):
+        request = self.FakeRequest({"X-Device-Id": "kiosk-7"})
+        assert rate_limiter_module.face_device_key(request, user_id=1) == "id:kiosk-7"
+
+    def test_kiosks_behind_one_nat_are_keyed_by_user(self):
+        first, second = self.FakeRequest({}), self.FakeRequest({})
+        assert rate_limiter_module.face_device_key(first, user_id=1) != rate_limiter_module.face_device_key(second, user_id=2)
+
+    def test_ip_is_the_last_resort(self):
+        assert rate_limiter_module.face_device_key(self.FakeRequest({})) == "ip:10.0.0.1"
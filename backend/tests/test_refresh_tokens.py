@@ -0,0 +1,146 @@
+"""
+Refresh token housekeeping tests
+Chunked cleanup, single-statement revocation, batched last_used writes and the revocation index
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import inspect, select
+
+from conftest import recorded_statements
+from models import RefreshToken
+from utils import refresh_tokens as refresh_tokens_module
+from utils.refresh_tokens import LastUsedBuffer, RefreshTokenService
+
+
+@pytest.fixture(autouse=True)
+def last_used_buffer(monkeypatch):
+    buffer = LastUsedBuffer(flush_seconds=60, max_pending=3)
+    monkeypatch.setattr(refresh_tokens_module, "last_used_buffer", buffer)
+    return buffer
+
+
+def add_tokens(db, user_id, count, expires_in_days, **fields):
+    now = datetime.utcnow()
+    tokens = [
+        RefreshToken(
+            user_id=user_id,
+            token=f"{user_id}-{expires_in_days}-{i}-{now.timestamp()}",
+            expires_at=now + timedelta(days=expires_in_days),
+            **fields,
+        )
+        for i in range(count)
+    ]
+    db.add_all(tokens)
+    db.commit()
+    return tokens
+
+
+def verbs(statements):
+    return [sql.lstrip().split()[0].upper() for sql, _ in statements]
+
+
+class TestCleanup:
+    """Expired tokens are deleted in PK-range batches"""
+
+    def test_deletes_only_expired_tokens(self, db_session, setup_test_data):
+        add_tokens(db_session, 1, 7, expires_in_days=-1)
+        live = add_tokens(db_session, 1, 3, expires_in_days=30)
+
+        assert RefreshTokenService.cleanup_expired_tokens(db_session, batch_size=2) == 7
+        remaining = {token.id for token in db_session.query(RefreshToken).all()}
+        assert remaining == {token.id for token in live}
+
+    def test_one_delete_per_batch(self, db_session, setup_test_data):
+        add_tokens(db_session, 1, 10, expires_in_days=-1)
+        with recorded_statements(db_session) as statements:
+            RefreshTokenService.cleanup_expired_tokens(db_session, batch_size=4)
+        assert verbs(statements).count("DELETE") == 3
+        assert verbs(statements).count("SELECT") == 1
+
+    def test_empty_table(self, db_session, setup_test_data):
+        assert RefreshTokenService.cleanup_expired_tokens(db_session) == 0
+
+
+class TestRevocation:
+    """Revocation runs a single UPDATE and reports affected rows"""
+
+    def test_revokes_active_tokens(self, db_session, setup_test_data):
+        add_tokens(db_session, 1, 3, expires_in_days=30)
+        add_tokens(db_session, 1, 2, expires_in_days=30, user_agent="kiosk")
+        add_tokens(db_session, 2, 2, expires_in_days=30)
+        with recorded_statements(db_session) as statements:
+            assert RefreshTokenService.revoke_user_tokens(db_session, 1, device_info="kiosk") == 2
+            assert RefreshTokenService.revoke_user_tokens(db_session, 1) == 3
+            assert RefreshTokenService.revoke_user_tokens(db_session, 1) == 0
+        assert verbs(statements) == ["UPDATE"] * 3
+        assert db_session.query(RefreshToken).filter(RefreshToken.is_revoked == False).count() == 2
+
+    def test_index_covers_active_session_lookups(self, db_session, setup_test_data):
+        indexes = {
+            index["name"]: index["column_names"]
+            for index in inspect(db_session.connection()).get_indexes("refresh_tokens")
+        }
+        assert indexes["ix_refresh_tokens_user_id_is_revoked_expires_at"] == ["user_id", "is_revoked", "expires_at"]
+
+
+class TestLastUsed:
+    """last_used writes are coalesced and flushed together"""
+
+    def test_validation_does_not_write_until_due(self, db_session, setup_test_data, last_used_buffer):
+        token = add_tokens(db_session, 1, 1, expires_in_days=30)[0]
+        with recorded_statements(db_session) as statements:
+            for _ in range(5):
+                validated = RefreshTokenService.validate_refresh_token(db_session, token.token)
+        assert validated.last_used is not None
+        assert "UPDATE" not in verbs(statements)
+        assert len(last_used_buffer) == 1
+
+        sessions = RefreshTokenService.get_user_active_sessions(db_session, 1)
+        assert sessions[0]["last_used"] == last_used_buffer.get(token.id)
+
+    def test_flush_writes_batch(self, db_session, setup_test_data, last_used_buffer):
+        tokens = add_tokens(db_session, 1, 3, expires_in_days=30)
+        with recorded_statements(db_session) as statements:
+            for token in tokens:
+                RefreshTokenService.validate_refresh_token(db_session, token.token)
+        # The third token reaches max_pending and triggers one executemany UPDATE
+        assert verbs(statements).count("UPDATE") == 1
+        assert len(last_used_buffer) == 0
+
+        db_session.expire_all()
+        assert all(token.last_used is not None for token in db_session.query(RefreshToken).all())
+
+    def test_flush_does_not_commit_the_callers_session(self, db_session, setup_test_data, last_used_buffer):
+        tokens = add_tokens(db_session, 1, 3, expires_in_days=30)
+        tokens[0].user_agent = "uncommitted"
+
+        for token in tokens:
+            RefreshTokenService.validate_refresh_token(db_session, token.token)
+        assert len(last_used_buffer) == 0
+
+        # The caller's pending change is still unflushed; only last_used reached the table
+        assert tokens[0] in db_session.dirty
+        table = RefreshToken.__table__
+        rows = db_session.connection().execute(select(table.c.user_agent, table.c.last_used)).all()
+        assert [user_agent for user_agent, _ in rows] == [None] * 3
+        assert all(last_used is not None for _, last_used in rows)
+
+    def test_failed_flush_keeps_pending(self, db_session, setup_test_data, last_used_buffer, monkeypatch):
+        used_at = datetime.utcnow()
+        last_used_buffer.touch(1, used_at)
+        monkeypatch.setattr(db_session, "execute", lambda *args, **kwargs: 1 / 0)
+
+        assert RefreshTokenService.flush_last_used(db_session) == 0
+        assert last_used_buffer.get(1) == used_at
+
+    def test_buffer_keeps_latest_mark(self):
+        buffer = LastUsedBuffer(flush_seconds=60, max_pending=10, clock=lambda: 0.0)
+        later = datetime.utcnow()
+        buffer.touch(1, later)
+        buffer.touch(1, later - timedelta(seconds=5))
+        assert buffer.get(1) == later
+        assert not buffer.due()
+        buffer.clock = lambda: 60.0
+        assert buffer.due()
@@ -0,0 +1,217 @@
+"""
+Report cache tests
+Time-bucketed keys, LRU/TTL, invalidation on new access logs and backends
+"""
+
+import fnmatch
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from models import AccessLog, Employee
+from services import report_cache as report_cache_module
+from services import report_service
+from services.report_cache import MemoryBackend, RedisBackend, ReportCache, report_cache
+
+PAST_START = datetime(2026, 1, 1)
+PAST_END = datetime(2026, 1, 31, 23, 59, 59)
+
+
+class FakeRedis:
+    """In-memory stand-in for the subset of redis-py used by RedisBackend"""
+
+    def __init__(self):
+        self.values, self.expiry, self.hashes = {}, {}, {}
+
+    def get(self, key):
+        if key in self.expiry and self.expiry[key] <= time.monotonic():
+            self.delete(key)
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value.encode()
+        self.expiry.pop(key, None)
+        if ex:
+            self.expiry[key] = time.monotonic() + ex
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+            self.hashes.pop(key, None)
+
+    def hset(self, name, key, value):
+        self.hashes.setdefault(name, {})[key.encode()] = value.encode()
+
+    def hgetall(self, name):
+        return dict(self.hashes.get(name, {}))
+
+    def hdel(self, name, *keys):
+        for key in keys:
+            self.hashes.get(name, {}).pop(key.encode(), None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.values) + list(self.hashes) if fnmatch.fnmatch(key, match)]
+
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request):
+    backend = MemoryBackend(max_size=8) if request.param == "memory" else RedisBackend(FakeRedis())
+    return ReportCache(backend, bucket_seconds=60)
+
+
+def counting(result):
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return result
+
+    return compute, calls
+
+
+class TestReportCache:
+    """ReportCache over both backends"""
+
+    def test_closed_range_is_computed_once(self, cache):
+        compute, calls = counting([{"total": 1}])
+        for _ in range(3):
+            assert cache.cached("checkins", {"a": 1}, PAST_START, PAST_END, compute) == [{"total": 1}]
+        assert len(calls) == 1
+        # Different filters are a different entry
+        cache.cached("checkins", {"a": 2}, PAST_START, PAST_END, compute)
+        assert len(calls) == 2
+
+    def test_open_range_rolls_over_with_the_bucket(self, cache, monkeypatch):
+        compute, calls = counting([])
+        cache.cached("frequent", {}, None, None, compute)
+        cache.cached("frequent", {}, None, None, compute)
+        assert len(calls) == 1
+
+        cache.bucket_seconds = 1
+        time.sleep(1.1)
+        cache.cached("frequent", {}, None, None, compute)
+        assert len(calls) == 2
+
+    def test_invalidate_only_entries_covering_the_timestamp(self, cache):
+        january, calls_january = counting(["jan"])
+        february, calls_february = counting(["feb"])
+        cache.cached("checkins", {}, PAST_START, PAST_END, january)
+        cache.cached("checkins", {}, PAST_END + timedelta(seconds=1), datetime(2026, 2, 28), february)
+
+        assert cache.invalidate([datetime(2026, 1, 15, 8, 0)]) == 1
+        cache.cached("checkins", {}, PAST_START, PAST_END, january)
+        cache.cached("checkins", {}, PAST_END + timedelta(seconds=1), datetime(2026, 2, 28), february)
+        assert (len(calls_january), len(calls_february)) == (2, 1)
+
+    def test_aware_range_is_normalized_to_utc(self, cache):
+        compute, calls = counting([])
+        aware_end = PAST_END.replace(tzinfo=timezone.utc)
+        cache.cached("checkins", {}, PAST_START.replace(tzinfo=timezone.utc), aware_end, compute)
+        cache.cached("checkins", {}, PAST_START, PAST_END, compute)
+        assert len(calls) == 1
+
+        assert cache.invalidate([datetime(2026, 1, 15, 8, 0)]) == 1
+
+    def test_clear(self, cache):
+        compute, calls = counting([])
+        cache.cached("checkins", {}, PAST_START, PAST_END, compute)
+        cache.clear()
+        cache.cached("checkins", {}, PAST_START, PAST_END, compute)
+        assert len(calls) == 2
+
+
+class TestMemoryBackend:
+    """LRU eviction and TTL"""
+
+    def test_least_recently_used_is_evicted(self):
+        backend = MemoryBackend(max_size=2)
+        backend.set("a", "1", covers=(None, PAST_END))
+        backend.set("b", "2")
+        backend.get("a")
+        backend.set("c", "3")
+        assert backend.get("b") is None and backend.get("a") == "1"
+        assert len(backend) == 2
+
+    def test_expired_entries_are_dropped(self, monkeypatch):
+        backend = MemoryBackend()
+        backend.set("a", "1", ttl=10)
+        now = time.monotonic()
+        monkeypatch.setattr(report_cache_module.time, "monotonic", lambda: now + 11)
+        assert backend.get("a") is None
+
+
+class TestRedisBackend:
+    """Range index used for invalidation"""
+
+    def test_expired_ranges_are_pruned(self):
+        client, now = FakeRedis(), [1_000_000.0]
+        backend = RedisBackend(client, ttl=100, clock=lambda: now[0])
+        backend.set("old", "1", covers=(PAST_START, PAST_END))
+        now[0] += 50
+        backend.set("new", "2", covers=(PAST_START, PAST_END))
+        now[0] += 60
+
+        assert list(backend.ranges()) == ["new"]
+        assert list(client.hashes["report_cache:ranges"]) == [b"new"]
+
+    def test_closed_entries_get_the_backend_ttl(self):
+        client = FakeRedis()
+        RedisBackend(client, ttl=100).set("k", "1", covers=(None, PAST_END))
+        assert "report_cache:k" in client.expiry
+
+
+class TestSessionInvalidation:
+    """AccessLog commits invalidate the global cache"""
+
+    def test_new_log_in_cached_range_invalidates(self, db_session, setup_test_data):
+        compute, calls = counting([])
+        report_cache.cached("checkins", {}, PAST_START, PAST_END, compute)
+        other, other_calls = counting([])
+        report_cache.cached("checkins", {"x": 1}, datetime(2025, 1, 1), datetime(2025, 1, 2), other)
+
+        db_session.add(AccessLog(employee_id=1, event_type="in", timestamp=datetime(2026, 1, 10, 9, 0)))
+        db_session.flush()
+        report_cache.cached("checkins", {}, PAST_START, PAST_END, compute)
+        assert len(calls) == 1  # Not committed yet
+
+        db_session.commit()
+        report_cache.cached("checkins", {}, PAST_START, PAST_END, compute)
+        report_cache.cached("checkins", {"x": 1}, datetime(2025, 1, 1), datetime(2025, 1, 2), other)
+        assert (len(calls), len(other_calls)) == (2, 1)
+
+    def test_employee_change_clears_cache(self, db_session, setup_test_data):
+        compute, calls = counting([])
+        report_cache.cached("checkins", {}, PAST_START, PAST_END, compute)
+        db_session.get(Employee, 1).first_name = "Johnny"
+        db_session.commit()
+        report_cache.cached("checkins", {}, PAST_START, PAST_END, compute)
+        assert len(calls) == 2
+
+
+class TestReportEndpointsCache:
+    """GET /reports/* served from the cache"""
+
+    def test_checkins_are_cached_and_invalidated(self, admin_client, db_session, monkeypatch):
+        calls = []
+        original = report_service.get_employee_checkin_report
+        monkeypatch.setattr(
+            report_service, "get_employee_checkin_report",
+            lambda *args, **kwargs: calls.append(1) or original(*args, **kwargs),
+        )
+        params = {"start_date": PAST_START.isoformat(), "end_date": PAST_END.isoformat()}
+
+        assert admin_client.get("/reports/checkins", params=params).json() == []
+        assert admin_client.get("/reports/checkins", params=params).json() == []
+        assert len(calls) == 1
+
+        db_session.add(AccessLog(employee_id=1, event_type="in", timestamp=datetime(2026, 1, 5, 8, 0)))
+        db_session.commit()
+        rows = admin_client.get("/reports/checkins", params=params).json()
+        assert len(calls) == 2 and rows[0]["total_check_ins"] == 1
+
+    def test_z_suffixed_dates_are_accepted(self, admin_client):
+        params = {"start_date": "2026-01-01T00:00:00Z", "end_date": "2026-01-05T00:00:00Z"}
+        for path in ("/reports/checkins", "/reports/warehouse-activity"):
+            response = admin_client.get(path, params=params)
+            assert response.status_code == 200, response.text
@@ -0,0 +1,205 @@
+"""
+Daily rollup tests
+Rollup maintenance and reports combining rollups with raw access logs
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import delete
+
+from models import AccessLog, EmployeeDailyStats, RollupDay
+from services import report_service, rollup_service
+
+TODAY = date(2026, 3, 5)
+FIRST_DAY = date(2026, 3, 1)
+
+
+def at(day, hour, minute=0):
+    return datetime.combine(day, datetime.min.time()) + timedelta(hours=hour, minutes=minute)
+
+
+@pytest.fixture
+def four_days_of_logs(db_session, setup_test_data):
+    """Employees 1, 2 and 3 (warehouses 1, 2 and 3) clock in and out every day"""
+    for offset in range(5):
+        day = FIRST_DAY + timedelta(days=offset)
+        for employee_id in (1, 2, 3):
+            db_session.add(AccessLog(employee_id=employee_id, event_type="in", timestamp=at(day, 8, employee_id)))
+            db_session.add(AccessLog(employee_id=employee_id, event_type="out", timestamp=at(day, 17, employee_id)))
+    # Employee 1 comes back in the evening of the first day
+    db_session.add(AccessLog(employee_id=1, event_type="in", timestamp=at(FIRST_DAY, 20)))
+    db_session.flush()
+
+
+def raw_reports(db, **kwargs):
+    """Reports computed with every rollup day discarded"""
+    db.execute(delete(RollupDay))
+    return report_service.get_employee_checkin_report(db, **kwargs)
+
+
+class TestRollupMaintenance:
+    """refresh_rollups and rollup_day"""
+
+    def test_refresh_rolls_up_complete_days(self, db_session, four_days_of_logs):
+        assert rollup_service.refresh_rollups(db_session, today=TODAY) == 4
+
+        stats = db_session.get(EmployeeDailyStats, (FIRST_DAY, 1))
+        assert (stats.check_ins, stats.check_outs, stats.events) == (2, 1, 3)
+        assert stats.first_in == at(FIRST_DAY, 8, 1)
+        assert stats.last_out == at(FIRST_DAY, 17, 1)
+        assert (stats.last_event, stats.last_event_at) == ("in", at(FIRST_DAY, 20))
+        assert stats.warehouse_id == 1
+        # Today is still open
+        assert db_session.get(RollupDay, TODAY) is None
+
+    def test_late_logs_are_picked_up_by_reopened_days(self, db_session, four_days_of_logs):
+        rollup_service.refresh_rollups(db_session, today=TODAY)
+        yesterday = TODAY - timedelta(days=1)
+        db_session.add(AccessLog(employee_id=2, event_type="in", timestamp=at(yesterday, 21)))
+        db_session.flush()
+
+        assert rollup_service.refresh_rollups(db_session, today=TODAY) == rollup_service.ROLLUP_REOPEN_DAYS
+        assert db_session.get(EmployeeDailyStats, (yesterday, 2)).check_ins == 2
+
+    def test_split_range(self, db_session, four_days_of_logs):
+        rollup_service.refresh_rollups(db_session, today=TODAY)
+        day_spans, log_spans = rollup_service.split_range(
+            db_session, at(FIRST_DAY, 12), at(TODAY, 10)
+        )
+        assert day_spans == [(date(2026, 3, 2), TODAY)]
+        assert log_spans == [
+            (at(FIRST_DAY, 12), at(date(2026, 3, 2), 0), False),
+            (at(TODAY, 0), at(TODAY, 10), True),
+        ]
+
+
+class FakeLockConnection:
+    """MySQL connection stand-in answering GET_LOCK/RELEASE_LOCK"""
+
+    def __init__(self, locks):
+        self.locks = locks
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def scalar(self, statement, params):
+        if "GET_LOCK" in str(statement):
+            if params["name"] in self.locks:
+                return 0
+            self.locks.add(params["name"])
+            return 1
+        self.locks.discard(params["name"])
+        return 1
+
+
+class FakeMySQLSession:
+    def __init__(self, locks):
+        self.locks = locks
+
+    def get_bind(self):
+        session = self
+
+        class bind:
+            class dialect:
+                name = "mysql"
+
+            @staticmethod
+            def connect():
+                return FakeLockConnection(session.locks)
+
+        return bind
+
+
+class TestSingleRunner:
+    """Only one worker rolls up at a time"""
+
+    def test_second_worker_skips_while_lock_is_held(self):
+        locks = set()
+        with rollup_service.single_runner(FakeMySQLSession(locks)) as first:
+            with rollup_service.single_runner(FakeMySQLSession(locks)) as second:
+                assert (first, second) == (True, False)
+            assert locks == {rollup_service.ROLLUP_LOCK_NAME}
+        assert locks == set()
+
+    def test_other_databases_always_run(self, db_session):
+        with rollup_service.single_runner(db_session) as acquired:
+            assert acquired
+
+    def test_job_is_on_by_default(self):
+        assert rollup_service.ROLLUP_INTERVAL_SECONDS > 0
+
+
+class TestReportsFromRollups:
+    """Reports give the same answer with and without rollups"""
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {},
+            {"start_date": at(FIRST_DAY, 12), "end_date": at(TODAY, 10)},
+            {"start_date": at(date(2026, 3, 2), 0), "end_date": at(date(2026, 3, 3), 23, 59)},
+            {"warehouse_id": 1, "start_date": at(FIRST_DAY, 0)},
+            {"employee_id": 3},
+        ],
+    )
+    def test_checkin_report_matches_raw_logs(self, db_session, four_days_of_logs, kwargs):
+        rollup_service.refresh_rollups(db_session, today=TODAY)
+        from_rollups = report_service.get_employee_checkin_report(db_session, **kwargs)
+        assert from_rollups == raw_reports(db_session, **kwargs)
+
+    def test_checkin_report_values(self, db_session, four_days_of_logs):
+        rollup_service.refresh_rollups(db_session, today=TODAY)
+        rows = report_service.get_employee_checkin_report(db_session, warehouse_id=1)
+        assert [(r.employee_id, r.total_check_ins, r.total_check_outs) for r in rows] == [(1, 6, 5)]
+        assert rows[0].employee_name == "John Doe"
+        assert (rows[0].last_event, rows[0].last_event_time) == ("out", at(TODAY, 17, 1))
+
+    def test_aware_range_over_rolled_up_days(self, db_session, four_days_of_logs):
+        rollup_service.refresh_rollups(db_session, today=TODAY)
+        # 09:00-03:00 is 12:00 UTC of the first day
+        start = at(FIRST_DAY, 9).replace(tzinfo=timezone(timedelta(hours=-3)))
+        end = at(TODAY, 10).replace(tzinfo=timezone.utc)
+        from_rollups = report_service.get_employee_checkin_report(db_session, start_date=start, end_date=end)
+        assert from_rollups == raw_reports(db_session, start_date=at(FIRST_DAY, 12), end_date=at(TODAY, 10))
+
+    def test_warehouse_activity_counts_unique_employees_across_days(self, db_session, four_days_of_logs):
+        rollup_service.refresh_rollups(db_session, today=TODAY)
+        rows = report_service.get_warehouse_activity_report(db_session, start_date=at(FIRST_DAY, 12))
+        assert [(r.warehouse_id, r.total_events, r.unique_employees) for r in rows] == [(1, 10, 1), (2, 9, 1), (3, 9, 1)]
+
+    def test_frequent_employees(self, db_session, four_days_of_logs):
+        rollup_service.refresh_rollups(db_session, today=TODAY)
+        rows = report_service.get_frequent_employees(db_session, days=36500, limit=2)
+        assert [(r.employee_id, r.total_events) for r in rows] == [(1, 11), (2, 10)]
+
+
+class TestReportEndpoints:
+    """GET /reports/*"""
+
+    def test_checkins_endpoint(self, admin_client, db_session, four_days_of_logs):
+        rollup_service.refresh_rollups(db_session, today=TODAY)
+        response = admin_client.get("/reports/checkins", params={"employee_id": 1})
+        assert response.status_code == 200
+        assert response.json() == [
+            {
+                "employee_id": 1,
+                "employee_name": "John Doe",
+                "total_check_ins": 6,
+                "total_check_outs": 5,
+                "last_event": "out",
+                "last_event_time": at(TODAY, 17, 1).isoformat(),
+            }
+        ]
+
+    def test_frequent_employees_endpoint(self, admin_client, db_session, four_days_of_logs):
+        now = datetime.utcnow()
+        for minutes in (1, 2):
+            db_session.add(AccessLog(employee_id=2, event_type="in", timestamp=now - timedelta(minutes=minutes)))
+        db_session.flush()
+        response = admin_client.get("/reports/frequent-employees", params={"days": 1, "limit": 1})
+        assert response.status_code == 200
+        assert response.json() == [{"employee_id": 2, "employee_name": "Jane Smith", "total_events": 2}]
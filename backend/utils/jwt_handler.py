@@ -1,5 +1,27 @@
+"""
+JWT encoding and verification
+
+Tokens are signed and verified by a pluggable backend (JWT_BACKEND):
+- jose: python-jose (default)
+- pyjwt: PyJWT, if installed
+- stdlib: HS256 with hmac/hashlib/json only
+
+Verified claims are kept in a bounded LRU keyed by the SHA-256 of the
+token, until the token's own `exp`. A kiosk sending the same token on every
+request pays for one signature check instead of one per call. Invalid and
+expired tokens are never cached.
+"""
+
+import base64
+import calendar
+import hashlib
+import hmac
+import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional, Dict
+from typing import Optional, Dict, Tuple
 from jose import JWTError, jwt
 import os
 from dotenv import load_dotenv
@@ -10,6 +32,166 @@ load_dotenv()
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "your-secret-key-change-this-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "1440"))  # 24 hours default
+JWT_BACKEND = os.getenv("JWT_BACKEND", "jose")  # jose | pyjwt | stdlib
+JWT_CACHE_SIZE = int(os.getenv("JWT_CACHE_SIZE", "4096"))  # 0 disables the cache
+
+
+class InvalidTokenError(Exception):
+    """Bad signature, malformed token or expired claims"""
+
+
+class JoseBackend:
+    name = "jose"
+
+    def __init__(self, secret: str = SECRET_KEY, algorithm: str = ALGORITHM):
+        self.secret = secret
+        self.algorithm = algorithm
+
+    def encode(self, claims: Dict) -> str:
+        return jwt.encode(claims, self.secret, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> Dict:
+        try:
+            return jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        except JWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+class PyJWTBackend:
+    name = "pyjwt"
+
+    def __init__(self, secret: str = SECRET_KEY, algorithm: str = ALGORITHM):
+        import jwt as pyjwt
+
+        self._jwt = pyjwt
+        self.secret = secret
+        self.algorithm = algorithm
+
+    def encode(self, claims: Dict) -> str:
+        return self._jwt.encode(claims, self.secret, algorithm=self.algorithm)
+
+    def decode(self, token: str) -> Dict:
+        try:
+            return self._jwt.decode(token, self.secret, algorithms=[self.algorithm])
+        except self._jwt.PyJWTError as e:
+            raise InvalidTokenError(str(e)) from e
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _numeric_date(value):
+    if isinstance(value, datetime):
+        return calendar.timegm(value.utctimetuple())
+    return value
+
+
+class StdlibBackend:
+    """
+    HS256 only; validates the signature, `exp` and `nbf`
+    """
+
+    name = "stdlib"
+    _HEADER = _b64encode(json.dumps({"alg": "HS256", "typ": "JWT"}, separators=(",", ":")).encode())
+
+    def __init__(self, secret: str = SECRET_KEY, algorithm: str = ALGORITHM):
+        if algorithm != "HS256":
+            raise ValueError("The stdlib JWT backend only supports HS256")
+        self.secret = secret.encode()
+
+    def _sign(self, signing_input: bytes) -> bytes:
+        return hmac.new(self.secret, signing_input, hashlib.sha256).digest()
+
+    def encode(self, claims: Dict) -> str:
+        payload = {key: _numeric_date(value) for key, value in claims.items()}
+        signing_input = f"{self._HEADER}.{_b64encode(json.dumps(payload, separators=(',', ':')).encode())}"
+        return f"{signing_input}.{_b64encode(self._sign(signing_input.encode()))}"
+
+    def decode(self, token: str) -> Dict:
+        try:
+            header, payload, signature = token.split(".")
+            if not hmac.compare_digest(self._sign(f"{header}.{payload}".encode()), _b64decode(signature)):
+                raise InvalidTokenError("Signature verification failed")
+            if json.loads(_b64decode(header)).get("alg") != "HS256":
+                raise InvalidTokenError("Unexpected algorithm")
+            claims = json.loads(_b64decode(payload))
+        except ValueError as e:
+            raise InvalidTokenError(str(e)) from e
+        if not isinstance(claims, dict):
+            raise InvalidTokenError("Invalid payload")
+        now = time.time()
+        if "exp" in claims and now >= claims["exp"]:
+            raise InvalidTokenError("Signature has expired")
+        if "nbf" in claims and now < claims["nbf"]:
+            raise InvalidTokenError("The token is not yet valid")
+        return claims
+
+
+BACKENDS = {"jose": JoseBackend, "pyjwt": PyJWTBackend, "stdlib": StdlibBackend}
+
+
+def create_backend(name: str = JWT_BACKEND):
+    try:
+        return BACKENDS[name]()
+    except ImportError:
+        print(f"Warning: JWT backend '{name}' not available - using python-jose")
+    except KeyError:
+        print(f"Warning: unknown JWT backend '{name}' - using python-jose")
+    return JoseBackend()
+
+
+class DecodedTokenCache:
+    """
+    LRU of sha256(token) -> (exp, verified claims)
+    """
+
+    def __init__(self, max_size: int = JWT_CACHE_SIZE):
+        self.max_size = max_size
+        self._items: "OrderedDict[bytes, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str, now: float) -> Optional[Dict]:
+        key = self._key(token)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            exp, claims = item
+            if now >= exp:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return claims
+
+    def set(self, token: str, claims: Dict) -> None:
+        exp = claims.get("exp")
+        # Without a numeric exp there is no safe lifetime for the entry
+        if self.max_size <= 0 or not isinstance(exp, (int, float)):
+            return
+        with self._lock:
+            self._items[self._key(token)] = (exp, claims)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+backend = create_backend()
+token_cache = DecodedTokenCache()
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -31,7 +213,7 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = backend.encode(to_encode)
     return encoded_jwt
 
 
@@ -45,11 +227,15 @@ def decode_token(token: str) -> Optional[Dict]:
     Returns:
         Dictionary with the decoded payload, or None if invalid/expired
     """
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        return None
+    claims = token_cache.get(token, time.time())
+    if claims is None:
+        try:
+            claims = backend.decode(token)
+        except InvalidTokenError:
+            return None
+        token_cache.set(token, claims)
+    # Copy, so callers cannot modify the cached entry
+    return dict(claims)
 
 
 def create_refresh_token(data: dict) -> str:
@@ -65,5 +251,5 @@ def create_refresh_token(data: dict) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(days=30)  # Refresh tokens last 30 days
     to_encode.update({"exp": expire, "type": "refresh"})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    encoded_jwt = backend.encode(to_encode)
     return encoded_jwt
@@ -0,0 +1,276 @@
+"""
+Métricas en proceso con exposición en formato de texto de Prometheus
+Histogramas de latencia por etapa (spans) y contadores, sin dependencias externas
+
+Uso:
+    with span("face_detect"):
+        ...
+
+Cada span se acumula en el histograma `face_stage_seconds{stage=...}` y, si la
+petición actual está siendo medida (middleware de main.py), se agrega a la
+cabecera Server-Timing de la respuesta.
+"""
+
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Agrega la cabecera Server-Timing con los spans de cada petición
+METRICS_SERVER_TIMING = os.getenv("METRICS_SERVER_TIMING", "true").lower() == "true"
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Span = Tuple[str, float]
+
+# Spans de la petición HTTP en curso (None fuera de una petición)
+_request_spans: ContextVar[Optional[List[Span]]] = ContextVar(
+    "request_spans", default=None
+)
+# Spans capturados para reenviarlos a otro proceso (ver capture_spans)
+_captured_spans: ContextVar[Optional[List[Span]]] = ContextVar(
+    "captured_spans", default=None
+)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Histogram:
+    """
+    Histograma acumulativo con buckets fijos, una serie por combinación de labels
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._lock = threading.Lock()
+        # labels -> [conteos por bucket (no acumulados), suma]
+        self._series: Dict[Tuple[str, ...], List] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def count(self, **labels: str) -> int:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._series.get(key)
+        return sum(series[0]) if series else 0
+
+    def total(self, **labels: str) -> float:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        series = self._series.get(key)
+        return series[1] if series else 0.0
+
+    def render(self) -> List[str]:
+        lines = []
+        with self._lock:
+            series = sorted((key, list(counts), total) for key, (counts, total) in self._series.items())
+        for key, counts, total in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Counter:
+    """
+    Contador monótono, una serie por combinación de labels
+    """
+
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in values
+        ]
+
+
+class Gauge:
+    """
+    Valor instantáneo leído en cada scrape a través de un callback
+    """
+
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = ()
+
+    def render(self) -> List[str]:
+        return [f"{self.name} {_format_value(self.callback())}"]
+
+
+class MetricsRegistry:
+    """
+    Conjunto de métricas del proceso
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, callback))
+
+    def render(self) -> str:
+        """
+        Todas las métricas en formato de texto de Prometheus (versión 0.0.4)
+        """
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Registro global de métricas (uno por proceso)
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "face_stage_seconds",
+    "Duration of each face recognition stage in seconds",
+    ["stage"],
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request duration in seconds",
+    ["method", "route", "status"],
+)
+
+
+def observe_span(stage: str, seconds: float) -> None:
+    """
+    Registra la duración de una etapa en el histograma y en la petición actual
+    """
+    captured = _captured_spans.get()
+    if captured is not None:
+        captured.append((stage, seconds))
+        return
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    spans = _request_spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+def record_spans(spans: Sequence[Span]) -> None:
+    for stage, seconds in spans:
+        observe_span(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_span(stage, time.perf_counter() - start)
+
+
+@contextmanager
+def capture_spans() -> Iterator[List[Span]]:
+    """
+    Acumula los spans en una lista en vez de registrarlos. Se usa en los
+    procesos del pool de reconocimiento: la lista vuelve con el resultado y el
+    proceso de la API la registra con record_spans.
+    """
+    spans: List[Span] = []
+    token = _captured_spans.set(spans)
+    try:
+        yield spans
+    finally:
+        _captured_spans.reset(token)
+
+
+def start_request():
+    """
+    Empieza a acumular los spans de la petición actual. Retorna el token para
+    end_request y la lista de spans.
+    """
+    spans: List[Span] = []
+    return _request_spans.set(spans), spans
+
+
+def end_request(token) -> None:
+    _request_spans.reset(token)
+
+
+def server_timing_header(spans: Sequence[Span]) -> str:
+    """
+    Valor de la cabecera Server-Timing (duraciones en milisegundos).
+    Las etapas repetidas (p. ej. varias caras) se suman.
+    """
+    totals: Dict[str, float] = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in totals.items())
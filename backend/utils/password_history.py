@@ -6,8 +6,9 @@ from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
-from typing import Optional
-from utils.security import get_password_hash as hash_password, verify_password
+from typing import List, Optional
+from starlette.concurrency import run_in_threadpool
+from utils.security import get_password_hash as hash_password, verify_any_async
 
 Base = declarative_base()
 
@@ -50,11 +51,18 @@ class PasswordHistoryService:
         # Mantener solo las últimas N contraseñas
         self._cleanup_old_passwords(user_id)
 
-    def check_password_reuse(self, user_id: int, new_password: str) -> bool:
+    async def check_password_reuse(self, user_id: int, new_password: str) -> bool:
         """
         Verifica si la nueva contraseña ya fue usada anteriormente
         Retorna True si la contraseña ya fue usada (no permitir)
+        La consulta corre en el threadpool y bcrypt en el executor de contraseñas
         """
+        history_hashes = await run_in_threadpool(self._recent_hashes, user_id)
+
+        # Verificar si la nueva contraseña coincide con alguna anterior (en paralelo)
+        return await verify_any_async(new_password, history_hashes)
+
+    def _recent_hashes(self, user_id: int) -> List[str]:
         from utils.password_policy import PasswordPolicy
 
         # Obtener las últimas contraseñas del historial
@@ -65,13 +73,7 @@ class PasswordHistoryService:
             .limit(PasswordPolicy.HISTORY_SIZE)
             .all()
         )
-
-        # Verificar si la nueva contraseña coincide con alguna anterior
-        for entry in history_entries:
-            if verify_password(new_password, entry.password_hash):
-                return True  # Contraseña ya fue usada
-
-        return False  # Contraseña no ha sido usada
+        return [entry.password_hash for entry in history_entries]
 
     def _cleanup_old_passwords(self, user_id: int) -> None:
         """
@@ -134,13 +136,13 @@ class PasswordHistoryService:
         return None
 
 
-def validate_password_history(user_id: int, new_password: str, db_session) -> bool:
+async def validate_password_history(user_id: int, new_password: str, db_session) -> bool:
     """
     Función helper para validar que una contraseña no esté en el historial
     """
     history_service = PasswordHistoryService(db_session)
 
-    if history_service.check_password_reuse(user_id, new_password):
+    if await history_service.check_password_reuse(user_id, new_password):
         from utils.password_policy import PasswordValidationError, PasswordPolicy
 
         raise PasswordValidationError(
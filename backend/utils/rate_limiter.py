@@ -1,24 +1,261 @@
 """
 Rate limiting middleware para endpoints de autenticación
 Implementa límites de intentos de login y registro para prevenir ataques
+
+Algoritmo: ventana deslizante aproximada (sliding window counter). Por cada
+clave (ip, endpoint) se guardan sólo dos contadores, el de la ventana fija
+actual y el de la anterior; la cantidad en la ventana deslizante se estima
+como anterior * (fracción de ventana que falta) + actual. Costo y memoria
+constantes por clave, sin importar cuántos requests lleguen.
+
+Presupuestos de reconocimiento facial (face_budgets): token bucket por
+dispositivo (cabecera X-Device-Id; si falta, el usuario autenticado y en
+último caso la IP) y por almacén, implementado como GCRA: por clave se guarda
+sólo el "theoretical arrival time" (TAT). Un request de costo c se admite si
+TAT + c/rate - now <= burst/rate. Todos los presupuestos de un request se
+verifican y consumen en un solo paso atómico, así un rechazo del almacén no
+gasta el del dispositivo.
+
+Backends:
+- memory: en proceso; las claves inactivas se eliminan cada
+  RATE_LIMIT_SWEEP_SECONDS.
+- redis: compartido entre workers (los límites no se multiplican por la
+  cantidad de procesos); cada contador expira solo. Los token buckets se
+  resuelven con un script Lua (EVAL): un round trip y sin carreras entre
+  workers. Sirve cualquier cliente con get/incr/decr/expire/eval.
+
+Las llamadas a Redis bloquean: desde handlers async se invoca
+check_face_budget con run_in_threadpool.
 """
 
+import math
+import os
+import threading
 import time
-import asyncio
-from collections import defaultdict, deque
-from typing import Dict, Deque, Tuple
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
 from fastapi import HTTPException, Request, status
-from datetime import datetime, timedelta
+
+from utils.metrics import registry
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")  # memory | redis
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+RATE_LIMIT_SWEEP_SECONDS = float(os.getenv("RATE_LIMIT_SWEEP_SECONDS", "60"))
+
+# Presupuestos de los endpoints de reconocimiento facial (rate en requests/segundo; 0 = sin límite)
+FACE_DEVICE_RATE = float(os.getenv("FACE_DEVICE_RATE", "2"))
+FACE_DEVICE_BURST = float(os.getenv("FACE_DEVICE_BURST", "10"))
+FACE_WAREHOUSE_RATE = float(os.getenv("FACE_WAREHOUSE_RATE", "20"))
+FACE_WAREHOUSE_BURST = float(os.getenv("FACE_WAREHOUSE_BURST", "60"))
+
+DEVICE_HEADER = "X-Device-Id"
+
+BUDGET_REJECTED = registry.counter(
+    "face_budget_rejected_total",
+    "Face recognition requests rejected with 429 by per-device or per-warehouse budgets",
+    ["budget"],
+)
+
+# Resultado de un intento: (permitido, segundos hasta que se vuelva a permitir)
+Decision = Tuple[bool, float]
+
+# Token bucket a consultar: (clave, rate por segundo, burst, costo)
+Bucket = Tuple[str, float, float, float]
+
+# GCRA sobre varios buckets: si alguno rechaza no se toca ninguno.
+# KEYS = buckets; ARGV = now, y por bucket (intervalo, burst, costo).
+# Retorna {índice 1-based del que rechazó o 0, segundos a esperar}; los
+# decimales viajan como string porque Redis trunca los números de Lua a enteros.
+TAKE_ALL_SCRIPT = """
+local now = tonumber(ARGV[1])
+local tats = {}
+for i, key in ipairs(KEYS) do
+    local interval = tonumber(ARGV[3 * i - 1])
+    local burst = tonumber(ARGV[3 * i])
+    local cost = tonumber(ARGV[3 * i + 1])
+    local tat = math.max(tonumber(redis.call('GET', key) or now), now) + cost * interval
+    if tat - now > burst * interval then
+        return {i, tostring(tat - now - burst * interval)}
+    end
+    tats[i] = tat
+end
+for i, key in ipairs(KEYS) do
+    redis.call('SET', key, tostring(tats[i]), 'PX', math.ceil((tats[i] - now) * 1000) + 1000)
+end
+return {0, '0'}
+"""
+
+
+def sliding_count(previous: int, current: int, elapsed: float) -> float:
+    """
+    Requests estimados en la ventana deslizante; elapsed es la fracción
+    [0, 1) ya transcurrida de la ventana fija actual
+    """
+    return previous * (1 - elapsed) + current
+
+
+def retry_after(previous: int, current: int, elapsed: float, max_requests: int, window_seconds: float) -> float:
+    """
+    Segundos hasta que sliding_count deje lugar para un request más
+    """
+    room = max_requests - 1
+    if sliding_count(previous, current, elapsed) <= room:
+        return 0.0
+    if room < 0:
+        return float(window_seconds)
+    if current <= room:
+        # Alcanza con que baje el peso de la ventana anterior
+        return ((1 - (room - current) / previous) - elapsed) * window_seconds
+    # En la próxima ventana los `current` de hoy pasan a ser los anteriores
+    return (1 - elapsed + (1 - room / current)) * window_seconds
+
+
+class MemoryBackend:
+    """
+    Contadores en proceso: {clave: [índice de ventana, anterior, actual, último uso]}
+    y token buckets: {clave: TAT}
+    """
+
+    def __init__(self, sweep_seconds: float = RATE_LIMIT_SWEEP_SECONDS):
+        self.sweep_seconds = sweep_seconds
+        self._counters: Dict[str, list] = {}
+        self._windows: Dict[str, float] = {}
+        self._tats: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = 0.0
+
+    def _counts(self, key: str, window: int) -> Tuple[int, int]:
+        entry = self._counters.get(key)
+        if entry is None or entry[0] < window - 1:
+            return 0, 0
+        if entry[0] == window - 1:
+            return entry[2], 0
+        return entry[1], entry[2]
+
+    def counts(self, key: str, window_seconds: float, now: float) -> Tuple[int, int]:
+        with self._lock:
+            return self._counts(key, int(now // window_seconds))
+
+    def hit(self, key: str, max_requests: int, window_seconds: float, now: float) -> Decision:
+        window = int(now // window_seconds)
+        elapsed = now / window_seconds - window
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            previous, current = self._counts(key, window)
+            if sliding_count(previous, current + 1, elapsed) > max_requests:
+                return False, retry_after(previous, current, elapsed, max_requests, window_seconds)
+            self._counters[key] = [window, previous, current + 1, now]
+            self._windows[key] = window_seconds
+            return True, 0.0
+
+    def take(self, key: str, rate: float, burst: float, cost: float, now: float) -> Decision:
+        rejected, wait_seconds = self.take_all([(key, rate, burst, cost)], now)
+        return rejected is None, wait_seconds
+
+    def take_all(self, buckets: Sequence[Bucket], now: float) -> Tuple[Optional[int], float]:
+        """
+        Consume de todos los buckets sólo si todos lo admiten.
+        Retorna (índice del bucket que rechazó o None, segundos a esperar).
+        """
+        with self._lock:
+            if now >= self._next_sweep:
+                self._sweep(now)
+            tats: List[float] = []
+            for index, (key, rate, burst, cost) in enumerate(buckets):
+                interval = 1.0 / rate
+                tat = max(self._tats.get(key, now), now) + cost * interval
+                if tat - now > burst * interval:
+                    return index, tat - now - burst * interval
+                tats.append(tat)
+            for (key, _, _, _), tat in zip(buckets, tats):
+                self._tats[key] = tat
+            return None, 0.0
+
+    def _sweep(self, now: float) -> None:
+        # Una clave sin uso durante dos ventanas ya no aporta a ningún conteo
+        idle = [
+            key for key, entry in self._counters.items()
+            if now - entry[3] >= 2 * self._windows[key]
+        ]
+        for key in idle:
+            del self._counters[key]
+            del self._windows[key]
+        # Un bucket con TAT en el pasado está lleno: equivale a no tener estado
+        for key in [key for key, tat in self._tats.items() if tat <= now]:
+            del self._tats[key]
+        self._next_sweep = now + self.sweep_seconds
+
+    def __len__(self) -> int:
+        return len(self._counters) + len(self._tats)
+
+
+class RedisBackend:
+    """
+    Contadores compartidos en Redis: una clave por (clave, ventana fija) con
+    expiración de dos ventanas
+    """
+
+    def __init__(self, client, prefix: str = "rate_limit:"):
+        self.client = client
+        self.prefix = prefix
+
+    def _key(self, key: str, window: int) -> str:
+        return f"{self.prefix}{key}:{window}"
+
+    def counts(self, key: str, window_seconds: float, now: float) -> Tuple[int, int]:
+        window = int(now // window_seconds)
+        previous = self.client.get(self._key(key, window - 1))
+        current = self.client.get(self._key(key, window))
+        return int(previous or 0), int(current or 0)
+
+    def hit(self, key: str, max_requests: int, window_seconds: float, now: float) -> Decision:
+        window = int(now // window_seconds)
+        elapsed = now / window_seconds - window
+        current_key = self._key(key, window)
+        previous = int(self.client.get(self._key(key, window - 1)) or 0)
+        # incr primero y deshacer si se pasa: entre workers nunca se supera el límite
+        current = self.client.incr(current_key)
+        if current == 1:
+            self.client.expire(current_key, int(math.ceil(2 * window_seconds)))
+        if sliding_count(previous, current, elapsed) > max_requests:
+            self.client.decr(current_key)
+            return False, retry_after(previous, current - 1, elapsed, max_requests, window_seconds)
+        return True, 0.0
+
+    def take(self, key: str, rate: float, burst: float, cost: float, now: float) -> Decision:
+        rejected, wait_seconds = self.take_all([(key, rate, burst, cost)], now)
+        return rejected is None, wait_seconds
+
+    def take_all(self, buckets: Sequence[Bucket], now: float) -> Tuple[Optional[int], float]:
+        keys = [f"{self.prefix}bucket:{key}" for key, _, _, _ in buckets]
+        args: List[float] = [now]
+        for _, rate, burst, cost in buckets:
+            args += [1.0 / rate, burst, cost]
+        rejected, wait_seconds = self.client.eval(TAKE_ALL_SCRIPT, len(keys), *keys, *args)
+        if int(rejected) == 0:
+            return None, 0.0
+        return int(rejected) - 1, float(wait_seconds)
+
+
+def create_backend(kind: str = RATE_LIMIT_BACKEND):
+    if kind == "redis":
+        try:
+            import redis
+        except ImportError:
+            print("Warning: redis package not installed - using in-process rate limiter")
+        else:
+            return RedisBackend(redis.Redis.from_url(RATE_LIMIT_REDIS_URL))
+    return MemoryBackend()
 
 
 class RateLimiter:
     """
-    Implementación de rate limiting con ventana deslizante
+    Implementación de rate limiting con ventana deslizante por (ip, endpoint)
     """
 
-    def __init__(self):
-        # Estructura: {ip_address: deque([(timestamp, endpoint), ...])}
-        self.requests: Dict[str, Deque[Tuple[float, str]]] = defaultdict(deque)
+    def __init__(self, backend=None, clock: Callable[[], float] = time.time):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.clock = clock
 
         # Configuración de límites por endpoint
         self.limits = {
@@ -40,66 +277,88 @@ class RateLimiter:
             },  # 5 cambios en 5 minutos
         }
 
-    def is_allowed(self, client_ip: str, endpoint: str) -> bool:
+    def check(self, client_ip: str, endpoint: str) -> Decision:
         """
-        Verifica si la request está permitida según los límites
+        Registra el intento si está permitido; si no, devuelve cuánto esperar
         """
-        if endpoint not in self.limits:
-            return True
-
-        current_time = time.time()
-        limit_config = self.limits[endpoint]
-        window_seconds = limit_config["window_seconds"]
-        max_requests = limit_config["max_requests"]
-
-        # Limpiar requests antiguos
-        client_requests = self.requests[client_ip]
-        while client_requests and client_requests[0][0] < current_time - window_seconds:
-            client_requests.popleft()
-
-        # Contar requests para este endpoint en la ventana
-        endpoint_requests = sum(
-            1 for _, req_endpoint in client_requests if req_endpoint == endpoint
+        limit_config = self.limits.get(endpoint)
+        if limit_config is None:
+            return True, 0.0
+        return self.backend.hit(
+            f"{endpoint}:{client_ip}",
+            limit_config["max_requests"],
+            limit_config["window_seconds"],
+            self.clock(),
         )
 
-        if endpoint_requests >= max_requests:
-            return False
-
-        # Agregar la request actual
-        client_requests.append((current_time, endpoint))
-        return True
+    def is_allowed(self, client_ip: str, endpoint: str) -> bool:
+        """
+        Verifica si la request está permitida según los límites
+        """
+        return self.check(client_ip, endpoint)[0]
 
     def get_reset_time(self, client_ip: str, endpoint: str) -> int:
         """
         Obtiene el tiempo en segundos hasta que se resetee el límite
         """
-        if endpoint not in self.limits:
+        limit_config = self.limits.get(endpoint)
+        if limit_config is None:
             return 0
 
-        current_time = time.time()
-        limit_config = self.limits[endpoint]
+        now = self.clock()
         window_seconds = limit_config["window_seconds"]
+        previous, current = self.backend.counts(f"{endpoint}:{client_ip}", window_seconds, now)
+        elapsed = now / window_seconds - now // window_seconds
+        return int(math.ceil(retry_after(previous, current, elapsed, limit_config["max_requests"], window_seconds)))
 
-        client_requests = self.requests[client_ip]
-        if not client_requests:
-            return 0
 
-        # Encontrar la request más antigua para este endpoint
-        oldest_request = None
-        for timestamp, req_endpoint in client_requests:
-            if req_endpoint == endpoint:
-                oldest_request = timestamp
-                break
+class BudgetLimiter:
+    """
+    Token buckets con nombre: {nombre: (rate por segundo, burst)}
+    """
 
-        if oldest_request is None:
-            return 0
+    def __init__(self, budgets: Dict[str, Tuple[float, float]], backend=None,
+                 clock: Callable[[], float] = time.time):
+        self.budgets = budgets
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.clock = clock
 
-        reset_time = oldest_request + window_seconds - current_time
-        return max(0, int(reset_time))
+    def take(self, budget: str, key: str, cost: float = 1) -> Decision:
+        budget, wait_seconds = self.take_all([(budget, key)], cost)
+        return budget is None, wait_seconds
+
+    def take_all(self, checks: Sequence[Tuple[str, str]], cost: float = 1) -> Tuple[Optional[str], float]:
+        """
+        Consume cost de cada (presupuesto, clave) sólo si todos lo admiten,
+        en un solo paso atómico del backend.
+        Retorna (presupuesto que rechazó o None, segundos a esperar).
+        """
+        names: List[str] = []
+        buckets: List[Bucket] = []
+        for budget, key in checks:
+            rate, burst = self.budgets[budget]
+            if rate <= 0:
+                continue
+            names.append(budget)
+            # Un request más caro que el burst consume el bucket entero en vez de no pasar nunca
+            buckets.append((f"{budget}:{key}", rate, burst, min(cost, burst)))
+        if not buckets:
+            return None, 0.0
+        rejected, wait_seconds = self.backend.take_all(buckets, self.clock())
+        if rejected is None:
+            return None, 0.0
+        return names[rejected], wait_seconds
 
 
-# Instancia global del rate limiter
-rate_limiter = RateLimiter()
+# Instancias globales (comparten backend)
+rate_limiter = RateLimiter(create_backend())
+face_budgets = BudgetLimiter(
+    {
+        "device": (FACE_DEVICE_RATE, FACE_DEVICE_BURST),
+        "warehouse": (FACE_WAREHOUSE_RATE, FACE_WAREHOUSE_BURST),
+    },
+    rate_limiter.backend,
+)
 
 
 def check_rate_limit(request: Request, endpoint: str):
@@ -108,8 +367,9 @@ def check_rate_limit(request: Request, endpoint: str):
     """
     client_ip = request.client.host if request.client else "unknown"
 
-    if not rate_limiter.is_allowed(client_ip, endpoint):
-        reset_time = rate_limiter.get_reset_time(client_ip, endpoint)
+    allowed, wait_seconds = rate_limiter.check(client_ip, endpoint)
+    if not allowed:
+        reset_time = int(math.ceil(wait_seconds))
         raise HTTPException(
             status_code=status.HTTP_429_TOO_MANY_REQUESTS,
             detail={
@@ -122,6 +382,48 @@ def check_rate_limit(request: Request, endpoint: str):
         )
 
 
+def face_device_key(request: Request, user_id: Optional[int] = None) -> str:
+    """
+    Clave del presupuesto por dispositivo. Sin X-Device-Id se usa el usuario
+    autenticado: varios kioskos detrás de un NAT comparten la IP.
+    """
+    device = request.headers.get(DEVICE_HEADER)
+    if device:
+        return f"id:{device}"
+    if user_id is not None:
+        return f"user:{user_id}"
+    return f"ip:{get_client_ip(request)}"
+
+
+def check_face_budget(
+    request: Request,
+    warehouse_id: Optional[int] = None,
+    cost: float = 1,
+    user_id: Optional[int] = None,
+):
+    """
+    Admisión de los endpoints de reconocimiento: un kiosko en un loop de
+    reintentos agota su presupuesto sin afectar al resto del almacén
+    """
+    checks = [("device", face_device_key(request, user_id))]
+    if warehouse_id is not None:
+        checks.append(("warehouse", str(warehouse_id)))
+
+    budget, wait_seconds = face_budgets.take_all(checks, cost)
+    if budget is not None:
+        BUDGET_REJECTED.inc(budget=budget)
+        reset_time = int(math.ceil(wait_seconds))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail={
+                "error": "Too many requests",
+                "message": f"Face recognition budget exceeded for this {budget}",
+                "retry_after": reset_time,
+            },
+            headers={"Retry-After": str(reset_time)},
+        )
+
+
 def auth_rate_limit(request: Request):
     """Rate limit específico para endpoints de autenticación"""
     endpoint = request.url.path
@@ -1,34 +1,99 @@
 """
 Sistema de Refresh Tokens para sesiones prolongadas
 Maneja tokens de acceso de corta duración y tokens de refresh de larga duración
+
+Mantenimiento de la tabla refresh_tokens:
+- last_used no se escribe en cada refresh: se acumula en memoria por token
+  (last_used_buffer) y se vuelca en un único UPDATE por lotes cada
+  REFRESH_TOKEN_LAST_USED_FLUSH_SECONDS o al llegar a
+  REFRESH_TOKEN_LAST_USED_MAX_PENDING tokens pendientes. Si el volcado toca
+  durante un refresh se hace en una sesión aparte, sin commit sobre la del request.
+- cleanup_expired_tokens borra por rangos de PK de
+  REFRESH_TOKEN_CLEANUP_BATCH_SIZE filas con un commit por lote, así que
+  nunca bloquea la tabla más que lo que tarda un lote.
+- start_housekeeping_worker ejecuta ambas tareas en un hilo daemon.
 """
 
+import os
 import secrets
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Any, Callable, Dict, Optional
+
+from sqlalchemy import bindparam, delete, func, select, update
 from sqlalchemy.orm import Session
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey
-from sqlalchemy.ext.declarative import declarative_base
-from database import Base
-from models import User
-from utils.jwt_handler import create_access_token, decode_token
+from sqlalchemy.orm.attributes import set_committed_value
+
+from models import RefreshToken, User
+from utils.jwt_handler import create_access_token
 
+# Limpieza de tokens expirados (0 desactiva el job) y filas por lote
+REFRESH_TOKEN_CLEANUP_INTERVAL_SECONDS = int(os.getenv("REFRESH_TOKEN_CLEANUP_INTERVAL_SECONDS", "3600"))
+REFRESH_TOKEN_CLEANUP_BATCH_SIZE = int(os.getenv("REFRESH_TOKEN_CLEANUP_BATCH_SIZE", "1000"))
+# Escritura diferida de last_used (0 = escribir en cada refresh)
+REFRESH_TOKEN_LAST_USED_FLUSH_SECONDS = int(os.getenv("REFRESH_TOKEN_LAST_USED_FLUSH_SECONDS", "60"))
+REFRESH_TOKEN_LAST_USED_MAX_PENDING = int(os.getenv("REFRESH_TOKEN_LAST_USED_MAX_PENDING", "1000"))
 
-class RefreshToken(Base):
+
+class LastUsedBuffer:
     """
-    Modelo para almacenar refresh tokens en la base de datos
+    Marcas de last_used pendientes de escribir, una por token (la más reciente)
     """
 
-    __tablename__ = "refresh_tokens"
+    def __init__(
+        self,
+        flush_seconds: int = REFRESH_TOKEN_LAST_USED_FLUSH_SECONDS,
+        max_pending: int = REFRESH_TOKEN_LAST_USED_MAX_PENDING,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.flush_seconds = flush_seconds
+        self.max_pending = max_pending
+        self.clock = clock
+        self._pending: Dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._last_flush = clock()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def touch(self, token_id: int, used_at: datetime) -> None:
+        with self._lock:
+            current = self._pending.get(token_id)
+            if current is None or used_at > current:
+                self._pending[token_id] = used_at
+
+    def get(self, token_id: int) -> Optional[datetime]:
+        return self._pending.get(token_id)
+
+    def due(self) -> bool:
+        if not self._pending:
+            return False
+        return (
+            self.flush_seconds <= 0
+            or len(self._pending) >= self.max_pending
+            or self.clock() - self._last_flush >= self.flush_seconds
+        )
+
+    def drain(self) -> Dict[int, datetime]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._last_flush = self.clock()
+        return pending
+
+    def restore(self, pending: Dict[int, datetime]) -> None:
+        """
+        Devuelve al buffer las marcas de un volcado fallido sin pisar otras más nuevas
+        """
+        for token_id, used_at in pending.items():
+            self.touch(token_id, used_at)
 
-    id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    token = Column(String(255), unique=True, nullable=False, index=True)
-    expires_at = Column(DateTime, nullable=False)
-    is_revoked = Column(Boolean, default=False)
-    created_at = Column(DateTime, default=datetime.utcnow)
-    last_used = Column(DateTime, nullable=True)
-    device_info = Column(String(500), nullable=True)  # User agent, etc.
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+
+
+last_used_buffer = LastUsedBuffer()
 
 
 class RefreshTokenService:
@@ -60,7 +125,7 @@ class RefreshTokenService:
         )
 
         refresh_token = RefreshToken(
-            user_id=user_id, token=token, expires_at=expires_at, device_info=device_info
+            user_id=user_id, token=token, expires_at=expires_at, user_agent=device_info
         )
 
         db.add(refresh_token)
@@ -85,12 +150,44 @@ class RefreshTokenService:
         )
 
         if refresh_token:
-            # Actualizar last_used
-            refresh_token.last_used = datetime.utcnow()
-            db.commit()
+            # last_used se acumula en memoria y se escribe en lote
+            now = datetime.utcnow()
+            last_used_buffer.touch(refresh_token.id, now)
+            set_committed_value(refresh_token, "last_used", now)
+            if last_used_buffer.due():
+                # Sesión propia: el volcado no confirma ni deshace la transacción del llamante
+                with Session(bind=db.get_bind()) as flush_db:
+                    RefreshTokenService.flush_last_used(flush_db)
 
         return refresh_token
 
+    @staticmethod
+    def flush_last_used(db: Session) -> int:
+        """
+        Escribe las marcas de last_used pendientes en un único UPDATE por lotes
+        """
+        pending = last_used_buffer.drain()
+        if not pending:
+            return 0
+
+        statement = (
+            update(RefreshToken.__table__)
+            .where(RefreshToken.__table__.c.id == bindparam("token_id"))
+            .values(last_used=bindparam("used_at"))
+        )
+        try:
+            db.execute(
+                statement,
+                [{"token_id": token_id, "used_at": used_at} for token_id, used_at in pending.items()],
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            last_used_buffer.restore(pending)
+            print(f"⚠️ Refresh token last_used flush failed: {e}")
+            return 0
+        return len(pending)
+
     @staticmethod
     def revoke_refresh_token(db: Session, token: str) -> bool:
         """
@@ -112,39 +209,69 @@ class RefreshTokenService:
         db: Session, user_id: int, device_info: Optional[str] = None
     ) -> int:
         """
-        Revoca todos los refresh tokens de un usuario
+        Revoca todos los refresh tokens activos de un usuario
         Si device_info se proporciona, solo revoca tokens de ese dispositivo
         """
-        query = db.query(RefreshToken).filter(
-            RefreshToken.user_id == user_id, RefreshToken.is_revoked == False
+        # Los expirados ya no sirven y los borra la limpieza; filtrar por
+        # expires_at usa el índice (user_id, is_revoked, expires_at) completo
+        statement = update(RefreshToken).where(
+            RefreshToken.user_id == user_id,
+            RefreshToken.is_revoked == False,
+            RefreshToken.expires_at > datetime.utcnow(),
         )
 
         if device_info:
-            query = query.filter(RefreshToken.device_info == device_info)
+            statement = statement.where(RefreshToken.user_agent == device_info)
 
-        count = query.count()
-        query.update({"is_revoked": True})
+        result = db.execute(
+            statement.values(is_revoked=True).execution_options(synchronize_session=False)
+        )
         db.commit()
 
-        return count
+        return result.rowcount
 
     @staticmethod
-    def cleanup_expired_tokens(db: Session) -> int:
+    def cleanup_expired_tokens(
+        db: Session, batch_size: Optional[int] = None, before: Optional[datetime] = None
+    ) -> int:
         """
-        Limpia tokens expirados de la base de datos
+        Limpia tokens expirados de la base de datos por rangos de PK,
+        con un commit por lote
         """
-        count = (
-            db.query(RefreshToken)
-            .filter(RefreshToken.expires_at < datetime.utcnow())
-            .count()
-        )
+        batch_size = max(batch_size or REFRESH_TOKEN_CLEANUP_BATCH_SIZE, 1)
+        cutoff = before or datetime.utcnow()
+
+        # Solo hasta el id máximo actual: los tokens nuevos no caducan durante la limpieza
+        low, high = db.execute(
+            select(func.min(RefreshToken.id), func.max(RefreshToken.id))
+        ).one()
+        if low is None:
+            return 0
+
+        deleted = 0
+        for start in range(low, high + 1, batch_size):
+            result = db.execute(
+                delete(RefreshToken)
+                .where(
+                    RefreshToken.id >= start,
+                    RefreshToken.id < start + batch_size,
+                    RefreshToken.expires_at < cutoff,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+            deleted += result.rowcount
 
-        db.query(RefreshToken).filter(
-            RefreshToken.expires_at < datetime.utcnow()
-        ).delete()
+        return deleted
 
-        db.commit()
-        return count
+    @staticmethod
+    def _access_token_claims(user: User) -> Dict[str, Any]:
+        return {
+            "sub": user.username,
+            "user_id": user.id,
+            "warehouse_id": user.warehouse_id,
+            "role": user.role.name,
+        }
 
     @staticmethod
     def create_token_pair(
@@ -158,12 +285,7 @@ class RefreshTokenService:
             minutes=RefreshTokenService.ACCESS_TOKEN_EXPIRE_MINUTES
         )
         access_token = create_access_token(
-            data={
-                "sub": user.username,
-                "user_id": user.id,
-                "company_id": user.company_id,
-                "role": user.role.name,
-            },
+            data=RefreshTokenService._access_token_claims(user),
             expires_delta=access_token_expires,
         )
 
@@ -205,12 +327,7 @@ class RefreshTokenService:
             minutes=RefreshTokenService.ACCESS_TOKEN_EXPIRE_MINUTES
         )
         access_token = create_access_token(
-            data={
-                "sub": user.username,
-                "user_id": user.id,
-                "company_id": user.company_id,
-                "role": user.role.name,
-            },
+            data=RefreshTokenService._access_token_claims(user),
             expires_delta=access_token_expires,
         )
 
@@ -232,17 +349,55 @@ class RefreshTokenService:
                 RefreshToken.is_revoked == False,
                 RefreshToken.expires_at > datetime.utcnow(),
             )
-            .order_by(RefreshToken.last_used.desc())
             .all()
         )
 
-        return [
+        # Incluir las marcas de last_used aún no escritas
+        result = [
             {
                 "token_id": session.id,
-                "device_info": session.device_info,
+                "device_info": session.user_agent,
                 "created_at": session.created_at,
-                "last_used": session.last_used,
+                "last_used": last_used_buffer.get(session.id) or session.last_used,
                 "expires_at": session.expires_at,
             }
             for session in sessions
         ]
+        result.sort(key=lambda s: s["last_used"] or s["created_at"], reverse=True)
+        return result
+
+
+def start_housekeeping_worker(
+    session_factory,
+    interval_seconds: int = REFRESH_TOKEN_CLEANUP_INTERVAL_SECONDS,
+    flush_seconds: int = REFRESH_TOKEN_LAST_USED_FLUSH_SECONDS,
+) -> Optional[threading.Thread]:
+    """
+    Lanza un hilo daemon que vuelca last_used y limpia tokens expirados periódicamente
+    """
+    periods = [seconds for seconds in (interval_seconds, flush_seconds) if seconds > 0]
+    if not periods:
+        return None
+    tick = min(periods)
+
+    def run():
+        next_cleanup = time.monotonic()
+        while True:
+            db = session_factory()
+            try:
+                RefreshTokenService.flush_last_used(db)
+                if interval_seconds > 0 and time.monotonic() >= next_cleanup:
+                    next_cleanup = time.monotonic() + interval_seconds
+                    deleted = RefreshTokenService.cleanup_expired_tokens(db)
+                    if deleted:
+                        print(f"🧹 Deleted {deleted} expired refresh tokens")
+            except Exception as e:
+                db.rollback()
+                print(f"⚠️ Refresh token housekeeping failed: {e}")
+            finally:
+                db.close()
+            time.sleep(tick)
+
+    worker = threading.Thread(target=run, name="refresh-token-housekeeping", daemon=True)
+    worker.start()
+    return worker
@@ -1,14 +1,202 @@
+"""
+Hashing y verificación de contraseñas (bcrypt)
+
+bcrypt es deliberadamente lento (~100-300 ms por operación). Todas las
+operaciones corren en un executor propio de PASSWORD_HASH_WORKERS hilos
+(bcrypt libera el GIL), separado del threadpool de FastAPI que usan también
+los endpoints de reconocimiento:
+
+- Los endpoints async esperan con hash_password_async / verify_password_async
+  sin ocupar un hilo del threadpool.
+- Las funciones síncronas esperan el resultado del executor, así que nunca
+  hay más de PASSWORD_HASH_WORKERS hashes en paralelo en el proceso.
+- Back-pressure: con PASSWORD_HASH_QUEUE_LIMIT operaciones en curso o en cola,
+  las nuevas se rechazan con 503 en lugar de acumular espera.
+- verify_any verifica varios hashes (historial de contraseñas) en paralelo.
+- Cada operación libera su plaza al terminar en el executor: cancelar la
+  espera o cortar verify_any en el primer acierto no descuenta un bcrypt
+  que sigue corriendo.
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Sequence
+
+from fastapi import HTTPException
 from passlib.context import CryptContext
 
+from utils import metrics
+
+# Hilos dedicados a bcrypt y operaciones en curso + en cola antes de responder 503 (0 = 8 x hilos)
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "0"))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = 1
+
 # Create a password context with bcrypt
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+REJECTED = metrics.registry.counter(
+    "password_hash_rejected_total", "Password hash/verify operations rejected with 503"
+)
+
+
+class PasswordHasher:
+    """
+    Executor acotado para bcrypt con límite de operaciones pendientes
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_limit: Optional[int] = None):
+        self.workers = max(PASSWORD_HASH_WORKERS if workers is None else workers, 1)
+        limit = PASSWORD_HASH_QUEUE_LIMIT if queue_limit is None else queue_limit
+        self.queue_limit = limit or 8 * self.workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+            return self._executor
+
+    def _acquire(self, jobs: int) -> None:
+        with self._lock:
+            # Con el executor libre siempre se admite, aunque jobs supere el límite
+            if self._pending and self._pending + jobs > self.queue_limit:
+                REJECTED.inc()
+                raise HTTPException(
+                    status_code=503,
+                    detail="Too many password operations in progress, try again shortly.",
+                    headers={"Retry-After": str(PASSWORD_HASH_RETRY_AFTER_SECONDS)},
+                )
+            self._pending += jobs
+
+    def _release(self, jobs: int) -> None:
+        with self._lock:
+            self._pending -= jobs
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        """
+        Envía un trabajo ya admitido; su plaza se libera cuando el trabajo
+        termina o se cancela en cola, no cuando el llamante deja de esperar
+        """
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._release(1)
+            raise
+        future.add_done_callback(lambda _: self._release(1))
+        return future
+
+    def _submit_verify(self, plain_password: str, hashed_passwords: Sequence[str]) -> List[Future]:
+        self._acquire(len(hashed_passwords))
+        futures: List[Future] = []
+        for index, hashed in enumerate(hashed_passwords):
+            try:
+                futures.append(self._submit(pwd_context.verify, plain_password, hashed))
+            except BaseException:
+                self._release(len(hashed_passwords) - index - 1)
+                for future in futures:
+                    future.cancel()
+                raise
+        return futures
+
+    def run(self, fn: Callable, *args):
+        """
+        Ejecuta fn(*args) en el executor y espera el resultado (para código síncrono)
+        """
+        self._acquire(1)
+        return self._submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable, *args):
+        """
+        Como run, pero espera sin ocupar un hilo; si se cancela la espera
+        (cliente desconectado) el trabajo en curso sigue contando como pendiente
+        """
+        self._acquire(1)
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def verify_any(self, plain_password: str, hashed_passwords: Sequence[str]) -> bool:
+        """
+        True si plain_password coincide con alguno de los hashes; se verifican
+        en paralelo y se corta en el primer acierto
+        """
+        if not hashed_passwords:
+            return False
+        remaining = set(self._submit_verify(plain_password, hashed_passwords))
+        try:
+            while remaining:
+                done, remaining = wait(remaining, return_when=FIRST_COMPLETED)
+                if any(future.result() for future in done):
+                    return True
+            return False
+        finally:
+            # Solo se cancelan los que siguen en cola; los que ya corren liberan al terminar
+            for future in remaining:
+                future.cancel()
+
+    async def verify_any_async(self, plain_password: str, hashed_passwords: Sequence[str]) -> bool:
+        if not hashed_passwords:
+            return False
+        futures = [asyncio.wrap_future(f) for f in self._submit_verify(plain_password, hashed_passwords)]
+        try:
+            for next_done in asyncio.as_completed(futures):
+                if await next_done:
+                    return True
+            return False
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+password_hasher = PasswordHasher()
+
+metrics.registry.gauge(
+    "password_hash_pending",
+    "Password hash/verify operations running or queued",
+    lambda: password_hasher.pending,
+)
+
 
 def get_password_hash(password: str) -> str:
     """Hash a password using bcrypt"""
-    return pwd_context.hash(password)
+    return password_hasher.run(pwd_context.hash, password)
 
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against a bcrypt hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.run(pwd_context.verify, plain_password, hashed_password)
+
+
+def verify_any(plain_password: str, hashed_passwords: Sequence[str]) -> bool:
+    """Verify a password against several bcrypt hashes in parallel"""
+    return password_hasher.verify_any(plain_password, hashed_passwords)
+
+
+async def hash_password_async(password: str) -> str:
+    """Hash a password without holding a request thread"""
+    return await password_hasher.run_async(pwd_context.hash, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password without holding a request thread"""
+    return await password_hasher.run_async(pwd_context.verify, plain_password, hashed_password)
+
+
+async def verify_any_async(plain_password: str, hashed_passwords: Sequence[str]) -> bool:
+    """Verify a password against several bcrypt hashes without holding a request thread"""
+    return await password_hasher.verify_any_async(plain_password, hashed_passwords)
@@ -9,7 +9,22 @@ export class ApiService {
   headers = {};
 
   constructor(private http: HttpClient) {
-    this.headers = { Authorization: `Bearer ${this.token}` };
+    // X-Device-Id gives each kiosk its own face recognition budget on the API
+    this.headers = {
+      Authorization: `Bearer ${this.token}`,
+      "X-Device-Id": ApiService.deviceId()
+    };
+  }
+
+  private static deviceId(): string {
+    const key = "deviceId";
+    let id = localStorage.getItem(key);
+    if (!id) {
+      id = globalThis.crypto?.randomUUID?.() ??
+        `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`;
+      localStorage.setItem(key, id);
+    }
+    return id;
   }
 
   registerFace(name: string, image_base64: string) {